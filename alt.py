@@ -0,0 +1,172 @@
+"""
+alt.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Búsqueda ALT (A*, Landmarks, desigualdad Triangular) sobre un GrafoCompilado.
+
+Se eligen k vértices de referencia (landmarks) en la periferia del grafo y se guardan
+las distancias desde y hasta cada uno de ellos. Por la desigualdad triangular, para
+cualquier landmark L se cumple
+    d(v,t) >= d(L,t) - d(L,v)    y    d(v,t) >= d(v,L) - d(t,L)
+lo que da una cota inferior de la distancia al destino que no depende de la geometría
+y que, por tanto, también recoge penalizaciones fijas como la de los semáforos.
+El preprocesado son 2k búsquedas de Dijkstra, mucho más barato que una jerarquía de contracción.
+"""
+
+from typing import List
+import numpy as np
+
+from grafo_pesado import GrafoCompilado, distancias_compilado, camino_minimo_astar_compilado
+
+#Número de landmarks por defecto
+NUMERO_LANDMARKS = 16
+
+#Número de landmarks que se usan en cada consulta (los que mejor acotan el par origen-destino)
+LANDMARKS_ACTIVOS = 4
+
+
+class TablasALT:
+    """
+    Tablas de distancias a los landmarks de un GrafoCompilado para una función de peso.
+
+    Attributes:
+        grafo (GrafoCompilado): Grafo sobre el que se hacen las búsquedas.
+        peso (str): Nombre de la función de peso compilada.
+        landmarks (np.ndarray): Índice de cada landmark.
+        desde (np.ndarray): Array float32 k x n con la distancia d(L, v) de cada landmark a cada vértice.
+        hasta (np.ndarray): Array float32 k x n con la distancia d(v, L) de cada vértice a cada landmark.
+        firma (str): Firma del grafo y los pesos con los que se calcularon las tablas (ver GrafoCompilado.firma).
+    """
+
+    def __init__(self, grafo: GrafoCompilado, peso: str, landmarks: np.ndarray, desde: np.ndarray, hasta: np.ndarray, firma: str):
+        self.grafo = grafo
+        self.peso = peso
+        self.landmarks = landmarks
+        self.desde = desde
+        self.hasta = hasta
+        self.firma = firma
+        #Versión de los pesos del grafo con la que se calcularon (o comprobaron) las tablas
+        self._version = grafo.version
+        #Margen que compensa el redondeo a float32 para que la cota siga siendo admisible
+        finitos = np.concatenate([desde[np.isfinite(desde)], hasta[np.isfinite(hasta)]])
+        self._holgura = 4 * float(np.finfo(np.float32).eps) * (float(finitos.max()) if len(finitos) else 0.0)
+
+    @classmethod
+    def construye(cls, grafo: GrafoCompilado, peso: str, k: int = NUMERO_LANDMARKS) -> "TablasALT":
+        """
+        Elige k landmarks en la periferia del grafo y calcula sus tablas de distancias.
+
+        Los landmarks se eligen de forma voraz: el primero es el vértice más lejano a un vértice
+        cualquiera y cada uno de los siguientes es el vértice alcanzable más alejado de todos los
+        landmarks ya elegidos, lo que los reparte por el borde del grafo.
+
+        Args:
+            grafo (GrafoCompilado): Grafo compilado.
+            peso (str): Nombre de la función de peso compilada.
+            k (int, opcional): Número de landmarks. Por defecto, NUMERO_LANDMARKS.
+        Returns:
+            TablasALT: Tablas de distancias de los landmarks.
+        """
+        invertido = grafo.invertido()
+        k = min(k, len(grafo))
+
+        def mas_lejano(distancias: np.ndarray) -> int:
+            finitas = np.where(np.isfinite(distancias), distancias, -1)
+            return int(np.argmax(finitas))
+
+        landmarks = [mas_lejano(distancias_compilado(grafo, peso, grafo.nodos[0]))]
+        desde, hasta = [], []
+        minimo = np.full(len(grafo), np.inf)
+        while True:
+            L = grafo.nodos[landmarks[-1]]
+            desde.append(distancias_compilado(grafo, peso, L))
+            hasta.append(distancias_compilado(invertido, peso, L))
+            if len(landmarks) == k:
+                break
+            #Distancia de cada vértice al landmark más cercano en cualquier sentido
+            minimo = np.minimum(minimo, np.minimum(desde[-1], hasta[-1]))
+            siguiente = mas_lejano(minimo)
+            if minimo[siguiente] <= 0:
+                break
+            landmarks.append(siguiente)
+
+        return cls(grafo, peso, np.array(landmarks, dtype=np.int32), np.array(desde, dtype=np.float32), np.array(hasta, dtype=np.float32), grafo.firma(peso))
+
+    def guarda(self, fichero: str) -> None:
+        """
+        Guarda los landmarks, sus tablas y la firma del grafo en un fichero .npz.
+
+        Args:
+            fichero (str): Ruta del fichero.
+        """
+        np.savez(fichero, firma=np.array(self.firma), landmarks=self.landmarks, desde=self.desde, hasta=self.hasta)
+
+    @classmethod
+    def carga(cls, fichero: str, grafo: GrafoCompilado, peso: str) -> "TablasALT":
+        """
+        Carga las tablas guardadas con "guarda" para el grafo compilado y la función de peso dados.
+
+        Args:
+            fichero (str): Ruta del fichero.
+            grafo (GrafoCompilado): Grafo compilado con el que se construyeron las tablas.
+            peso (str): Nombre de la función de peso compilada.
+        Returns:
+            TablasALT: Tablas cargadas.
+        Raises:
+            FileNotFoundError: Si el fichero no existe.
+            ValueError: Si las tablas no corresponden al grafo o a los pesos.
+        """
+        firma = grafo.firma(peso)
+        with np.load(fichero) as datos:
+            if "firma" not in datos or str(datos["firma"]) != firma:
+                raise ValueError("Las tablas de landmarks no corresponden al grafo.")
+            return cls(grafo, peso, datos["landmarks"], datos["desde"], datos["hasta"], firma)
+
+    def cotas(self, destino: object, origen: object = None) -> np.ndarray:
+        """
+        Calcula la cota inferior de la distancia hasta "destino" de todos los vértices.
+
+        Args:
+            destino (object): vértice de destino.
+            origen (object, opcional): Si se indica, solo se usan los LANDMARKS_ACTIVOS landmarks
+                que dan mejor cota para el origen. Por defecto, None (se usan todos).
+        Returns:
+            np.ndarray: Cota inferior de cada vértice en el orden de grafo.nodos.
+        Raises:
+            ValueError: Si los pesos del grafo han cambiado (ver GrafoCompilado.actualiza_pesos) desde
+                que se calcularon las tablas: las cotas podrían dejar de ser admisibles.
+        """
+        if self.grafo.version != self._version:
+            raise ValueError("Los pesos del grafo han cambiado desde que se calcularon las tablas de landmarks.")
+        t = self.grafo.indice[destino]
+        desde, hasta = self.desde, self.hasta
+        if origen is not None and len(self.landmarks) > LANDMARKS_ACTIVOS:
+            s = self.grafo.indice[origen]
+            with np.errstate(invalid="ignore"):
+                cota_origen = np.fmax(desde[:, t] - desde[:, s], hasta[:, s] - hasta[:, t])
+            activos = np.argsort(np.nan_to_num(cota_origen, nan=-np.inf))[-LANDMARKS_ACTIVOS:]
+            desde, hasta = desde[activos], hasta[activos]
+
+        #np.fmax ignora los NaN que aparecen al restar distancias infinitas
+        with np.errstate(invalid="ignore"):
+            cotas = np.fmax(desde[:, t, None] - desde, hasta - hasta[:, t, None])
+        cotas = np.nan_to_num(np.fmax.reduce(cotas, axis=0).astype(np.float64), nan=0.0, posinf=np.inf)
+        return np.maximum(cotas - self._holgura, 0.0)
+
+    def camino_minimo(self, origen: object, destino: object) -> List[object]:
+        """
+        Calcula el camino mínimo con A* usando las cotas de los landmarks.
+
+        Args:
+            origen (object): vértice de origen.
+            destino (object): vértice de destino.
+        Returns:
+            List[object]: Lista con los vértices del camino más corto entre origen y destino.
+        Raises:
+            KeyError: Si origen o destino no son vértices del grafo.
+            ValueError: Si no existe camino entre origen y destino o han cambiado los pesos del grafo.
+        """
+        return camino_minimo_astar_compilado(self.grafo, self.peso, origen, destino, self.cotas(destino, origen))
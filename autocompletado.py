@@ -0,0 +1,173 @@
+"""
+autocompletado.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Motor de autocompletado de direcciones sobre el callejero de Madrid.
+
+A partir del DataFrame de callejero.carga_callejero se construyen, una sola vez:
+    - Un array ordenado con los nombres de vía normalizados (mayúsculas y sin tildes),
+      sobre el que se buscan prefijos con búsqueda binaria.
+    - Un índice de trigramas de los nombres de vía, para sugerir vías aunque el usuario
+      cometa errores al escribir.
+Cada sugerencia incluye la dirección completa en el formato que espera busca_direccion
+y sus coordenadas.
+"""
+
+from typing import List, Tuple
+from collections import Counter, defaultdict
+import bisect
+import unicodedata
+import pandas as pd
+
+#Número de sugerencias por defecto
+NUMERO_SUGERENCIAS = 5
+
+#Similitud mínima (coeficiente de Dice sobre trigramas) para sugerir una vía por aproximación
+SIMILITUD_MINIMA = 0.3
+
+
+def normaliza(texto: str) -> str:
+    """
+    Normaliza un texto para compararlo: mayúsculas, sin tildes ni diéresis y con un solo espacio entre palabras.
+
+    Args:
+        texto (str): Texto a normalizar.
+    Returns:
+        str: Texto normalizado.
+    """
+    texto = unicodedata.normalize("NFKD", str(texto).upper())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.replace(",", " ").split())
+
+
+def trigramas(texto: str) -> set:
+    """
+    Devuelve el conjunto de trigramas de un texto normalizado, con espacios de relleno en los extremos.
+
+    Args:
+        texto (str): Texto normalizado.
+    Returns:
+        set: Conjunto de trigramas.
+    """
+    texto = "  " + texto + " "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class Autocompletado:
+    """
+    Motor de autocompletado de direcciones.
+
+    Attributes:
+        vias (List[Tuple[str, str, str]]): Clase, partícula y nombre originales de cada vía.
+        portales (List[Dict[int, Tuple[float, float]]]): Coordenadas de cada número de cada vía.
+    """
+
+    def __init__(self, callejero: pd.DataFrame):
+        """
+        Args:
+            callejero (pd.DataFrame): DataFrame devuelto por carga_callejero.
+        """
+        datos = callejero[["VIA_CLASE", "VIA_PAR", "VIA_NOMBRE", "NUMERO", "LATITUD", "LONGITUD"]]
+        identificador = {}
+        self.vias = []
+        self.portales = []
+        for clase, particula, nombre, numero, latitud, longitud in zip(*(datos[c].tolist() for c in datos.columns)):
+            particula = "" if particula != particula or particula is None else str(particula)
+            via = (str(clase), particula, str(nombre))
+            if via not in identificador:
+                identificador[via] = len(self.vias)
+                self.vias.append(via)
+                self.portales.append({})
+            if numero == numero:
+                self.portales[identificador[via]].setdefault(int(numero), (latitud, longitud))
+
+        #Claves normalizadas de búsqueda por prefijo: el nombre solo y la dirección completa
+        claves = []
+        self._trigramas = defaultdict(list)
+        self._num_trigramas = []
+        for i, (clase, particula, nombre) in enumerate(self.vias):
+            nombre_normalizado = normaliza(nombre)
+            claves.append((nombre_normalizado, i))
+            claves.append((normaliza(" ".join([clase, particula, nombre])), i))
+            tri = trigramas(nombre_normalizado)
+            for t in tri:
+                self._trigramas[t].append(i)
+            self._num_trigramas.append(len(tri))
+        claves.sort()
+        self._claves = [c for c, _ in claves]
+        self._ids = [i for _, i in claves]
+        self._clases = {normaliza(c) for c, _, _ in self.vias}
+        self._particulas = {normaliza(p) for _, p, _ in self.vias if p}
+
+    def _texto_via(self, i: int) -> str:
+        """Devuelve la vía i en el formato 'CLASE PARTÍCULA NOMBRE'."""
+        return " ".join(parte for parte in self.vias[i] if parte)
+
+    def _por_prefijo(self, consulta: str, k: int) -> List[int]:
+        """Devuelve hasta k vías cuyo nombre o dirección completa empieza por la consulta."""
+        resultado = []
+        posicion = bisect.bisect_left(self._claves, consulta)
+        while posicion < len(self._claves) and self._claves[posicion].startswith(consulta) and len(resultado) < k:
+            if self._ids[posicion] not in resultado:
+                resultado.append(self._ids[posicion])
+            posicion += 1
+        return resultado
+
+    def _por_trigramas(self, consulta: str, k: int) -> List[int]:
+        """Devuelve hasta k vías con nombre parecido a la consulta, de más a menos parecida."""
+        #Quitamos la clase y las partículas que haya escrito el usuario: el índice solo contiene nombres
+        palabras = consulta.split()
+        while len(palabras) > 1 and (palabras[0] in self._clases or palabras[0] in self._particulas):
+            palabras.pop(0)
+        tri = trigramas(" ".join(palabras))
+
+        comunes = Counter()
+        for t in tri:
+            comunes.update(self._trigramas.get(t, ()))
+        similitudes = [(2 * n / (len(tri) + self._num_trigramas[i]), i) for i, n in comunes.items()]
+        similitudes = [(s, i) for s, i in similitudes if s >= SIMILITUD_MINIMA]
+        similitudes.sort(key=lambda par: (-par[0], par[1]))
+        return [i for _, i in similitudes[:k]]
+
+    def sugerir(self, texto: str, k: int = NUMERO_SUGERENCIAS) -> List[Tuple[str, float, float]]:
+        """
+        Devuelve las k direcciones más probables para un texto escrito por el usuario.
+
+        Primero se buscan vías cuyo nombre o dirección completa empieza por el texto y, si no hay
+        suficientes, vías con nombre parecido. Si el texto termina en ", número" se devuelve ese
+        portal o, si no existe en la vía, el más cercano; si no, el primer portal de la vía.
+
+        Args:
+            texto (str): Texto escrito por el usuario, p. ej. "calle alberto aguilera, 23".
+            k (int, opcional): Número máximo de sugerencias. Por defecto, NUMERO_SUGERENCIAS.
+        Returns:
+            List[Tuple[str, float, float]]: Dirección en formato "CLASE PARTÍCULA NOMBRE, NÚMERO", latitud y longitud.
+        """
+        via, coma, numero = texto.rpartition(",")
+        if not coma or not numero.strip().isdecimal():
+            via, numero = texto, None
+        else:
+            numero = int(numero)
+        consulta = normaliza(via)
+        if not consulta:
+            return []
+
+        candidatas = self._por_prefijo(consulta, k)
+        if len(candidatas) < k:
+            candidatas += [i for i in self._por_trigramas(consulta, k) if i not in candidatas]
+
+        sugerencias = []
+        for i in candidatas[:k]:
+            portales = self.portales[i]
+            if not portales:
+                continue
+            if numero is None:
+                portal = min(portales)
+            else:
+                portal = min(portales, key=lambda n: (abs(n - numero), n))
+            latitud, longitud = portales[portal]
+            sugerencias.append((f"{self._texto_via(i)}, {portal}", latitud, longitud))
+        return sugerencias
@@ -0,0 +1,407 @@
+"""
+benchmark.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Banco de pruebas de rendimiento de los algoritmos de grafo_pesado y de la carga de datos.
+
+Se generan grafos sintéticos parecidos a un callejero y de tamaño creciente (rejillas con
+calles eliminadas y grafos geométricos aleatorios), se miden dijkstra, camino_minimo, prim y
+kruskal (y sus versiones sobre GrafoCompilado) y se comprueban sus resultados frente a las
+implementaciones de NetworkX, cuyo tiempo también se mide. Si están los ficheros de Madrid se
+mide además la carga del grafo, rutas entre pares origen/destino fijos y la búsqueda de
+direcciones. Todo es reproducible a partir de una semilla.
+
+Los resultados se escriben en JSON para comparar versiones:
+    python benchmark.py [--tamanos 1000 4000 16000] [--salida resultados.json] [--sin-madrid]
+"""
+
+from typing import Callable, Dict, List, Tuple
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import networkx as nx
+import numpy as np
+
+import callejero
+import grafo_pesado
+from gps import MODOS, ATRIBUTOS_PESO, distancia_gran_circulo, materializa_pesos, cotas_destino
+
+#Semilla por defecto de los grafos y de los pares origen/destino
+SEMILLA = 2024
+
+#Número aproximado de nodos de los grafos sintéticos por defecto
+TAMANOS = [1000, 4000, 16000]
+
+#Consultas de cada tipo por grafo
+ORIGENES_DIJKSTRA = 3
+PARES_CAMINO = 20
+PARES_MADRID = 100
+DIRECCIONES = 1000
+
+#Coordenadas del centro de Madrid y separación media entre cruces en grados
+LATITUD_MADRID = 40.4168
+LONGITUD_MADRID = -3.7038
+SEPARACION = 0.001
+
+#Tolerancia relativa al comparar pesos con NetworkX
+TOLERANCIA = 1e-9
+
+
+def _longitudes(G: nx.Graph, aristas: List[Tuple[int, int]], rnd: random.Random) -> List[float]:
+    """Longitud en metros de cada arista: distancia en línea recta alargada un factor aleatorio, como una calle real."""
+    u = np.array([a for a, _ in aristas], dtype=np.int64)
+    v = np.array([b for _, b in aristas], dtype=np.int64)
+    lat = np.array([G.nodes[i]["y"] for i in range(G.number_of_nodes())])
+    lon = np.array([G.nodes[i]["x"] for i in range(G.number_of_nodes())])
+    rectas = distancia_gran_circulo(lat[u], lon[u], lat[v], lon[v]) if len(aristas) else np.zeros(0)
+    return [d * rnd.uniform(1.0, 1.3) for d in rectas.tolist()]
+
+
+def grafo_rejilla(n: int, semilla: int = SEMILLA) -> nx.Graph:
+    """
+    Genera una rejilla de unos n cruces con coordenadas perturbadas y un 10 % de calles eliminadas.
+
+    Args:
+        n (int): Número aproximado de nodos.
+        semilla (int, opcional): Semilla. Por defecto, SEMILLA.
+    Returns:
+        nx.Graph: Grafo con atributos 'x', 'y' en los nodos y 'length' en las aristas.
+    """
+    rnd = random.Random(semilla)
+    lado = max(2, round(math.sqrt(n)))
+    G = nx.Graph()
+    for i in range(lado):
+        for j in range(lado):
+            G.add_node(i * lado + j, y=LATITUD_MADRID + i * SEPARACION + rnd.uniform(-0.2, 0.2) * SEPARACION,
+                       x=LONGITUD_MADRID + j * SEPARACION * 1.3 + rnd.uniform(-0.2, 0.2) * SEPARACION)
+    aristas = []
+    for i in range(lado):
+        for j in range(lado):
+            if j + 1 < lado and rnd.random() > 0.1:
+                aristas.append((i * lado + j, i * lado + j + 1))
+            if i + 1 < lado and rnd.random() > 0.1:
+                aristas.append((i * lado + j, (i + 1) * lado + j))
+    for (u, v), longitud in zip(aristas, _longitudes(G, aristas, rnd)):
+        G.add_edge(u, v, length=longitud)
+    return G
+
+
+def grafo_geometrico(n: int, semilla: int = SEMILLA, grado: float = 5.0) -> nx.Graph:
+    """
+    Genera un grafo geométrico aleatorio: n puntos uniformes en un cuadrado y una arista entre cada
+    par a distancia menor que el radio que da el grado medio pedido. Las parejas cercanas se buscan
+    con una rejilla de celdas del tamaño del radio.
+
+    Args:
+        n (int): Número de nodos.
+        semilla (int, opcional): Semilla. Por defecto, SEMILLA.
+        grado (float, opcional): Grado medio esperado. Por defecto, 5.
+    Returns:
+        nx.Graph: Grafo con atributos 'x', 'y' en los nodos y 'length' en las aristas.
+    """
+    rnd = random.Random(semilla)
+    generador = np.random.default_rng(semilla)
+    puntos = generador.random((n, 2))
+    radio = math.sqrt(grado / (math.pi * n))
+    celdas = np.floor(puntos / radio).astype(np.int64)
+    columnas = int(celdas[:, 0].max()) + 2 if n else 1
+    clave = celdas[:, 0] * columnas + celdas[:, 1]
+    orden = np.argsort(clave, kind="stable")
+    claves_ordenadas = clave[orden]
+
+    aristas = []
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        vecina = (celdas[:, 0] + dx) * columnas + celdas[:, 1] + dy
+        inicio = np.searchsorted(claves_ordenadas, vecina, side="left")
+        fin = np.searchsorted(claves_ordenadas, vecina, side="right")
+        for i, (a, b) in enumerate(zip(inicio.tolist(), fin.tolist())):
+            for j in orden[a:b].tolist():
+                if (dx, dy) != (0, 0) or j > i:
+                    if np.hypot(*(puntos[i] - puntos[j])) < radio:
+                        aristas.append((i, j))
+
+    lado = math.sqrt(n) * SEPARACION
+    G = nx.Graph()
+    for i, (px, py) in enumerate(puntos.tolist()):
+        G.add_node(i, x=LONGITUD_MADRID + px * lado * 1.3, y=LATITUD_MADRID + py * lado)
+    for (u, v), longitud in zip(aristas, _longitudes(G, aristas, rnd)):
+        G.add_edge(u, v, length=longitud)
+    return G
+
+
+def cronometra(funcion: Callable[[], object], repeticiones: int = 1) -> Tuple[float, object]:
+    """
+    Ejecuta una función varias veces y devuelve el menor tiempo en segundos y el último resultado.
+
+    Args:
+        funcion (Callable[[], object]): Función sin argumentos.
+        repeticiones (int, opcional): Número de ejecuciones. Por defecto, 1.
+    Returns:
+        Tuple[float, object]: Menor tiempo y resultado.
+    """
+    mejor = math.inf
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def _iguales(a: float, b: float) -> bool:
+    return abs(a - b) <= TOLERANCIA * max(1.0, abs(a), abs(b))
+
+
+def _distancias_arbol(G: nx.Graph, padre: Dict[object, object], origen: object) -> Dict[object, float]:
+    """Distancia desde el origen de cada vértice del árbol de padres, sumando 'length' por las ramas."""
+    distancias = {origen: 0.0}
+    for v in padre:
+        rama = []
+        while v not in distancias and padre.get(v) is not None:
+            rama.append(v)
+            v = padre[v]
+        if v not in distancias:
+            continue
+        for x in reversed(rama):
+            distancias[x] = distancias[padre[x]] + G[padre[x]][x]["length"]
+    return distancias
+
+
+def _peso_camino(G: nx.Graph, camino: List[object]) -> float:
+    return sum(G[u][v]["length"] for u, v in zip(camino, camino[1:]))
+
+
+def _peso_aristas(G: nx.Graph, aristas) -> float:
+    return sum(G[u][v]["length"] for u, v in aristas)
+
+
+def mide_grafo(nombre: str, G: nx.Graph, semilla: int = SEMILLA) -> List[Dict[str, object]]:
+    """
+    Mide los algoritmos de grafo_pesado sobre un grafo y los compara con NetworkX.
+
+    Args:
+        nombre (str): Nombre del tipo de grafo en los resultados.
+        G (nx.Graph): Grafo no dirigido con el atributo 'length' en las aristas.
+        semilla (int, opcional): Semilla de los orígenes y pares. Por defecto, SEMILLA.
+    Returns:
+        List[Dict[str, object]]: Un resultado por algoritmo con el tiempo, el de NetworkX y si coinciden.
+    """
+    rnd = random.Random(semilla)
+    nodos = list(G.nodes)
+    peso = grafo_pesado.peso_atributo("length")
+    base = {"grafo": nombre, "nodos": G.number_of_nodes(), "aristas": G.number_of_edges()}
+    resultados = []
+
+    def anota(algoritmo: str, segundos: float, segundos_nx: float, correcto: bool, consultas: int = 1) -> None:
+        resultados.append({**base, "algoritmo": algoritmo, "consultas": consultas, "segundos": segundos,
+                           "segundos_networkx": segundos_nx, "correcto": bool(correcto)})
+
+    #Árbol de caminos mínimos desde varios orígenes
+    origenes = rnd.sample(nodos, min(ORIGENES_DIJKSTRA, len(nodos)))
+    t_compilar, G_compilado = cronometra(lambda: grafo_pesado.GrafoCompilado(G, {"length": "length"}))
+    anota("compilar", t_compilar, None, True)
+    tiempos = {"dijkstra": 0.0, "dijkstra_compilado": 0.0, "networkx": 0.0}
+    correcto = {"dijkstra": True, "dijkstra_compilado": True}
+    for origen in origenes:
+        t, referencia = cronometra(lambda: nx.single_source_dijkstra_path_length(G, origen, weight="length"))
+        tiempos["networkx"] += t
+        t, padre = cronometra(lambda: grafo_pesado.dijkstra(G, peso, origen))
+        tiempos["dijkstra"] += t
+        distancias = _distancias_arbol(G, padre, origen)
+        correcto["dijkstra"] &= distancias.keys() == referencia.keys() and all(_iguales(distancias[v], referencia[v]) for v in referencia)
+        t, padre = cronometra(lambda: grafo_pesado.dijkstra_compilado(G_compilado, "length", origen))
+        tiempos["dijkstra_compilado"] += t
+        distancias = _distancias_arbol(G, padre, origen)
+        correcto["dijkstra_compilado"] &= distancias.keys() == referencia.keys() and all(_iguales(distancias[v], referencia[v]) for v in referencia)
+    for algoritmo in correcto:
+        anota(algoritmo, tiempos[algoritmo], tiempos["networkx"], correcto[algoritmo], len(origenes))
+
+    #Caminos mínimos entre pares aleatorios
+    pares = [tuple(rnd.sample(nodos, 2)) for _ in range(PARES_CAMINO)] if len(nodos) > 1 else []
+    funciones = {"camino_minimo": lambda o, d: grafo_pesado.camino_minimo(G, peso, o, d),
+                 "camino_minimo_bidireccional": lambda o, d: grafo_pesado.camino_minimo_bidireccional(G, peso, o, d),
+                 "camino_minimo_compilado": lambda o, d: grafo_pesado.camino_minimo_compilado(G_compilado, "length", o, d)}
+    tiempos = dict.fromkeys(funciones, 0.0)
+    correcto = dict.fromkeys(funciones, True)
+    t_nx = 0.0
+    for origen, destino in pares:
+        try:
+            t, referencia = cronometra(lambda: nx.shortest_path_length(G, origen, destino, weight="length"))
+        except nx.NetworkXNoPath:
+            referencia = None
+            t = 0.0
+        t_nx += t
+        for algoritmo, funcion in funciones.items():
+            inicio = time.perf_counter()
+            try:
+                camino = funcion(origen, destino)
+            except ValueError:
+                camino = None
+            tiempos[algoritmo] += time.perf_counter() - inicio
+            #camino_minimo devuelve [destino] cuando no hay camino
+            if camino is not None and camino[0] != origen:
+                camino = None
+            if referencia is None:
+                correcto[algoritmo] &= camino is None
+            else:
+                correcto[algoritmo] &= camino is not None and _iguales(_peso_camino(G, camino), referencia)
+    for algoritmo in funciones:
+        anota(algoritmo, tiempos[algoritmo], t_nx, correcto[algoritmo], len(pares))
+
+    #Árboles (bosques) abarcadores mínimos
+    t_nx, arbol = cronometra(lambda: nx.minimum_spanning_tree(G, weight="length"))
+    referencia = arbol.size(weight="length")
+    funciones = {"prim": lambda: [(v, p) for v, p in grafo_pesado.prim(G, peso).items() if p is not None],
+                 "kruskal": lambda: grafo_pesado.kruskal(G, peso),
+                 "prim_compilado": lambda: [(v, p) for v, p in grafo_pesado.prim_compilado(G_compilado, "length").items() if p is not None],
+                 "kruskal_compilado": lambda: grafo_pesado.kruskal_compilado(G_compilado, "length"),
+                 "boruvka_compilado": lambda: grafo_pesado.boruvka_compilado(G_compilado, "length")}
+    for algoritmo, funcion in funciones.items():
+        t, aristas = cronometra(funcion)
+        anota(algoritmo, t, t_nx, len(aristas) == arbol.number_of_edges() and _iguales(_peso_aristas(G, aristas), referencia))
+    return resultados
+
+
+def mide_madrid(semilla: int = SEMILLA) -> List[Dict[str, object]]:
+    """
+    Mide la carga del grafo de Madrid, rutas entre pares origen/destino fijados por la semilla y la
+    búsqueda de direcciones. Cada parte se omite si falta su fichero de datos.
+
+    Args:
+        semilla (int, opcional): Semilla de los pares y direcciones. Por defecto, SEMILLA.
+    Returns:
+        List[Dict[str, object]]: Un resultado por medida.
+    """
+    resultados = []
+    if not os.path.exists(callejero.MAP_FILE_NAME):
+        resultados.append({"grafo": "madrid", "algoritmo": "carga_grafo", "omitido": f"no existe {callejero.MAP_FILE_NAME}"})
+    else:
+        con_cache = os.path.exists(os.path.join(callejero.GRAPH_CACHE_DIR, "meta.json"))
+        t, G = cronometra(callejero.carga_grafo_procesado)
+        base = {"grafo": "madrid", "nodos": G.number_of_nodes(), "aristas": G.number_of_edges()}
+        resultados.append({**base, "algoritmo": "carga_grafo", "cache": con_cache, "segundos": t})
+        t, _ = cronometra(lambda: materializa_pesos(G))
+        resultados.append({**base, "algoritmo": "materializa_pesos", "segundos": t})
+        t, G_compilado = cronometra(lambda: grafo_pesado.GrafoCompilado(G, {modo: ATRIBUTOS_PESO[modo] for modo in MODOS}))
+        resultados.append({**base, "algoritmo": "compilar", "segundos": t})
+
+        #Los pares se eligen sobre los nodos ordenados para que no dependan del orden de carga
+        rnd = random.Random(semilla)
+        nodos = sorted(G.nodes)
+        pares = [tuple(rnd.sample(nodos, 2)) for _ in range(PARES_MADRID)]
+        latitudes = np.array([G.nodes[v]["y"] for v in G_compilado.nodos])
+        longitudes = np.array([G.nodes[v]["x"] for v in G_compilado.nodos])
+        for modo in MODOS:
+            atributo = ATRIBUTOS_PESO[modo]
+            tiempos = {"camino_minimo_compilado": 0.0, "camino_minimo_astar_compilado": 0.0, "networkx": 0.0}
+            correcto = {"camino_minimo_compilado": True, "camino_minimo_astar_compilado": True}
+            for origen, destino in pares:
+                inicio = time.perf_counter()
+                try:
+                    referencia = nx.shortest_path_length(G, origen, destino, weight=atributo)
+                except nx.NetworkXNoPath:
+                    referencia = None
+                tiempos["networkx"] += time.perf_counter() - inicio
+                for algoritmo in correcto:
+                    inicio = time.perf_counter()
+                    try:
+                        if algoritmo == "camino_minimo_compilado":
+                            camino = grafo_pesado.camino_minimo_compilado(G_compilado, modo, origen, destino)
+                        else:
+                            cotas = cotas_destino(latitudes, longitudes, G_compilado.indice[destino], modo)
+                            camino = grafo_pesado.camino_minimo_astar_compilado(G_compilado, modo, origen, destino, cotas)
+                    except ValueError:
+                        camino = None
+                    tiempos[algoritmo] += time.perf_counter() - inicio
+                    if referencia is None:
+                        correcto[algoritmo] &= camino is None
+                    else:
+                        coste = sum(G[u][v][atributo] for u, v in zip(camino, camino[1:])) if camino else math.inf
+                        correcto[algoritmo] &= _iguales(coste, referencia)
+            for algoritmo in correcto:
+                resultados.append({**base, "algoritmo": algoritmo, "modo": modo, "consultas": len(pares), "segundos": tiempos[algoritmo],
+                                   "segundos_networkx": tiempos["networkx"], "correcto": bool(correcto[algoritmo])})
+
+    if not os.path.exists(callejero.STREET_FILE_NAME):
+        resultados.append({"grafo": "madrid", "algoritmo": "busca_direccion", "omitido": f"no existe {callejero.STREET_FILE_NAME}"})
+        return resultados
+    con_cache = os.path.exists(os.path.join(callejero.STREET_CACHE_DIR, "meta.json"))
+    t, df = cronometra(callejero.carga_callejero)
+    resultados.append({"grafo": "madrid", "algoritmo": "carga_callejero", "filas": len(df), "cache": con_cache, "segundos": t})
+    t, indice = cronometra(lambda: callejero.indice_direcciones(df))
+    resultados.append({"grafo": "madrid", "algoritmo": "indice_direcciones", "segundos": t})
+
+    filas = df.sample(n=min(DIRECCIONES, len(df)), random_state=semilla)
+    direcciones = []
+    for clase, particula, nombre, numero, latitud, longitud in zip(*(filas[c].tolist() for c in ["VIA_CLASE", "VIA_PAR", "VIA_NOMBRE", "NUMERO", "LATITUD", "LONGITUD"])):
+        partes = [str(clase), "" if particula != particula or particula is None else str(particula), str(nombre)]
+        direcciones.append((f"{' '.join(p for p in partes if p)}, {int(numero)}", latitud, longitud))
+    encontradas = 0
+    inicio = time.perf_counter()
+    for direccion, _, _ in direcciones:
+        try:
+            callejero.busca_direccion(direccion, indice)
+            encontradas += 1
+        except callejero.AdressNotFoundError:
+            pass
+    t = time.perf_counter() - inicio
+    resultados.append({"grafo": "madrid", "algoritmo": "busca_direccion", "consultas": len(direcciones), "segundos": t,
+                       "correcto": encontradas == len(direcciones)})
+    return resultados
+
+
+def _version() -> str:
+    """Commit actual del repositorio, si se puede obtener."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argumentos: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento de grafo_pesado.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS, help="número aproximado de nodos de los grafos sintéticos")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help=f"semilla de grafos y consultas (por defecto, {SEMILLA})")
+    parser.add_argument("--salida", default=None, help="fichero JSON de resultados (por defecto, salida estándar)")
+    parser.add_argument("--sin-madrid", action="store_true", help="no medir con los datos de Madrid")
+    args = parser.parse_args(argumentos)
+
+    resultados = []
+    for n in args.tamanos:
+        for nombre, generador in (("rejilla", grafo_rejilla), ("geometrico", grafo_geometrico)):
+            print(f"{nombre} de {n} nodos...", file=sys.stderr)
+            resultados += mide_grafo(nombre, generador(n, args.semilla), args.semilla)
+    if not args.sin_madrid:
+        print("Madrid...", file=sys.stderr)
+        resultados += mide_madrid(args.semilla)
+
+    informe = {"version": _version(), "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(), "networkx": nx.__version__, "numpy": np.__version__,
+               "plataforma": platform.platform(), "semilla": args.semilla, "resultados": resultados}
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida is None:
+        print(texto)
+    else:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+
+    fallos = [r for r in resultados if r.get("correcto") is False]
+    for r in fallos:
+        print(f"ERROR: {r['algoritmo']} no coincide con NetworkX en {r['grafo']} ({r.get('nodos')} nodos)", file=sys.stderr)
+    if fallos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+cache_rutas.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Caché de rutas sobre un GrafoCompilado para consultas que se repiten.
+
+Se mantienen dos cachés LRU acotadas en memoria:
+    - Rutas completas, con clave (nodo de origen, nodo de destino, modo).
+    - Árboles de caminos mínimos (distancias y padres) de los orígenes frecuentes, de
+      modo que cualquier destino desde un origen frecuente se resuelve recorriendo el árbol.
+Un origen pasa a ser frecuente cuando se consulta UMBRAL_ORIGEN_FRECUENTE veces.
+La caché no es segura entre hilos: cada hilo debe usar la suya o protegerla con un cerrojo.
+"""
+
+from typing import Callable, Dict, List, Tuple
+from collections import OrderedDict
+import numpy as np
+
+from grafo_pesado import GrafoCompilado, arbol_compilado, camino_desde_arbol, camino_minimo_compilado
+
+#Memoria máxima por defecto de cada caché en bytes
+MEMORIA_RUTAS = 32 * 1024 ** 2
+MEMORIA_ARBOLES = 256 * 1024 ** 2
+
+#Consultas desde un mismo origen y modo a partir de las cuales se guarda su árbol
+UMBRAL_ORIGEN_FRECUENTE = 3
+
+#Número máximo de orígenes de los que se cuentan las consultas
+ORIGENES_CONTADOS = 10000
+
+
+class CacheRutas:
+    """
+    Caché de rutas y de árboles de caminos mínimos de un GrafoCompilado.
+
+    Attributes:
+        grafo (GrafoCompilado): Grafo compilado sobre el que se calculan las rutas.
+        memoria_rutas (int): Memoria máxima en bytes de las rutas guardadas.
+        memoria_arboles (int): Memoria máxima en bytes de los árboles guardados (0 para no guardarlos).
+    """
+
+    def __init__(self, grafo: GrafoCompilado, memoria_rutas: int = MEMORIA_RUTAS, memoria_arboles: int = MEMORIA_ARBOLES, calcula: Callable[[object, object, str], List[object]] = None):
+        """
+        Args:
+            grafo (GrafoCompilado): Grafo compilado con los pesos de los modos.
+            memoria_rutas (int, opcional): Memoria máxima de las rutas. Por defecto, MEMORIA_RUTAS.
+            memoria_arboles (int, opcional): Memoria máxima de los árboles. Por defecto, MEMORIA_ARBOLES.
+            calcula (Callable[[object, object, str], List[object]], opcional): Función (origen, destino, modo)
+                que calcula una ruta cuando no está en caché, p. ej. un A* con heurística. Por defecto,
+                camino_minimo_compilado sobre el grafo.
+        """
+        self.grafo = grafo
+        self.memoria_rutas = memoria_rutas
+        self.memoria_arboles = memoria_arboles
+        self._calcula = calcula if calcula is not None else (lambda origen, destino, modo: camino_minimo_compilado(grafo, modo, origen, destino))
+        self._rutas = OrderedDict()
+        self._arboles = OrderedDict()
+        self._consultas = OrderedDict()
+        self._bytes_rutas = 0
+        self._bytes_arboles = 0
+        #Versión de los pesos del grafo con la que se calcularon las entradas guardadas
+        self._version = grafo.version
+        self._contadores = {"consultas": 0, "aciertos_ruta": 0, "aciertos_arbol": 0, "arboles_calculados": 0}
+
+    @staticmethod
+    def _tamano_ruta(ruta: List[object]) -> int:
+        """Estimación de la memoria de una ruta: la lista, sus referencias y la entrada en la caché."""
+        return 200 + 8 * len(ruta)
+
+    def _guarda(self, cache: OrderedDict, clave: tuple, valor: object, tamano: int, atributo: str, maximo: int) -> None:
+        """Inserta en una caché LRU y expulsa las entradas menos usadas hasta no superar la memoria máxima."""
+        #Si la clave ya estaba, su entrada anterior deja de contar
+        anterior = cache.pop(clave, None)
+        total = getattr(self, atributo) - (anterior[1] if anterior is not None else 0)
+        if tamano <= maximo:
+            cache[clave] = (valor, tamano)
+            total += tamano
+        while total > maximo:
+            _, (_, liberado) = cache.popitem(last=False)
+            total -= liberado
+        setattr(self, atributo, total)
+
+    def _arbol(self, origen: object, modo: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Devuelve el árbol del origen si está guardado o si el origen acaba de volverse frecuente."""
+        clave = (origen, modo)
+        if clave in self._arboles:
+            self._arboles.move_to_end(clave)
+            return self._arboles[clave][0]
+        if self.memoria_arboles <= 0:
+            return None
+
+        consultas = self._consultas.pop(clave, 0) + 1
+        self._consultas[clave] = consultas
+        if len(self._consultas) > ORIGENES_CONTADOS:
+            self._consultas.popitem(last=False)
+        if consultas < UMBRAL_ORIGEN_FRECUENTE:
+            return None
+
+        del self._consultas[clave]
+        distancias, padre = arbol_compilado(self.grafo, modo, origen)
+        arbol = (distancias, padre.astype(np.int32))
+        self._contadores["arboles_calculados"] += 1
+        self._guarda(self._arboles, clave, arbol, arbol[0].nbytes + arbol[1].nbytes, "_bytes_arboles", self.memoria_arboles)
+        return arbol
+
+    def camino_minimo(self, origen: object, destino: object, modo: str) -> List[object]:
+        """
+        Devuelve la ruta mínima entre dos vértices, de la caché si es posible.
+
+        Args:
+            origen (object): vértice de origen.
+            destino (object): vértice de destino.
+            modo (str): Nombre de la función de peso compilada.
+        Returns:
+            List[object]: Lista con los vértices del camino más corto entre origen y destino.
+                No se debe modificar: es la misma lista que guarda la caché.
+        Raises:
+            KeyError: Si origen o destino no son vértices del grafo o "modo" no está compilado.
+            ValueError: Si no existe camino entre origen y destino.
+        """
+        #Si han cambiado los pesos del grafo (p. ej. por el tráfico) las entradas guardadas ya no valen
+        if self.grafo.version != self._version:
+            self.vacia()
+        self._contadores["consultas"] += 1
+        clave = (origen, destino, modo)
+        if clave in self._rutas:
+            self._rutas.move_to_end(clave)
+            self._contadores["aciertos_ruta"] += 1
+            return self._rutas[clave][0]
+
+        arbol = self._arbol(origen, modo)
+        if arbol is not None:
+            distancias, padre = arbol
+            if not np.isfinite(distancias[self.grafo.indice[destino]]):
+                raise ValueError("No existe camino entre origen y destino.")
+            self._contadores["aciertos_arbol"] += 1
+            ruta = camino_desde_arbol(self.grafo, padre, destino)
+        else:
+            ruta = self._calcula(origen, destino, modo)
+
+        self._guarda(self._rutas, clave, ruta, self._tamano_ruta(ruta), "_bytes_rutas", self.memoria_rutas)
+        return ruta
+
+    def estadisticas(self) -> Dict[str, float]:
+        """
+        Devuelve los contadores de la caché y sus tasas de acierto.
+
+        Returns:
+            Dict[str, float]: Consultas, aciertos en rutas y en árboles, árboles calculados, tasas de
+                acierto, número de entradas y memoria ocupada por cada caché.
+        """
+        consultas = max(self._contadores["consultas"], 1)
+        estadisticas = dict(self._contadores)
+        estadisticas["tasa_aciertos_ruta"] = self._contadores["aciertos_ruta"] / consultas
+        estadisticas["tasa_aciertos_arbol"] = self._contadores["aciertos_arbol"] / consultas
+        estadisticas["tasa_aciertos"] = (self._contadores["aciertos_ruta"] + self._contadores["aciertos_arbol"]) / consultas
+        estadisticas["rutas"] = len(self._rutas)
+        estadisticas["arboles"] = len(self._arboles)
+        estadisticas["bytes_rutas"] = self._bytes_rutas
+        estadisticas["bytes_arboles"] = self._bytes_arboles
+        return estadisticas
+
+    def vacia(self) -> None:
+        """
+        Elimina todas las rutas y árboles guardados. Se llama sola en la siguiente consulta cuando
+        cambian los pesos del grafo con GrafoCompilado.actualiza_pesos.
+        """
+        self._version = self.grafo.version
+        self._rutas.clear()
+        self._arboles.clear()
+        self._consultas.clear()
+        self._bytes_rutas = 0
+        self._bytes_arboles = 0
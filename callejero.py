@@ -20,14 +20,22 @@ import networkx as nx
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
+import json
+import hashlib
+import weakref
 
-from typing import Tuple
+from typing import Tuple, Dict, Union
 
 STREET_FILE_NAME="direcciones.csv"
+STREET_CACHE_DIR="direcciones_cache"
 
 PLACE_NAME = "Madrid, Spain"
 MAP_FILE_NAME="madrid.graphml"
+GRAPH_CACHE_DIR="madrid_cache"
 
 MAX_SPEEDS={'living_street': '20',
  'residential': '30',
@@ -74,18 +82,96 @@ def convertir_coordenada(coord):
     #Pasamos la coordenada a decimal sumando los grados, los minutos y segundos pasados a decimal
     decimal = float(grados) + float(resto.split("'")[0])/60 + float(resto.split("'")[1])/3600
 
-    #Con un 'if' nos aseguramos de cambiar el signo a las coordenadas que sean 'S' o 'W'
-    if "S" in coord or "W" in coord:
+    #Con un 'if' nos aseguramos de cambiar el signo a las coordenadas que sean 'S' o 'W' (u 'O', oeste)
+    if "S" in coord or "W" in coord or "O" in coord:
         decimal = -decimal
     
     #Devolvemos la coordenada decimal con el signo correspondiente
     return decimal
 
 
+#Grados, minutos, segundos (con coma o punto decimal) y hemisferio de una coordenada
+PATRON_COORDENADA = r"(\d+)\s*[°º]\s*(\d+)\s*'\s*([\d.,]+)\s*(?:''|\")?\s*([NSEWO])"
+
+
+def convertir_coordenadas(coords: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de convertir_coordenada para una columna entera de coordenadas.
+
+    Cada coordenada se descompone con PATRON_COORDENADA mediante str.extract y se convierte con
+    operaciones de columna. Las coordenadas que no encajan en el patrón se convierten una a una
+    con convertir_coordenada, de forma que una fila mal escrita no afecta a las demás.
+
+    Args:
+        coords (pd.Series): Coordenadas en formato 'grados minutos segundos'.
+
+    Returns:
+        pd.Series: Coordenadas en formato decimal.
+    Raises:
+        ValueError: Si alguna coordenada no se puede convertir.
+    """
+    partes = coords.astype(str).str.extract(PATRON_COORDENADA)
+    decimal = partes[0].astype(float) + partes[1].astype(float) / 60 + partes[2].str.replace(",", ".").astype(float) / 3600
+
+    #Las coordenadas al sur o al oeste son negativas
+    decimal = decimal.where(~partes[3].isin(["S", "W", "O"]), -decimal)
+
+    fallidas = partes[0].isna()
+    if fallidas.any():
+        decimal[fallidas] = coords[fallidas].apply(convertir_coordenada)
+    return decimal
+
+
+def _guarda_cache_callejero(df: pd.DataFrame, firma: Dict[str, object], directorio: str) -> None:
+    """
+    Guarda el callejero procesado en formato binario: un fichero .npy por columna (los códigos en
+    las columnas categóricas) y en meta.json la firma del csv, el orden de las columnas y las
+    categorías de cada columna categórica.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    categorias = {}
+    for columna in df.columns:
+        valores = df[columna]
+        if isinstance(valores.dtype, pd.CategoricalDtype):
+            categorias[columna] = valores.cat.categories.tolist()
+            valores = valores.cat.codes
+        np.save(os.path.join(directorio, columna + ".npy"), valores.to_numpy())
+
+    #Los metadatos se escriben al final: si falta este fichero la caché no se considera válida
+    with open(os.path.join(directorio, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"firma": firma, "columnas": list(df.columns), "categorias": categorias}, f, ensure_ascii=False)
+
+
+def _carga_cache_callejero(firma: Dict[str, object], directorio: str) -> pd.DataFrame:
+    """
+    Carga el callejero guardado con _guarda_cache_callejero si su firma coincide con la dada.
+
+    Returns:
+        pd.DataFrame: Callejero procesado o None si la caché corresponde a otro csv.
+    Raises:
+        OSError: Si falta algún fichero de la caché.
+        ValueError, KeyError: Si la caché está incompleta o dañada.
+    """
+    with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["firma"] != firma:
+        return None
+    columnas = {}
+    for columna in meta["columnas"]:
+        valores = np.load(os.path.join(directorio, columna + ".npy"))
+        if columna in meta["categorias"]:
+            valores = pd.Categorical.from_codes(valores, meta["categorias"][columna])
+        columnas[columna] = valores
+    return pd.DataFrame(columnas)
+
 
 def carga_callejero() -> pd.DataFrame:
     """ Función que carga el callejero de Madrid, lo procesa y devuelve
-    un DataFrame con los datos procesados
+    un DataFrame con los datos procesados.
+
+    Solo se leen del csv las columnas necesarias, las coordenadas se convierten a decimal de forma
+    vectorizada y las columnas de texto se guardan como categorías para reducir memoria.
+    El resultado se guarda por columnas en STREET_CACHE_DIR y se reutiliza mientras el csv no cambie.
     
     Args: None
     Returns:
@@ -96,23 +182,132 @@ def carga_callejero() -> pd.DataFrame:
     #Ponemos en una lista las columnas que queremos que coja del csv nuestro df
     columnas = ["VIA_CLASE", "VIA_PAR", "VIA_NOMBRE", "NUMERO", "LATITUD", "LONGITUD"]
 
-    #Hacemos una excepción por si no existe el csv
+    #Si el csv no ha cambiado desde que se guardó la caché, la usamos directamente
+    firma = _firma_fichero(STREET_FILE_NAME, con_hash=False)
     try:
-        #Creamos el df leeyendo el csv y poniendo el separador correspondiente y el 'latin1' para coger ciertos carácteres
-        df = pd.read_csv(STREET_FILE_NAME, sep=";", encoding="latin1")
-    except FileNotFoundError as error:
-        raise error
-    
-    #Filtramos por las columnas que queremos
+        df = _carga_cache_callejero(firma, STREET_CACHE_DIR)
+        if df is not None:
+            return df
+    except (OSError, ValueError, KeyError):
+        #No hay caché o está incompleta: se regenera a partir del csv
+        pass
+
+    #Creamos el df leeyendo del csv solo las columnas que queremos, con el separador correspondiente y el 'latin1' para coger ciertos carácteres
+    df = pd.read_csv(STREET_FILE_NAME, sep=";", encoding="latin1", usecols=columnas,
+                     dtype={"VIA_CLASE": "category", "VIA_PAR": "category", "VIA_NOMBRE": "category", "LATITUD": str, "LONGITUD": str})
+
+    #Ordenamos las columnas como antes
     df = df[columnas]
-    
+
     #Convertimos la latitud y la longitud a decimal
-    df["LATITUD"] = df["LATITUD"].apply(convertir_coordenada)
-    df["LONGITUD"] = df["LONGITUD"].apply(convertir_coordenada)
-    
+    df["LATITUD"] = convertir_coordenadas(df["LATITUD"])
+    df["LONGITUD"] = convertir_coordenadas(df["LONGITUD"])
+    df["NUMERO"] = pd.to_numeric(df["NUMERO"], downcast="integer")
+
+    _guarda_cache_callejero(df, firma, STREET_CACHE_DIR)
     #Devolvemos el df
     return df
 
+def normaliza_texto(texto: str) -> str:
+    """
+    Normaliza un texto del callejero: lo pasa a mayúsculas y deja un único espacio entre palabras.
+
+    Args:
+        texto (str): Texto a normalizar.
+    Returns:
+        str: Texto normalizado.
+    """
+    return " ".join(str(texto).upper().split())
+
+
+class IndiceDirecciones:
+    """
+    Índice de direcciones construido una vez a partir del DataFrame de carga_callejero.
+
+    Es una tabla hash con clave (clase de vía, nombre de vía, número) normalizados y valor el
+    par (latitud, longitud), de forma que cada búsqueda cuesta O(1) en lugar de recorrer el DataFrame.
+    Si una dirección aparece repetida se conserva la primera, igual que en la búsqueda lineal.
+
+    Attributes:
+        coordenadas (Dict[Tuple[str, str, int], Tuple[float, float]]): Coordenadas de cada dirección.
+        clases (set): Clases de vía normalizadas presentes en el callejero.
+    """
+
+    def __init__(self, callejero: pd.DataFrame):
+        """
+        Args:
+            callejero (pd.DataFrame): DataFrame devuelto por carga_callejero.
+        """
+        clases = [normaliza_texto(c) for c in callejero["VIA_CLASE"].astype(str)]
+        nombres = [normaliza_texto(n) for n in callejero["VIA_NOMBRE"].astype(str)]
+        numeros = pd.to_numeric(callejero["NUMERO"], errors="coerce").tolist()
+        latitudes = callejero["LATITUD"].tolist()
+        longitudes = callejero["LONGITUD"].tolist()
+
+        self.coordenadas = {}
+        for clase, nombre, numero, latitud, longitud in zip(clases, nombres, numeros, latitudes, longitudes):
+            if numero == numero:
+                self.coordenadas.setdefault((clase, nombre, int(numero)), (latitud, longitud))
+        self.clases = set(clases)
+
+    def __len__(self) -> int:
+        return len(self.coordenadas)
+
+    def busca(self, direccion: str) -> Tuple[float, float]:
+        """
+        Busca una dirección en formato "CLASE PARTÍCULA NOMBRE, NÚMERO".
+
+        La clase es la primera o primeras palabras de la dirección y el nombre de la vía es lo que
+        queda justo antes de la coma, por lo que la partícula es opcional. Se prueba primero el
+        nombre más largo posible.
+
+        Args:
+            direccion (str): Dirección a buscar.
+        Returns:
+            Tuple[float,float]: Par (latitud, longitud) de la dirección, en grados.
+        Raises:
+            AdressNotFoundError: Si la dirección no existe en el índice.
+        """
+        via, _, numero = normaliza_texto(direccion).rpartition(",")
+        numero = numero.strip()
+        if not numero.isdecimal():
+            raise AdressNotFoundError(f"La dirección '{direccion}' no existe")
+        numero = int(numero)
+
+        palabras = via.split()
+        for i in range(1, len(palabras)):
+            clase = " ".join(palabras[:i])
+            if clase not in self.clases:
+                continue
+            for j in range(i, len(palabras)):
+                coordenadas = self.coordenadas.get((clase, " ".join(palabras[j:]), numero))
+                if coordenadas is not None:
+                    return (np.float64(coordenadas[0]), np.float64(coordenadas[1]))
+        raise AdressNotFoundError(f"La dirección '{direccion}' no existe")
+
+
+#Último índice construido y referencia débil al DataFrame del que procede
+_indice_callejero = (None, None)
+
+
+def indice_direcciones(callejero: pd.DataFrame) -> IndiceDirecciones:
+    """
+    Devuelve el índice de direcciones del DataFrame, construyéndolo solo la primera vez que se pide
+    para ese DataFrame. Si el DataFrame se modifica después hay que construir un IndiceDirecciones nuevo.
+
+    Args:
+        callejero (pd.DataFrame): DataFrame devuelto por carga_callejero.
+    Returns:
+        IndiceDirecciones: Índice de direcciones del callejero.
+    """
+    global _indice_callejero
+    referencia, indice = _indice_callejero
+    if referencia is None or referencia() is not callejero:
+        indice = IndiceDirecciones(callejero)
+        _indice_callejero = (weakref.ref(callejero), indice)
+    return indice
+
+
 def busca_direccion(direccion:str, callejero):
     """ Función que busca una dirección, dada en el formato
         calle, numero
@@ -121,7 +316,7 @@ def busca_direccion(direccion:str, callejero):
     
     Args:
         direccion (str): Nombre completo de la calle con número, en formato "Calle, num"
-        callejero (DataFrame): DataFrame con la información de las calles
+        callejero (DataFrame o IndiceDirecciones): DataFrame con la información de las calles o su índice
     Returns:
         Tuple[float,float]: Par de float (latitud,longitud) de la dirección buscada, expresados en grados
     Raises:
@@ -130,28 +325,10 @@ def busca_direccion(direccion:str, callejero):
         busca_direccion("Calle de Alberto Aguilera, 23", data)=(40.42998055555555,3.7112583333333333)
         busca_direccion("Calle de Alberto Aguilera, 25", data)=(40.43013055555555,3.7126916666666667)
     """
-    #Pone la dirreción en mayúsculas como está en el df de callejero
-    direccion=direccion.upper()
-    print(direccion)
-    #cogemos el número de la dirección para comprobarlo después
-    numero = ''
-    for i in range(len(direccion)):
-        i += 1
-        caracter = direccion[-i]
-        if caracter.isdecimal() == False:
-            break
-        numero =  direccion[-i]  + numero 
-    try:
-        callejero_filtrado = callejero[callejero['NUMERO'] == int(numero)]
-        #Iteramos cada una de las líneas para ver si coincide con la dirección dada, y en caso de que sí, devolver las coordenadas de esa dirección
-        for i, linea in callejero_filtrado.iterrows():  
-            if (linea['VIA_CLASE'] + ' ') in direccion and (' ' + linea['VIA_NOMBRE'] + ',') in direccion:
-                return (np.float64(linea['LATITUD']), np.float64(linea["LONGITUD"]))
-        raise AdressNotFoundError(f"La dirección '{direccion}' no existe")
-        
-        #Si no existe que devuelva que no existe la calle
-    except ValueError or AdressNotFoundError:
-        raise AdressNotFoundError(f"La dirección '{direccion}' no existe")
+    #Si nos dan el DataFrame usamos su índice, que solo se construye la primera vez
+    if not isinstance(callejero, IndiceDirecciones):
+        callejero = indice_direcciones(callejero)
+    return callejero.busca(direccion)
 
 
 
@@ -170,9 +347,9 @@ def carga_grafo() -> nx.MultiDiGraph:
     """
     Función que recupera el grafo de calles de Madrid desde OpenStreetMap o desde un archivo local.
 
-    Si el archivo "madrid.graphml" ya existe, carga el grafo desde ese archivo. Si no existe,
+    Si el archivo MAP_FILE_NAME ya existe, carga el grafo desde ese archivo. Si no existe,
     lo descarga de OpenStreetMap usando la función graph_from_place, lo guarda en el archivo
-    "madrid.graphml" y lo retorna.
+    MAP_FILE_NAME y lo retorna.
 
     Returns:
         nx.MultiDiGraph: Grafo de calles de Madrid (MultiDiGraph).
@@ -180,7 +357,7 @@ def carga_grafo() -> nx.MultiDiGraph:
         RuntimeError: Si ocurre algún error al descargar o cargar el grafo.
     """
     #Ponemos en una variable la ruta del archivo
-    filepath = "madrid.graphml" 
+    filepath = MAP_FILE_NAME
 
     #Ponemos una excepción para cualquier fallo que se de al cargar el grafo
     try:
@@ -189,7 +366,7 @@ def carga_grafo() -> nx.MultiDiGraph:
             grafo = ox.load_graphml(filepath)
         else:
             #Si no existe descargamos el grafo desde OpenStreetMap y lo guardamos
-            grafo = ox.graph_from_place("Madrid, Spain", network_type="drive")
+            grafo = ox.graph_from_place(PLACE_NAME, network_type="drive")
             ox.save_graphml(grafo, filepath)
         
         #Devolvemos lo cargado en la varibale grafo 
@@ -220,76 +397,488 @@ def procesa_grafo(multidigrafo:nx.MultiDiGraph) -> nx.DiGraph:
     return digrafo
 
 
-def dibuja_grafo(grafo: nx.DiGraph, ruta: list = None) -> None:
+def _firma_fichero(filepath: str, con_hash: bool) -> Dict[str, object]:
+    """Devuelve la fecha de modificación, el tamaño y, si se pide, el hash SHA-1 de un fichero."""
+    info = os.stat(filepath)
+    firma = {"mtime": info.st_mtime, "size": info.st_size}
+    if con_hash:
+        sha1 = hashlib.sha1()
+        with open(filepath, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(bloque)
+        firma["sha1"] = sha1.hexdigest()
+    return firma
+
+
+def _codifica(valores: list) -> Tuple[np.ndarray, list]:
+    """Codifica una lista de valores (str, listas o None) como códigos enteros y un vocabulario en JSON."""
+    vocabulario = {}
+    codigos = np.empty(len(valores), dtype=np.int32)
+    for i, valor in enumerate(valores):
+        if valor is None:
+            codigos[i] = -1
+        else:
+            codigos[i] = vocabulario.setdefault(json.dumps(valor, ensure_ascii=False), len(vocabulario))
+    return codigos, list(vocabulario)
+
+
+def guarda_cache_grafo(digrafo: nx.DiGraph, directorio: str = GRAPH_CACHE_DIR, firma: Dict[str, object] = None) -> None:
+    """
+    Guarda el digrafo procesado en formato binario: identificadores y coordenadas de los nodos,
+    adyacencia CSR y longitud, tipo de vía y nombre de cada arista, cada uno en un fichero .npy.
+    Solo se conservan los atributos que usa la aplicación (x, y, length, highway y name) y los
+    atributos del grafo (como "crs"), que se guardan en meta.json.
+
+    Args:
+        digrafo (nx.DiGraph): Grafo dirigido de las calles.
+        directorio (str, opcional): Directorio de la caché. Por defecto, GRAPH_CACHE_DIR.
+        firma (Dict, opcional): Firma del fichero GraphML del que procede el grafo.
+    Returns: None
+    """
+    os.makedirs(directorio, exist_ok=True)
+    nodos = list(digrafo.nodes)
+    indice = {v: i for i, v in enumerate(nodos)}
+
+    offsets = [0]
+    destinos, longitudes, tipos, nombres = [], [], [], []
+    for u in nodos:
+        for v, datos in digrafo[u].items():
+            destinos.append(indice[v])
+            longitudes.append(float(datos.get("length", 1)))
+            tipos.append(datos.get("highway"))
+            nombres.append(datos.get("name"))
+        offsets.append(len(destinos))
+
+    codigos_tipo, vocabulario_tipo = _codifica(tipos)
+    codigos_nombre, vocabulario_nombre = _codifica(nombres)
+    arrays = {
+        "nodos": np.array(nodos, dtype=np.int64),
+        "x": np.array([digrafo.nodes[v]["x"] for v in nodos], dtype=np.float64),
+        "y": np.array([digrafo.nodes[v]["y"] for v in nodos], dtype=np.float64),
+        "offsets": np.array(offsets, dtype=np.int64),
+        "destinos": np.array(destinos, dtype=np.int32),
+        "length": np.array(longitudes, dtype=np.float64),
+        "highway": codigos_tipo,
+        "name": codigos_nombre,
+    }
+    for nombre, array in arrays.items():
+        np.save(os.path.join(directorio, nombre + ".npy"), array)
+
+    #Los metadatos se escriben al final: si falta este fichero la caché no se considera válida
+    with open(os.path.join(directorio, "meta.json"), "w", encoding="utf-8") as f:
+        #Los atributos del grafo que no son JSON (por ejemplo un CRS de pyproj) se guardan como texto
+        json.dump({"firma": firma or {}, "grafo": digrafo.graph, "highway": vocabulario_tipo, "name": vocabulario_nombre}, f, ensure_ascii=False, default=str)
+
+
+def carga_arrays_grafo(directorio: str = GRAPH_CACHE_DIR) -> Tuple[Dict[str, np.ndarray], Dict[str, object]]:
+    """
+    Abre los arrays guardados con guarda_cache_grafo proyectados en memoria (memory-mapped),
+    sin copiarlos ni construir el digrafo, junto con los metadatos de la caché.
+
+    Args:
+        directorio (str, opcional): Directorio de la caché. Por defecto, GRAPH_CACHE_DIR.
+    Returns:
+        Tuple[Dict[str, np.ndarray], Dict[str, object]]: Arrays y metadatos de la caché.
+    Raises:
+        FileNotFoundError: Si la caché no existe.
+    """
+    with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    arrays = {}
+    for nombre in ["nodos", "x", "y", "offsets", "destinos", "length", "highway", "name"]:
+        arrays[nombre] = np.load(os.path.join(directorio, nombre + ".npy"), mmap_mode="r")
+    return arrays, meta
+
+
+def digrafo_desde_arrays(arrays: Dict[str, np.ndarray], meta: Dict[str, object]) -> nx.DiGraph:
+    """
+    Construye el digrafo de NetworkX a partir de los arrays y metadatos de carga_arrays_grafo,
+    con las aristas en el mismo orden que la adyacencia CSR de la caché.
+
+    Args:
+        arrays (Dict[str, np.ndarray]): Arrays de la caché.
+        meta (Dict[str, object]): Metadatos de la caché.
+    Returns:
+        nx.DiGraph: Digrafo de las calles.
+    """
+    nodos = arrays["nodos"].tolist()
+    digrafo = nx.DiGraph(**meta.get("grafo", {}))
+    digrafo.add_nodes_from((v, {"x": x, "y": y}) for v, x, y in zip(nodos, arrays["x"].tolist(), arrays["y"].tolist()))
+
+    #Atributos de cada arista, omitiendo los que no existían en el grafo original
+    vocabulario_tipo = [json.loads(t) for t in meta["highway"]]
+    vocabulario_nombre = [json.loads(n) for n in meta["name"]]
+    origenes = np.repeat(np.arange(len(nodos)), np.diff(arrays["offsets"])).tolist()
+    aristas = []
+    for u, v, longitud, tipo, nombre in zip(origenes, arrays["destinos"].tolist(), arrays["length"].tolist(), arrays["highway"].tolist(), arrays["name"].tolist()):
+        datos = {"length": longitud}
+        if tipo >= 0:
+            datos["highway"] = vocabulario_tipo[tipo]
+        if nombre >= 0:
+            datos["name"] = vocabulario_nombre[nombre]
+        aristas.append((nodos[u], nodos[v], datos))
+    digrafo.add_edges_from(aristas)
+    return digrafo
+
+
+class CallesCompiladas:
+    """
+    Datos geográficos de las calles leídos directamente de los arrays de la caché del grafo
+    (ver carga_arrays_grafo): bastan para generar las instrucciones de una ruta y dibujarla
+    sin construir el digrafo de NetworkX. Las aristas están en el orden de la adyacencia CSR.
+
+    Attributes:
+        nodos (List[int]): Identificador de cada nodo.
+        indice (Dict[int, int]): Índice de cada nodo en los arrays.
+        x (np.ndarray): Longitud geográfica de cada nodo.
+        y (np.ndarray): Latitud geográfica de cada nodo.
+        offsets (np.ndarray): Inicio de los sucesores de cada nodo (tamaño n+1).
+        destinos (np.ndarray): Índice del nodo destino de cada arista.
+        longitudes (np.ndarray): Longitud en metros de cada arista.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, object]):
+        """
+        Args:
+            arrays (Dict[str, np.ndarray]): Arrays de la caché del grafo.
+            meta (Dict[str, object]): Metadatos de la caché del grafo.
+        """
+        self.nodos = arrays["nodos"].tolist()
+        self.indice = {v: i for i, v in enumerate(self.nodos)}
+        self.x = arrays["x"]
+        self.y = arrays["y"]
+        self.offsets = arrays["offsets"]
+        self.destinos = arrays["destinos"]
+        self.longitudes = arrays["length"]
+        self._nombres = arrays["name"]
+        self._vocabulario_nombres = [json.loads(n) for n in meta["name"]]
+
+    def aristas(self, ruta: list) -> np.ndarray:
+        """
+        Devuelve la posición en la adyacencia CSR de cada arista de la ruta.
+
+        Args:
+            ruta (list): Lista de nodos de la ruta.
+        Returns:
+            np.ndarray: Posición de cada arista (u, v) consecutiva de la ruta.
+        Raises:
+            KeyError: Si dos nodos consecutivos de la ruta no forman una arista.
+        """
+        posiciones = []
+        for u, v in zip(ruta, ruta[1:]):
+            inicio, fin = int(self.offsets[self.indice[u]]), int(self.offsets[self.indice[u] + 1])
+            encontradas = np.flatnonzero(self.destinos[inicio:fin] == self.indice[v])
+            if len(encontradas) == 0:
+                raise KeyError(f"La arista ({u}, {v}) no pertenece al grafo.")
+            posiciones.append(inicio + int(encontradas[0]))
+        return np.array(posiciones, dtype=np.int64)
+
+    def nombres(self, posiciones: np.ndarray, defecto: object = None) -> list:
+        """
+        Devuelve el nombre de la calle de cada arista.
+
+        Args:
+            posiciones (np.ndarray): Posición de cada arista en la adyacencia CSR.
+            defecto (object, opcional): Nombre de las aristas sin nombre. Por defecto, None.
+        Returns:
+            list: Nombre de cada arista, como el atributo "name" del digrafo.
+        """
+        return [self._vocabulario_nombres[codigo] if codigo >= 0 else defecto for codigo in self._nombres[posiciones].tolist()]
+
+
+def carga_cache_grafo(directorio: str = GRAPH_CACHE_DIR) -> Tuple[nx.DiGraph, Dict[str, np.ndarray]]:
+    """
+    Carga el digrafo guardado con guarda_cache_grafo. Los arrays se abren proyectados en
+    memoria y se devuelven también para poder construir estructuras como GrafoCompilado
+    sin recorrer el grafo.
+
+    Args:
+        directorio (str, opcional): Directorio de la caché. Por defecto, GRAPH_CACHE_DIR.
+    Returns:
+        Tuple[nx.DiGraph, Dict[str, np.ndarray]]: Digrafo de las calles y arrays de la caché.
+    Raises:
+        FileNotFoundError: Si la caché no existe.
+    """
+    arrays, meta = carga_arrays_grafo(directorio)
+    return digrafo_desde_arrays(arrays, meta), arrays
+
+
+def _cache_grafo_valida(directorio: str) -> bool:
+    """
+    Comprueba si la caché binaria del directorio corresponde a MAP_FILE_NAME: la fecha de modificación
+    y el tamaño no han cambiado o, si ha cambiado la fecha, el hash de su contenido sigue siendo el mismo
+    (en ese caso se actualiza la firma guardada).
+    """
+    fichero_meta = os.path.join(directorio, "meta.json")
+    if not (os.path.exists(MAP_FILE_NAME) and os.path.exists(fichero_meta)):
+        return False
+    with open(fichero_meta, encoding="utf-8") as f:
+        meta = json.load(f)
+    guardada = meta["firma"]
+    firma = _firma_fichero(MAP_FILE_NAME, con_hash=False)
+    valida = firma["mtime"] == guardada.get("mtime") and firma["size"] == guardada.get("size")
+    if not valida and firma["size"] == guardada.get("size"):
+        #Solo ha cambiado la fecha: comprobamos el contenido y, si es el mismo, actualizamos la firma
+        firma = _firma_fichero(MAP_FILE_NAME, con_hash=True)
+        valida = firma["sha1"] == guardada.get("sha1")
+        if valida:
+            meta["firma"] = firma
+            with open(fichero_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+    return valida
+
+
+def carga_arrays_procesados(directorio: str = GRAPH_CACHE_DIR) -> Tuple[Dict[str, np.ndarray], Dict[str, object]]:
+    """
+    Devuelve los arrays y metadatos de la caché binaria del grafo procesado (ver carga_arrays_grafo),
+    regenerándola antes si no es válida. Sirve para compilar el grafo sin construir el digrafo.
+
+    Args:
+        directorio (str, opcional): Directorio de la caché. Por defecto, GRAPH_CACHE_DIR.
+    Returns:
+        Tuple[Dict[str, np.ndarray], Dict[str, object]]: Arrays y metadatos de la caché.
+    Raises:
+        RuntimeError: Si ocurre algún error al descargar o cargar el grafo.
+    """
+    if not _cache_grafo_valida(directorio):
+        guarda_cache_grafo(procesa_grafo(carga_grafo()), directorio, _firma_fichero(MAP_FILE_NAME, con_hash=True))
+    return carga_arrays_grafo(directorio)
+
+
+def carga_grafo_procesado(directorio: str = GRAPH_CACHE_DIR) -> nx.DiGraph:
+    """
+    Devuelve el digrafo procesado de las calles de Madrid usando la caché binaria si es válida.
+
+    La caché es válida si la fecha de modificación y el tamaño de MAP_FILE_NAME no han cambiado o,
+    si ha cambiado la fecha, si el hash de su contenido sigue siendo el mismo. En otro caso
+    se carga el grafo con carga_grafo, se procesa con procesa_grafo y se regenera la caché.
+
+    Args:
+        directorio (str, opcional): Directorio de la caché. Por defecto, GRAPH_CACHE_DIR.
+    Returns:
+        nx.DiGraph: Grafo dirigido y sin bucles de las calles de Madrid.
+    Raises:
+        RuntimeError: Si ocurre algún error al descargar o cargar el grafo.
+    """
+    if _cache_grafo_valida(directorio):
+        return digrafo_desde_arrays(*carga_arrays_grafo(directorio))
+
+    digrafo = procesa_grafo(carga_grafo())
+    guarda_cache_grafo(digrafo, directorio, _firma_fichero(MAP_FILE_NAME, con_hash=True))
+    return digrafo
+
+
+def poligono_isocrona(grafo: nx.DiGraph, nodos) -> np.ndarray:
+    """
+    Calcula la envolvente convexa de las posiciones geográficas de un conjunto de nodos, por ejemplo
+    los alcanzables devueltos por grafo_pesado.isocronas_compilado.
+
+    Args:
+        grafo (nx.DiGraph): Grafo dirigido de las calles, con información geográfica en los nodos.
+        nodos (iterable): Nodos del grafo.
+    Returns:
+        np.ndarray: Array k x 2 con los vértices (longitud, latitud) del polígono en sentido antihorario,
+            sin repetir el primero. Con menos de tres puntos distintos se devuelven esos puntos.
+    """
+    puntos = np.unique(np.array([(grafo.nodes[v]['x'], grafo.nodes[v]['y']) for v in nodos], dtype=np.float64).reshape(-1, 2), axis=0)
+    if len(puntos) < 3:
+        return puntos
+
+    #Cadena monótona de Andrew sobre los puntos ordenados por longitud y latitud
+    def cadena(puntos: np.ndarray) -> list:
+        resultado = []
+        for p in puntos.tolist():
+            while len(resultado) >= 2:
+                (ax, ay), (bx, by) = resultado[-2], resultado[-1]
+                if (bx - ax) * (p[1] - ay) - (by - ay) * (p[0] - ax) > 0:
+                    break
+                resultado.pop()
+            resultado.append(p)
+        return resultado
+
+    inferior = cadena(puntos)
+    superior = cadena(puntos[::-1])
+    return np.array(inferior[:-1] + superior[:-1])
+
+
+def segmentos_isocrona(grafo: nx.DiGraph, aristas) -> np.ndarray:
+    """
+    Convierte las aristas alcanzables devueltas por grafo_pesado.aristas_alcanzables_compilado en
+    segmentos geográficos, recortando las aristas que solo se alcanzan en parte.
+
+    Args:
+        grafo (nx.DiGraph): Grafo dirigido de las calles, con información geográfica en los nodos.
+        aristas (iterable): Aristas (u, v, fraccion).
+    Returns:
+        np.ndarray: Array m x 2 x 2 con los extremos (longitud, latitud) de cada segmento.
+    """
+    aristas = list(aristas)
+    origen = np.array([(grafo.nodes[u]['x'], grafo.nodes[u]['y']) for u, _, _ in aristas], dtype=np.float64).reshape(-1, 2)
+    destino = np.array([(grafo.nodes[v]['x'], grafo.nodes[v]['y']) for _, v, _ in aristas], dtype=np.float64).reshape(-1, 2)
+    fraccion = np.array([f for _, _, f in aristas], dtype=np.float64).reshape(-1, 1)
+    return np.stack([origen, origen + fraccion * (destino - origen)], axis=1)
+
+
+#Nivel de compresión zlib de los PNG exportados: el mínimo, porque comprimir cuesta más que dibujar la ruta
+COMPRESION_PNG = 1
+
+
+class MapaBase:
+    """
+    Mapa de calles de un grafo preparado una sola vez para dibujar rutas encima.
+
+    Las calles se convierten en segmentos (las de doble sentido una sola vez), se dibujan con una
+    LineCollection en una imagen que se guarda en memoria y cada ruta solo añade sobre esa imagen
+    sus aristas y sus extremos. Las figuras que no se muestran se dibujan con el backend Agg
+    sin pasar por pyplot, por lo que la exportación a PNG funciona sin pantalla.
+    Si el grafo cambia hay que construir un MapaBase nuevo.
+
+    Attributes:
+        grafo (Union[nx.DiGraph, CallesCompiladas]): Grafo dirigido de las calles o calles de la caché del grafo.
+        segmentos (np.ndarray): Array m x 2 x 2 con los extremos (longitud, latitud) de cada calle.
+        extension (Tuple[float, float, float, float]): Longitud mínima y máxima y latitud mínima y máxima del mapa.
+        imagen (np.ndarray): Imagen RGBA de las calles que cubre exactamente "extension".
+    """
+
+    def __init__(self, grafo: Union[nx.DiGraph, CallesCompiladas], tamano: Tuple[float, float] = (10, 10), dpi: int = 100):
+        """
+        Args:
+            grafo (Union[nx.DiGraph, CallesCompiladas]): Grafo dirigido de las calles, con información geográfica
+                en los nodos, o las calles leídas de la caché del grafo.
+            tamano (Tuple[float, float], opcional): Tamaño de las figuras en pulgadas. Por defecto, (10, 10).
+            dpi (int, opcional): Resolución de la imagen de las calles. Por defecto, 100.
+        """
+        self.grafo = grafo
+        self.tamano = tamano
+        self.dpi = dpi
+        if isinstance(grafo, CallesCompiladas):
+            #Los nodos y las aristas se toman directamente de los arrays de la caché
+            self.indice = grafo.indice
+            self.x = np.asarray(grafo.x, dtype=np.float64)
+            self.y = np.asarray(grafo.y, dtype=np.float64)
+            u = np.repeat(np.arange(len(grafo.nodos), dtype=np.int64), np.diff(grafo.offsets))
+            v = np.asarray(grafo.destinos, dtype=np.int64)
+        else:
+            self.indice = {nodo: i for i, nodo in enumerate(grafo.nodes)}
+            self.x = np.fromiter((datos['x'] for _, datos in grafo.nodes(data=True)), dtype=np.float64, count=len(self.indice))
+            self.y = np.fromiter((datos['y'] for _, datos in grafo.nodes(data=True)), dtype=np.float64, count=len(self.indice))
+            m = grafo.number_of_edges()
+            u = np.fromiter((self.indice[a] for a, _ in grafo.edges), dtype=np.int64, count=m)
+            v = np.fromiter((self.indice[b] for _, b in grafo.edges), dtype=np.int64, count=m)
+
+        #Cada calle de doble sentido aparece como dos aristas: nos quedamos con una por par de nodos
+        _, unicas = np.unique(np.minimum(u, v) * len(self.indice) + np.maximum(u, v), return_index=True)
+        u, v = u[unicas], v[unicas]
+        self.segmentos = np.stack([np.column_stack([self.x[u], self.y[u]]), np.column_stack([self.x[v], self.y[v]])], axis=1)
+
+        #Un pequeño margen para que las calles del borde y los extremos de las rutas no queden cortados
+        margen_x = 0.01 * max(np.ptp(self.x), 1e-9) if len(self.x) else 1
+        margen_y = 0.01 * max(np.ptp(self.y), 1e-9) if len(self.y) else 1
+        if len(self.x):
+            self.extension = (self.x.min() - margen_x, self.x.max() + margen_x, self.y.min() - margen_y, self.y.max() + margen_y)
+        else:
+            self.extension = (0.0, 1.0, 0.0, 1.0)
+        self.imagen = self._rasteriza()
+
+    def _rasteriza(self) -> np.ndarray:
+        """Dibuja todas las calles en gris en una imagen RGBA sin ejes ni márgenes."""
+        figura = Figure(figsize=self.tamano, dpi=self.dpi)
+        lienzo = FigureCanvasAgg(figura)
+        ejes = figura.add_axes([0, 0, 1, 1])
+        ejes.set_axis_off()
+        ejes.add_collection(LineCollection(self.segmentos, colors="gray", linewidths=0.5, alpha=0.8))
+        ejes.set_xlim(self.extension[0], self.extension[1])
+        ejes.set_ylim(self.extension[2], self.extension[3])
+        lienzo.draw()
+        return np.asarray(lienzo.buffer_rgba()).copy()
+
+    def figura(self, ruta: list = None, figura: Figure = None) -> Figure:
+        """
+        Dibuja el mapa con la ruta resaltada: sus aristas en rojo, el origen en rojo y el destino en verde.
+
+        Args:
+            ruta (list, opcional): Lista de nodos de la ruta. Por defecto, None (solo el mapa).
+            figura (Figure, opcional): Figura vacía en la que dibujar, p. ej. una de pyplot. Por defecto,
+                una figura nueva fuera de pyplot con el backend Agg.
+        Returns:
+            Figure: Figura con el mapa.
+        """
+        if figura is None:
+            figura = Figure(figsize=self.tamano, dpi=self.dpi)
+            FigureCanvasAgg(figura)
+        ejes = figura.add_subplot()
+        ejes.set_axis_off()
+        ejes.imshow(self.imagen, extent=self.extension, aspect="auto", interpolation="antialiased")
+
+        if ruta:
+            indices = [self.indice[nodo] for nodo in ruta]
+            ejes.plot(self.x[indices], self.y[indices], color="red", linewidth=1.5)
+            ejes.scatter(self.x[indices[:1]], self.y[indices[:1]], s=50, color="red", label="Origen", zorder=3)
+            ejes.scatter(self.x[indices[-1:]], self.y[indices[-1:]], s=50, color="green", label="Destino", zorder=3)
+        ejes.set_xlim(self.extension[0], self.extension[1])
+        ejes.set_ylim(self.extension[2], self.extension[3])
+        ejes.set_title("Mapa con ruta" if ruta else "Mapa")
+        return figura
+
+    def guarda(self, fichero: str, ruta: list = None) -> None:
+        """
+        Exporta a PNG el mapa con la ruta resaltada, sin abrir ninguna ventana.
+
+        Args:
+            fichero (str): Ruta del fichero de imagen.
+            ruta (list, opcional): Lista de nodos de la ruta. Por defecto, None (solo el mapa).
+        """
+        self.figura(ruta).savefig(fichero, pil_kwargs={"compress_level": COMPRESION_PNG})
+
+
+#Último mapa construido y referencia débil al grafo del que procede
+_mapa_grafo = (None, None)
+
+
+def mapa_base(grafo: Union[nx.DiGraph, CallesCompiladas]) -> MapaBase:
+    """
+    Devuelve el mapa de calles del grafo, construyéndolo solo la primera vez que se pide para ese grafo.
+
+    Args:
+        grafo (Union[nx.DiGraph, CallesCompiladas]): Grafo dirigido de las calles, con información geográfica
+            en los nodos, o las calles leídas de la caché del grafo.
+    Returns:
+        MapaBase: Mapa de calles del grafo.
+    """
+    global _mapa_grafo
+    referencia, mapa = _mapa_grafo
+    if referencia is None or referencia() is not grafo:
+        mapa = MapaBase(grafo)
+        _mapa_grafo = (weakref.ref(grafo), mapa)
+    return mapa
+
+
+def dibuja_grafo(grafo: Union[nx.DiGraph, CallesCompiladas], ruta: list = None, fichero: str = None, mostrar: bool = True) -> None:
     """
     Función que dibuja el grafo dirigido usando las posiciones geográficas de los nodos.
     Resalta la ruta si se proporciona.
 
+    Las calles se dibujan una única vez por grafo (ver MapaBase) y en cada llamada solo se
+    añade la ruta, por lo que dibujar cuesta mucho menos que recorrer todas las aristas.
+
     Args:
-        grafo (nx.DiGraph): Grafo dirigido de las calles, con información geográfica en los nodos.
+        grafo (Union[nx.DiGraph, CallesCompiladas]): Grafo dirigido de las calles, con información geográfica
+            en los nodos, o las calles leídas de la caché del grafo (ver CallesCompiladas).
         ruta (list, opcional): Lista de nodos que forman la ruta a resaltar. Por defecto, None.
+        fichero (str, opcional): Fichero PNG en el que guardar el mapa. Por defecto, None.
+        mostrar (bool, opcional): Si se muestra el mapa en una ventana. Con False no se usa pyplot,
+            lo que permite exportar mapas sin pantalla. Por defecto, True.
     
     Returns:
         None: La función dibuja el grafo y no devuelve ningún valor.
     """
-    #Extraemos las posiciones geográficas de los nodos y las introducimos en un diccionario
-    posiciones = {}
-    for nodo, data in grafo.nodes(data=True):
-        posiciones[nodo] = (data['x'], data['y'])
-
-    plt.figure(figsize=(10, 10))
-
-    #Dibuja todas las calles en gris
-    nx.draw(
-        grafo,
-        pos=posiciones,
-        node_size=0,       
-        edge_color="gray",
-        width=0.5,        
-        alpha=0.8,  
-        #Quitamos las flechas del nodo para verlo con más claridad y que no se vea tan gordo     
-        arrows=False  
-    )
-
-    #Crear una lista de pares con las aristas de la ruta
-    aristas_ruta = []
-    for i in range(len(ruta) - 1):
-        aristas_ruta.append((ruta[i], ruta[i + 1]))
-
-    #Dibujar las aristas de la ruta en rojo para poder visualizarlo
-    nx.draw_networkx_edges(
-        grafo,
-        pos=posiciones,
-        edgelist=aristas_ruta,
-        edge_color="red",
-        width=1.5, 
-        #Quitamos las flechas del nodo para verlo con más claridad y que no se vea tan gordo 
-        arrows=False   
-    )
-
-    #Resaltar el nodo de origen (primer nodo de la ruta) en verde
-    nx.draw_networkx_nodes(
-        grafo,
-        pos=posiciones,
-        #Primer nodo (origen)
-        nodelist=[ruta[0]],
-        node_size=50,
-        node_color="red",
-        label="Origen"
-    )
-
-    #Resaltar el nodo de destino (último nodo de la ruta) en azul
-    nx.draw_networkx_nodes(
-        grafo,
-        pos=posiciones,
-        #último nodo (destino)
-        nodelist=[ruta[-1]],
-        node_size=50,
-        node_color="green",
-        label="Destino"
-    )
-
-    plt.title("Mapa con ruta")
+    mapa = mapa_base(grafo)
+    if not mostrar:
+        if fichero is not None:
+            mapa.guarda(fichero, ruta)
+        return
+
+    figura = mapa.figura(ruta, plt.figure(figsize=mapa.tamano))
+    if fichero is not None:
+        figura.savefig(fichero, pil_kwargs={"compress_level": COMPRESION_PNG})
     plt.show()
-
-
@@ -0,0 +1,475 @@
+"""
+contraccion.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Jerarquías de contracción (Contraction Hierarchies) para responder muchas consultas
+de camino mínimo sobre un grafo estático.
+
+El preprocesado contrae los vértices de uno en uno, de menos a más importante, añadiendo
+atajos entre sus vecinos cuando no existe un camino alternativo igual de corto (testigo).
+Cada vértice recibe así un rango y las consultas solo recorren aristas hacia vértices de
+rango mayor, con una búsqueda hacia delante desde el origen y otra hacia atrás desde el
+destino. Los atajos del camino encontrado se desempaquetan después en las aristas originales.
+
+Las jerarquías se guardan en disco en formato .npz, una por cada función de peso, junto con
+una firma del grafo y de los pesos con la que se construyeron.
+"""
+
+from typing import List, Tuple, Dict, Callable, Union
+import networkx as nx
+import numpy as np
+import hashlib
+import heapq
+import os
+
+from grafo_pesado import INFTY
+
+#Número máximo de vértices que fija una búsqueda de testigos antes de rendirse
+LIMITE_TESTIGOS = 200
+
+
+class JerarquiaContraccion:
+    """
+    Jerarquía de contracción de un grafo para una función de peso.
+
+    Las aristas de la jerarquía (originales y atajos) se guardan en dos estructuras CSR:
+    "arriba" contiene, para cada vértice, las aristas que salen hacia vértices de rango mayor
+    y "abajo" las aristas que llegan desde vértices de rango mayor. Cada arista guarda además
+    el vértice contraído que representa (-1 si es una arista original).
+
+    Attributes:
+        nodos (List[object]): Vértice original asociado a cada índice.
+        indice (Dict[object, int]): Índice asociado a cada vértice original.
+        rango (np.ndarray): Posición de cada vértice en el orden de contracción.
+        firma (str): Firma del grafo y de los pesos con los que se construyó (ver firma_grafo).
+    """
+
+    def __init__(self, nodos: List[object], rango: np.ndarray, arriba: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray], abajo: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray], firma: str = ""):
+        """
+        Args:
+            nodos (List[object]): Vértice original asociado a cada índice.
+            rango (np.ndarray): Rango de cada vértice.
+            arriba (Tuple): Arrays offsets, destinos, pesos y vértice intermedio de las aristas hacia arriba.
+            abajo (Tuple): Arrays offsets, orígenes, pesos y vértice intermedio de las aristas desde arriba.
+            firma (str, opcional): Firma del grafo y de los pesos. Por defecto, vacía.
+        """
+        self.nodos = list(nodos)
+        self.firma = firma
+        self.indice = {v: i for i, v in enumerate(self.nodos)}
+        self.rango = rango
+        self.arriba = arriba
+        self.abajo = abajo
+        #Listas de Python para las búsquedas
+        self._arriba = [a.tolist() for a in arriba]
+        self._abajo = [a.tolist() for a in abajo]
+        self._rango = rango.tolist()
+
+    def __len__(self) -> int:
+        return len(self.nodos)
+
+    def numero_aristas(self) -> int:
+        """Devuelve el número de aristas de la jerarquía, incluidos los atajos."""
+        return len(self.arriba[1]) + len(self.abajo[1])
+
+    def guarda(self, fichero: str) -> None:
+        """
+        Guarda la jerarquía en un fichero .npz. Los vértices originales no se guardan: al cargarla
+        se toman del grafo, cuyo orden y pesos garantiza la firma.
+
+        Args:
+            fichero (str): Ruta del fichero.
+        """
+        np.savez(fichero, firma=np.array(self.firma), rango=self.rango,
+                 arriba_offsets=self.arriba[0], arriba_destinos=self.arriba[1], arriba_pesos=self.arriba[2], arriba_medio=self.arriba[3],
+                 abajo_offsets=self.abajo[0], abajo_origenes=self.abajo[1], abajo_pesos=self.abajo[2], abajo_medio=self.abajo[3])
+
+    @classmethod
+    def carga(cls, fichero: str, G: Union[nx.Graph, nx.DiGraph], peso: Callable) -> "JerarquiaContraccion":
+        """
+        Carga una jerarquía guardada con "guarda" para el grafo y la función de peso dados.
+
+        Args:
+            fichero (str): Ruta del fichero.
+            G (Union[nx.Graph, nx.DiGraph]): Grafo con el que se construyó la jerarquía.
+            peso (Callable): Función de peso con la que se construyó la jerarquía.
+        Returns:
+            JerarquiaContraccion: Jerarquía cargada.
+        Raises:
+            FileNotFoundError: Si el fichero no existe.
+            ValueError: Si la jerarquía no corresponde al grafo o a los pesos.
+        """
+        firma = firma_grafo(G, peso)
+        with np.load(fichero) as datos:
+            if "firma" not in datos or str(datos["firma"]) != firma:
+                raise ValueError("La jerarquía de contracción no corresponde al grafo.")
+            arriba = (datos["arriba_offsets"], datos["arriba_destinos"], datos["arriba_pesos"], datos["arriba_medio"])
+            abajo = (datos["abajo_offsets"], datos["abajo_origenes"], datos["abajo_pesos"], datos["abajo_medio"])
+            return cls(list(G.nodes), datos["rango"], arriba, abajo, firma)
+
+    def _arista(self, u: int, w: int) -> Tuple[float, int]:
+        """Devuelve el peso y el vértice intermedio de la arista u->w de la jerarquía."""
+        if self._rango[u] < self._rango[w]:
+            offsets, vecinos, pesos, medio = self._arriba
+            v, x = u, w
+        else:
+            offsets, vecinos, pesos, medio = self._abajo
+            v, x = w, u
+        for i in range(offsets[v], offsets[v + 1]):
+            if vecinos[i] == x:
+                return pesos[i], medio[i]
+        raise KeyError(f"La arista ({u}, {w}) no pertenece a la jerarquía.")
+
+    def _desempaqueta(self, camino: List[int]) -> List[int]:
+        """Sustituye cada atajo del camino por las aristas originales que representa."""
+        resultado = [camino[0]]
+        #Pila de aristas pendientes, con la primera arista del camino en la cima
+        pila = [(camino[i], camino[i + 1]) for i in range(len(camino) - 2, -1, -1)]
+        while pila:
+            u, w = pila.pop()
+            _, m = self._arista(u, w)
+            if m < 0:
+                resultado.append(w)
+            else:
+                pila.append((m, w))
+                pila.append((u, m))
+        return resultado
+
+    def _busqueda(self, s: int, t: int) -> Tuple[float, List[int]]:
+        """
+        Búsqueda bidireccional hacia arriba entre los índices s y t.
+        Devuelve la distancia y el camino en la jerarquía (con atajos), vacío si no hay camino.
+        """
+        grafos = [self._arriba, self._abajo]
+        distancias = [{s: 0}, {t: 0}]
+        padres = [{s: -1}, {t: -1}]
+        visitados = [set(), set()]
+        colas = [[(0, s)], [(0, t)]]
+        mejor = INFTY
+        encuentro = -1
+
+        while colas[0] or colas[1]:
+            #Cada búsqueda se detiene cuando su mínimo ya no puede mejorar el mejor camino
+            for lado in (0, 1):
+                if colas[lado] and colas[lado][0][0] >= mejor:
+                    colas[lado] = []
+            if not colas[0] and not colas[1]:
+                break
+            lado = 0 if colas[0] and (not colas[1] or colas[0][0][0] <= colas[1][0][0]) else 1
+
+            d_v, v = heapq.heappop(colas[lado])
+            if v in visitados[lado]:
+                continue
+            visitados[lado].add(v)
+            distancia = distancias[lado]
+
+            otra = distancias[1 - lado]
+            if v in otra and d_v + otra[v] < mejor:
+                mejor = d_v + otra[v]
+                encuentro = v
+
+            #Stall-on-demand: si un vértice de rango mayor llega a v con menor coste, v no es parte de un camino mínimo ascendente
+            offsets, vecinos, pesos, _ = grafos[1 - lado]
+            if any(distancia.get(vecinos[i], INFTY) + pesos[i] < d_v for i in range(offsets[v], offsets[v + 1])):
+                continue
+
+            offsets, vecinos, pesos, _ = grafos[lado]
+            for i in range(offsets[v], offsets[v + 1]):
+                x = vecinos[i]
+                d_x = d_v + pesos[i]
+                if d_x < distancia.get(x, INFTY):
+                    distancia[x] = d_x
+                    padres[lado][x] = v
+                    heapq.heappush(colas[lado], (d_x, x))
+
+        if encuentro < 0:
+            return INFTY, []
+
+        camino = []
+        actual = encuentro
+        while actual != -1:
+            camino.append(actual)
+            actual = padres[0][actual]
+        camino.reverse()
+        actual = padres[1][encuentro]
+        while actual != -1:
+            camino.append(actual)
+            actual = padres[1][actual]
+        return mejor, camino
+
+    def distancia(self, origen: object, destino: object) -> float:
+        """
+        Calcula el peso del camino mínimo entre dos vértices.
+
+        Args:
+            origen (object): vértice de origen.
+            destino (object): vértice de destino.
+        Returns:
+            float: Peso del camino mínimo (INFTY si no existe).
+        Raises:
+            KeyError: Si origen o destino no son vértices del grafo.
+        """
+        distancia, _ = self._busqueda(self.indice[origen], self.indice[destino])
+        return distancia
+
+    def camino_minimo(self, origen: object, destino: object) -> List[object]:
+        """
+        Calcula el camino mínimo entre dos vértices, con los atajos desempaquetados.
+
+        Args:
+            origen (object): vértice de origen.
+            destino (object): vértice de destino.
+        Returns:
+            List[object]: Lista con los vértices del grafo original por los que pasa el camino.
+        Raises:
+            KeyError: Si origen o destino no son vértices del grafo.
+            ValueError: Si no existe camino entre origen y destino.
+        """
+        _, camino = self._busqueda(self.indice[origen], self.indice[destino])
+        if not camino:
+            raise ValueError("No existe camino entre origen y destino.")
+        return [self.nodos[v] for v in self._desempaqueta(camino)]
+
+
+    def _espacio_ascendente(self, s: int, lado: int) -> Dict[int, float]:
+        """
+        Búsqueda completa hacia arriba desde s, hacia delante (lado 0) o hacia atrás (lado 1).
+        Devuelve la distancia de los vértices fijados que no se descartan por stall-on-demand.
+        """
+        grafo, otro = (self._arriba, self._abajo) if lado == 0 else (self._abajo, self._arriba)
+        distancia = {s: 0}
+        fijados = {}
+        Q = [(0, s)]
+        while Q:
+            d_v, v = heapq.heappop(Q)
+            if v in fijados or d_v > distancia[v]:
+                continue
+            offsets, vecinos, pesos, _ = otro
+            if any(distancia.get(vecinos[i], INFTY) + pesos[i] < d_v for i in range(offsets[v], offsets[v + 1])):
+                continue
+            fijados[v] = d_v
+            offsets, vecinos, pesos, _ = grafo
+            for i in range(offsets[v], offsets[v + 1]):
+                x = vecinos[i]
+                d_x = d_v + pesos[i]
+                if d_x < distancia.get(x, INFTY):
+                    distancia[x] = d_x
+                    heapq.heappush(Q, (d_x, x))
+        return fijados
+
+    def matriz(self, origenes: List[object], destinos: List[object]) -> np.ndarray:
+        """
+        Calcula la matriz de pesos de los caminos mínimos entre cada origen y cada destino con cubos
+        (buckets): cada destino deja en los vértices de su búsqueda hacia atrás su distancia y cada
+        origen solo recorre su búsqueda hacia delante consultando esos cubos.
+
+        Args:
+            origenes (List[object]): vértices de origen (filas).
+            destinos (List[object]): vértices de destino (columnas).
+        Returns:
+            np.ndarray: Matriz len(origenes) x len(destinos) de pesos (np.inf si no hay camino).
+        Raises:
+            KeyError: Si algún vértice no pertenece al grafo.
+        """
+        filas = [self.indice[v] for v in origenes]
+        columnas = [self.indice[v] for v in destinos]
+        cubos = {}
+        for j, t in enumerate(columnas):
+            for v, d in self._espacio_ascendente(t, 1).items():
+                cubos.setdefault(v, []).append((j, d))
+
+        matriz = np.full((len(filas), len(columnas)), np.inf)
+        for i, s in enumerate(filas):
+            fila = [INFTY] * len(columnas)
+            for v, d_s in self._espacio_ascendente(s, 0).items():
+                for j, d_t in cubos.get(v, ()):
+                    if d_s + d_t < fila[j]:
+                        fila[j] = d_s + d_t
+            matriz[i] = fila
+        matriz[matriz == INFTY] = np.inf
+        return matriz
+
+def _testigos(salida: List[Dict[int, Tuple[float, int]]], origen: int, excluido: int, limite: float, objetivos: Dict[int, float]) -> Dict[int, float]:
+    """
+    Búsqueda local de testigos desde "origen" sin pasar por "excluido". Se detiene al superar
+    "limite", al fijar todos los objetivos o tras LIMITE_TESTIGOS vértices.
+    Devuelve las distancias (posiblemente no definitivas) encontradas.
+    """
+    distancias = {origen: 0}
+    visitado = set()
+    pendientes = len(objetivos)
+    Q = [(0, origen)]
+    while Q and len(visitado) < LIMITE_TESTIGOS:
+        d_v, v = heapq.heappop(Q)
+        if v in visitado:
+            continue
+        if d_v > limite:
+            break
+        visitado.add(v)
+        if v in objetivos:
+            pendientes -= 1
+            if pendientes == 0:
+                break
+        for x, (p, _) in salida[v].items():
+            if x == excluido:
+                continue
+            d_x = d_v + p
+            if d_x < distancias.get(x, INFTY):
+                distancias[x] = d_x
+                heapq.heappush(Q, (d_x, x))
+    return distancias
+
+
+def _atajos(salida: List[Dict[int, Tuple[float, int]]], entrada: List[Dict[int, Tuple[float, int]]], v: int) -> List[Tuple[int, int, float]]:
+    """Calcula los atajos (u, w, peso) necesarios para contraer el vértice v."""
+    atajos = []
+    for u, (p_u, _) in entrada[v].items():
+        objetivos = {w: p_u + p_w for w, (p_w, _) in salida[v].items() if w != u}
+        if not objetivos:
+            continue
+        distancias = _testigos(salida, u, v, max(objetivos.values()), objetivos)
+        for w, peso in objetivos.items():
+            #Sin un testigo de peso menor o igual, el único camino mínimo pasa por v
+            if distancias.get(w, INFTY) > peso:
+                atajos.append((u, w, peso))
+    return atajos
+
+
+def firma_grafo(G: Union[nx.Graph, nx.DiGraph], peso: Callable) -> str:
+    """
+    Calcula una firma SHA-1 de los vértices (en su orden), las aristas y los pesos de un grafo.
+
+    Cualquier cambio en un vértice, una arista o un peso cambia la firma, así que sirve para
+    saber si una jerarquía guardada sigue correspondiendo al grafo.
+
+    Args:
+        G (Union[nx.Graph, nx.DiGraph]): Grafo (dirigido o no dirigido).
+        peso (Callable): Función de peso de las aristas.
+    Returns:
+        str: Firma en hexadecimal.
+    """
+    nodos = list(G.nodes)
+    indice = {v: i for i, v in enumerate(nodos)}
+    aristas = list(G.edges())
+    sha1 = hashlib.sha1()
+    sha1.update(repr((G.is_directed(), len(nodos), len(aristas))).encode())
+    sha1.update(repr(nodos).encode())
+    sha1.update(np.array([(indice[u], indice[w]) for u, w in aristas], dtype=np.int64).tobytes())
+    sha1.update(np.array([peso(G, u, w) for u, w in aristas], dtype=np.float64).tobytes())
+    return sha1.hexdigest()
+
+
+def contrae(G: Union[nx.Graph, nx.DiGraph], peso: Union[Callable[[nx.Graph, object, object], float], Callable[[nx.DiGraph, object, object], float]]) -> JerarquiaContraccion:
+    """
+    Construye la jerarquía de contracción de un grafo para una función de peso.
+
+    El orden de contracción se elige con una cola de prioridad perezosa según la diferencia
+    de aristas (atajos añadidos menos aristas eliminadas) más el número de vecinos ya contraídos.
+
+    Args:
+        G (Union[nx.Graph, nx.DiGraph]): Grafo (dirigido o no dirigido).
+        peso (Callable): Función de peso de las aristas.
+    Returns:
+        JerarquiaContraccion: Jerarquía de contracción del grafo.
+    """
+    nodos = list(G.nodes)
+    indice = {v: i for i, v in enumerate(nodos)}
+    n = len(nodos)
+
+    #Grafo que queda por contraer: salida[u][w] = entrada[w][u] = (peso, vértice intermedio)
+    salida = [{} for _ in range(n)]
+    entrada = [{} for _ in range(n)]
+    aristas = G.edges() if G.is_directed() else [a for u, v in G.edges() for a in ((u, v), (v, u))]
+    for u, w in aristas:
+        if u == w:
+            continue
+        i, j = indice[u], indice[w]
+        p = peso(G, u, w)
+        if p < salida[i].get(j, (INFTY,))[0]:
+            salida[i][j] = (p, -1)
+            entrada[j][i] = (p, -1)
+
+    vecinos_contraidos = [0] * n
+
+    def prioridad(v: int) -> int:
+        return len(_atajos(salida, entrada, v)) - len(salida[v]) - len(entrada[v]) + vecinos_contraidos[v]
+
+    rango = [-1] * n
+    arriba = [[] for _ in range(n)]
+    abajo = [[] for _ in range(n)]
+    Q = [(prioridad(v), v) for v in range(n)]
+    heapq.heapify(Q)
+    orden = 0
+
+    while Q:
+        _, v = heapq.heappop(Q)
+        #Actualización perezosa: si la prioridad ha empeorado, volvemos a encolar el vértice
+        p_v = prioridad(v)
+        if Q and p_v > Q[0][0]:
+            heapq.heappush(Q, (p_v, v))
+            continue
+
+        for u, w, p in _atajos(salida, entrada, v):
+            if p < salida[u].get(w, (INFTY,))[0]:
+                salida[u][w] = (p, v)
+                entrada[w][u] = (p, v)
+
+        rango[v] = orden
+        orden += 1
+
+        #Todas las aristas que quedan en v van a vértices aún sin contraer, es decir, de rango mayor
+        for w, (p, m) in salida[v].items():
+            arriba[v].append((w, p, m))
+            del entrada[w][v]
+            vecinos_contraidos[w] += 1
+        for u, (p, m) in entrada[v].items():
+            abajo[v].append((u, p, m))
+            del salida[u][v]
+            vecinos_contraidos[u] += 1
+        salida[v] = {}
+        entrada[v] = {}
+
+    return JerarquiaContraccion(nodos, np.array(rango, dtype=np.int32), _a_csr(arriba), _a_csr(abajo), firma_grafo(G, peso))
+
+
+def _a_csr(listas: List[List[Tuple[int, float, int]]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Convierte listas de adyacencia (vecino, peso, intermedio) en arrays CSR."""
+    offsets = np.zeros(len(listas) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(l) for l in listas])
+    planas = [a for l in listas for a in l]
+    vecinos = np.array([a[0] for a in planas], dtype=np.int32)
+    pesos = np.array([a[1] for a in planas], dtype=np.float64)
+    medio = np.array([a[2] for a in planas], dtype=np.int32)
+    return offsets, vecinos, pesos, medio
+
+
+def prepara_jerarquias(G: Union[nx.Graph, nx.DiGraph], pesos: Dict[str, Callable], directorio: str = ".") -> Dict[str, JerarquiaContraccion]:
+    """
+    Devuelve una jerarquía de contracción por cada función de peso. Las jerarquías se cargan
+    del fichero "ch_<nombre>.npz" del directorio si existe y su firma coincide con la de G y
+    sus pesos; si no, se construyen y se guardan.
+
+    Args:
+        G (Union[nx.Graph, nx.DiGraph]): Grafo (dirigido o no dirigido).
+        pesos (Dict[str, Callable]): Diccionario nombre -> función de peso.
+        directorio (str, opcional): Directorio de los ficheros. Por defecto, el actual.
+    Returns:
+        Dict[str, JerarquiaContraccion]: Jerarquía de cada función de peso.
+    """
+    jerarquias = {}
+    for nombre, peso in pesos.items():
+        fichero = os.path.join(directorio, f"ch_{nombre}.npz")
+        jerarquia = None
+        if os.path.exists(fichero):
+            try:
+                jerarquia = JerarquiaContraccion.carga(fichero, G, peso)
+            except ValueError:
+                #Si el grafo o los pesos han cambiado la jerarquía guardada no sirve
+                jerarquia = None
+        if jerarquia is None:
+            jerarquia = contrae(G, peso)
+            jerarquia.guarda(fichero)
+        jerarquias[nombre] = jerarquia
+    return jerarquias
@@ -0,0 +1,213 @@
+"""
+espacial.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Índice espacial para asociar coordenadas (latitud, longitud) a nodos o aristas del grafo de calles.
+
+Las coordenadas se proyectan a metros con una proyección equirectangular centrada en el grafo
+(suficientemente precisa a escala de una ciudad) y se reparten en una rejilla uniforme de celdas
+cuadradas. Cada consulta solo mira las celdas que rodean al punto, ampliando el anillo de celdas
+hasta que el candidato encontrado es seguro el más cercano. El índice se construye una vez y
+admite consultas por lotes con arrays de NumPy.
+"""
+
+from typing import List, Tuple, Union
+import networkx as nx
+import numpy as np
+
+#Radio terrestre en metros (el mismo que usa OSMnx para calcular el campo "length" de las aristas)
+RADIO_TIERRA = 6371009
+
+#Número medio de puntos por celda de la rejilla
+PUNTOS_POR_CELDA = 4
+
+
+class IndiceEspacial:
+    """
+    Rejilla uniforme sobre las coordenadas proyectadas de los nodos (y opcionalmente de las aristas) de un grafo.
+
+    Attributes:
+        nodos (List[object]): Nodo asociado a cada punto del índice.
+        latitudes, longitudes (np.ndarray): Coordenadas en grados de cada nodo.
+        x, y (np.ndarray): Coordenadas proyectadas en metros de cada nodo.
+        aristas (np.ndarray): Array m x 2 con los índices de los extremos de cada arista (vacío si no se indexan).
+        lado (float): Lado de cada celda en metros.
+    """
+
+    def __init__(self, nodos: List[object], latitudes: np.ndarray, longitudes: np.ndarray, aristas: np.ndarray = None):
+        """
+        Args:
+            nodos (List[object]): Nodo asociado a cada coordenada.
+            latitudes (np.ndarray): Latitud de cada nodo en grados.
+            longitudes (np.ndarray): Longitud de cada nodo en grados.
+            aristas (np.ndarray, opcional): Array m x 2 con los índices de los nodos extremos de cada arista,
+                necesario para aristas_cercanas. Por defecto, None.
+        """
+        self.nodos = list(nodos)
+        self.latitudes = latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = longitudes = np.asarray(longitudes, dtype=np.float64)
+        self._coseno = np.cos(np.radians(latitudes.mean())) if len(latitudes) else 1.0
+        self.x, self.y = self._proyecta(latitudes, longitudes)
+
+        #Lado de celda para tener de media PUNTOS_POR_CELDA nodos por celda
+        self._x0, self._y0 = (self.x.min(), self.y.min()) if len(self.x) else (0.0, 0.0)
+        ancho = max(float(self.x.max() - self._x0), 1.0) if len(self.x) else 1.0
+        alto = max(float(self.y.max() - self._y0), 1.0) if len(self.y) else 1.0
+        self.lado = max(np.sqrt(ancho * alto * PUNTOS_POR_CELDA / max(len(self.x), 1)), 1.0)
+        self._columnas = int(ancho // self.lado) + 1
+        self._filas = int(alto // self.lado) + 1
+
+        cx, cy = self._celda(self.x, self.y)
+        self._celdas_nodos = self._agrupa(cx * self._filas + cy, np.arange(len(self.x)))
+
+        self.aristas = np.zeros((0, 2), dtype=np.int64) if aristas is None else np.asarray(aristas, dtype=np.int64).reshape(-1, 2)
+        if len(self.aristas):
+            #Cada arista se registra en todas las celdas que cubre su rectángulo envolvente
+            u, v = self.aristas[:, 0], self.aristas[:, 1]
+            cx0, cy0 = self._celda(np.minimum(self.x[u], self.x[v]), np.minimum(self.y[u], self.y[v]))
+            cx1, cy1 = self._celda(np.maximum(self.x[u], self.x[v]), np.maximum(self.y[u], self.y[v]))
+            celdas, ids = [], []
+            for i, (a0, b0, a1, b1) in enumerate(zip(cx0.tolist(), cy0.tolist(), cx1.tolist(), cy1.tolist())):
+                for a in range(a0, a1 + 1):
+                    for b in range(b0, b1 + 1):
+                        celdas.append(a * self._filas + b)
+                        ids.append(i)
+            self._celdas_aristas = self._agrupa(np.array(celdas, dtype=np.int64), np.array(ids, dtype=np.int64))
+
+    @classmethod
+    def desde_grafo(cls, G: nx.DiGraph, con_aristas: bool = False) -> "IndiceEspacial":
+        """
+        Construye el índice a partir de las coordenadas 'x' (longitud) e 'y' (latitud) de los nodos del grafo.
+
+        Args:
+            G (nx.DiGraph): Grafo de calles.
+            con_aristas (bool, opcional): Si se indexan también las aristas. Por defecto, False.
+        Returns:
+            IndiceEspacial: Índice espacial del grafo.
+        """
+        nodos = list(G.nodes)
+        latitudes = np.array([G.nodes[v]["y"] for v in nodos], dtype=np.float64)
+        longitudes = np.array([G.nodes[v]["x"] for v in nodos], dtype=np.float64)
+        aristas = None
+        if con_aristas:
+            indice = {v: i for i, v in enumerate(nodos)}
+            aristas = np.array([(indice[u], indice[v]) for u, v in G.edges()], dtype=np.int64)
+        return cls(nodos, latitudes, longitudes, aristas)
+
+    def _proyecta(self, latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Proyección equirectangular a metros."""
+        return (RADIO_TIERRA * np.radians(longitudes) * self._coseno, RADIO_TIERRA * np.radians(latitudes))
+
+    def _celda(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Columna y fila de la celda de cada punto, recortadas a los límites de la rejilla."""
+        cx = np.clip(((x - self._x0) // self.lado).astype(np.int64), 0, self._columnas - 1)
+        cy = np.clip(((y - self._y0) // self.lado).astype(np.int64), 0, self._filas - 1)
+        return cx, cy
+
+    def _agrupa(self, celdas: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Agrupa los ids por celda en formato CSR: offsets por celda e ids ordenados por celda."""
+        orden = np.argsort(celdas, kind="stable")
+        offsets = np.zeros(self._columnas * self._filas + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(celdas, minlength=self._columnas * self._filas))
+        return offsets, ids[orden]
+
+    def _candidatos(self, grupos: Tuple[np.ndarray, np.ndarray], cx: int, cy: int, r: int) -> np.ndarray:
+        """Ids registrados en el bloque de (2r+1) x (2r+1) celdas centrado en (cx, cy)."""
+        offsets, ids = grupos
+        partes = []
+        for a in range(max(cx - r, 0), min(cx + r, self._columnas - 1) + 1):
+            base = a * self._filas
+            inicio = offsets[base + max(cy - r, 0)]
+            fin = offsets[base + min(cy + r, self._filas - 1) + 1]
+            if fin > inicio:
+                partes.append(ids[inicio:fin])
+        return np.concatenate(partes) if partes else np.zeros(0, dtype=np.int64)
+
+    def _margen(self, qx: float, qy: float, cx: int, cy: int, r: int) -> float:
+        """Distancia mínima del punto al exterior del bloque; infinita si el bloque cubre toda la rejilla."""
+        if cx - r <= 0 and cy - r <= 0 and cx + r >= self._columnas - 1 and cy + r >= self._filas - 1:
+            return np.inf
+        return min(qx - (self._x0 + (cx - r) * self.lado), self._x0 + (cx + r + 1) * self.lado - qx,
+                   qy - (self._y0 + (cy - r) * self.lado), self._y0 + (cy + r + 1) * self.lado - qy)
+
+    def _busca(self, grupos, distancias, qx: float, qy: float, cx: int, cy: int):
+        """Amplía el anillo de celdas hasta que el mejor candidato está más cerca que el borde del bloque."""
+        r = 1
+        while True:
+            candidatos = self._candidatos(grupos, cx, cy, r)
+            margen = self._margen(qx, qy, cx, cy, r)
+            if len(candidatos):
+                d = distancias(candidatos, qx, qy)
+                mejor = int(np.argmin(d))
+                if d[mejor] <= margen:
+                    return candidatos[mejor], float(d[mejor])
+            if margen == np.inf:
+                return -1, np.inf
+            r = 2 * r
+
+    def nodos_cercanos(self, latitudes: Union[float, np.ndarray], longitudes: Union[float, np.ndarray], distancias: bool = False):
+        """
+        Devuelve el nodo más cercano a cada punto.
+
+        Args:
+            latitudes (Union[float, np.ndarray]): Latitud de cada punto en grados.
+            longitudes (Union[float, np.ndarray]): Longitud de cada punto en grados.
+            distancias (bool, opcional): Si se devuelven también las distancias en metros. Por defecto, False.
+        Returns:
+            El nodo más cercano (o array de nodos si se pasan arrays) y, si se pide, su distancia.
+        """
+        escalar = np.ndim(latitudes) == 0
+        qx, qy = self._proyecta(np.atleast_1d(np.asarray(latitudes, dtype=np.float64)), np.atleast_1d(np.asarray(longitudes, dtype=np.float64)))
+        cx, cy = self._celda(qx, qy)
+
+        def distancia_nodos(candidatos, px, py):
+            return np.hypot(self.x[candidatos] - px, self.y[candidatos] - py)
+
+        resultado, metros = [], []
+        for px, py, a, b in zip(qx.tolist(), qy.tolist(), cx.tolist(), cy.tolist()):
+            i, d = self._busca(self._celdas_nodos, distancia_nodos, px, py, a, b)
+            resultado.append(self.nodos[i] if i >= 0 else None)
+            metros.append(d)
+        if escalar:
+            return (resultado[0], metros[0]) if distancias else resultado[0]
+        resultado = np.array(resultado, dtype=object if any(isinstance(n, (tuple, str)) for n in resultado) else None)
+        return (resultado, np.array(metros)) if distancias else resultado
+
+    def aristas_cercanas(self, latitudes: Union[float, np.ndarray], longitudes: Union[float, np.ndarray]) -> List[Tuple[object, object, float, float]]:
+        """
+        Proyecta cada punto sobre la arista más cercana, considerando cada arista un segmento recto entre sus nodos.
+
+        Args:
+            latitudes (Union[float, np.ndarray]): Latitud de cada punto en grados.
+            longitudes (Union[float, np.ndarray]): Longitud de cada punto en grados.
+        Returns:
+            List[Tuple[object, object, float, float]]: Para cada punto, los nodos (u, v) de la arista, la fracción
+                de la arista entre u y la proyección (de 0 a 1) y la distancia en metros a la arista.
+        Raises:
+            ValueError: Si el índice se construyó sin aristas.
+        """
+        if not len(self.aristas):
+            raise ValueError("El índice espacial no contiene aristas.")
+        qx, qy = self._proyecta(np.atleast_1d(np.asarray(latitudes, dtype=np.float64)), np.atleast_1d(np.asarray(longitudes, dtype=np.float64)))
+        cx, cy = self._celda(qx, qy)
+
+        def proyeccion(candidatos, px, py):
+            u, v = self.aristas[candidatos, 0], self.aristas[candidatos, 1]
+            ax, ay = self.x[u], self.y[u]
+            dx, dy = self.x[v] - ax, self.y[v] - ay
+            longitud2 = dx * dx + dy * dy
+            with np.errstate(invalid="ignore", divide="ignore"):
+                t = np.where(longitud2 > 0, ((px - ax) * dx + (py - ay) * dy) / longitud2, 0.0)
+            t = np.clip(t, 0.0, 1.0)
+            return t, np.hypot(ax + t * dx - px, ay + t * dy - py)
+
+        resultado = []
+        for px, py, a, b in zip(qx.tolist(), qy.tolist(), cx.tolist(), cy.tolist()):
+            i, d = self._busca(self._celdas_aristas, lambda c, x, y: proyeccion(c, x, y)[1], px, py, a, b)
+            t, _ = proyeccion(np.array([i]), px, py)
+            u, v = self.aristas[i]
+            resultado.append((self.nodos[u], self.nodos[v], float(t[0]), d))
+        return resultado
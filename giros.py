@@ -0,0 +1,220 @@
+"""
+giros.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Rutas con coste de giro mediante una búsqueda de Dijkstra sobre aristas.
+
+En la búsqueda habitual los estados son los vértices, así que el coste de llegar a un
+cruce no depende de por qué calle se entra y no se puede penalizar un giro. Aquí los
+estados son las aristas del GrafoCompilado: pasar de la arista u->v a la arista v->w
+cuesta el peso de v->w más el coste del giro en v, clasificado con el mismo ángulo que
+usa gps.generar_instrucciones (recto, izquierda, derecha o cambio de sentido).
+
+El grafo expandido no se construye: para cada arista de entrada a un cruce solo se guarda
+la clase de giro hacia cada arista de salida, un int8 por par, calculado una única vez
+y de forma vectorizada para todo el grafo.
+"""
+
+from typing import Dict, List, Union
+import heapq
+import time
+import numpy as np
+
+from grafo_pesado import INFTY, GrafoCompilado, instrumentacion_activa, registra_busqueda
+
+#Clases de giro, en el orden de las columnas de GirosCompilados.clases
+CLASES_GIRO = ["recto", "izquierda", "derecha", "cambio_sentido"]
+
+#Coste por defecto de cada clase de giro, en segundos
+COSTES_GIRO = {"recto": 0, "izquierda": 15, "derecha": 5, "cambio_sentido": 60}
+
+#Ángulo en grados a partir del cual un cambio de dirección se considera giro (el mismo que en gps.generar_instrucciones)
+ANGULO_GIRO = 45
+
+
+class GirosCompilados:
+    """
+    Clase de giro de cada par (arista de entrada, arista de salida) de cada cruce de un GrafoCompilado.
+
+    Los giros desde la arista a (u->v) son los pares con las aristas de salida de v, en el orden
+    del CSR: su clase es clases[offsets[a] + j] para la j-ésima arista de salida de v.
+
+    Attributes:
+        grafo (GrafoCompilado): Grafo compilado.
+        offsets (np.ndarray): Array int64 de tamaño m+1 con el inicio de los giros de cada arista.
+        clases (np.ndarray): Array int8 con el índice en CLASES_GIRO de cada giro.
+    """
+
+    def __init__(self, grafo: GrafoCompilado, latitudes: np.ndarray, longitudes: np.ndarray):
+        """
+        Args:
+            grafo (GrafoCompilado): Grafo compilado.
+            latitudes (np.ndarray): Latitud de cada vértice en el orden de grafo.nodos.
+            longitudes (np.ndarray): Longitud de cada vértice en el orden de grafo.nodos.
+        """
+        self.grafo = grafo
+        x = np.asarray(longitudes, dtype=np.float64)
+        y = np.asarray(latitudes, dtype=np.float64)
+        grado = np.diff(grafo.offsets)
+        origenes = np.repeat(np.arange(len(grafo)), grado)
+        destinos = grafo.destinos.astype(np.int64)
+
+        #Cada arista a = u->v tiene tantos giros como aristas salen de v
+        giros = grado[destinos]
+        self.offsets = np.zeros(len(destinos) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(giros)
+        entrada = np.repeat(np.arange(len(destinos)), giros)
+        salida = grafo.offsets[destinos[entrada]] + (np.arange(self.offsets[-1]) - self.offsets[entrada])
+
+        u, v, w = origenes[entrada], destinos[entrada], destinos[salida]
+        angulos = calcula_angulos(x[v] - x[u], y[v] - y[u], x[w] - x[v], y[w] - y[v])
+        clases = np.zeros(len(angulos), dtype=np.int8)
+        clases[angulos > ANGULO_GIRO] = CLASES_GIRO.index("izquierda")
+        clases[angulos < -ANGULO_GIRO] = CLASES_GIRO.index("derecha")
+        clases[w == u] = CLASES_GIRO.index("cambio_sentido")
+        self.clases = clases
+        self._clases = clases.tolist()
+        self._offsets = self.offsets.tolist()
+
+    def __len__(self) -> int:
+        return len(self.clases)
+
+    def costes(self, costes: Dict[str, float] = None) -> List[float]:
+        """Coste de cada clase de giro en el orden de CLASES_GIRO (INFTY si se prohíbe con inf)."""
+        costes = COSTES_GIRO if costes is None else {**COSTES_GIRO, **costes}
+        return [INFTY if costes[c] == np.inf else costes[c] for c in CLASES_GIRO]
+
+
+def calcula_angulos(v1x: np.ndarray, v1y: np.ndarray, v2x: np.ndarray, v2y: np.ndarray) -> np.ndarray:
+    """
+    Versión vectorizada de gps.calcular_angulo: ángulo en grados entre -180 y 180 de cada par de vectores.
+
+    Args:
+        v1x, v1y (np.ndarray): Componentes de los primeros vectores.
+        v2x, v2y (np.ndarray): Componentes de los segundos vectores.
+    Returns:
+        np.ndarray: Ángulo de giro de cada par (positivo hacia la izquierda).
+    """
+    angulos = np.degrees(np.arctan2(v2y, v2x) - np.arctan2(v1y, v1x))
+    angulos[angulos > 180] -= 360
+    angulos[angulos < -180] += 360
+    return angulos
+
+
+def camino_minimo_giros(giros: GirosCompilados, peso: str, origen: object, destino: object, costes: Dict[str, float] = None, cotas: Union[np.ndarray, List[float]] = None) -> List[object]:
+    """
+    Calcula el camino mínimo sumando al peso de las aristas el coste de cada giro.
+
+    Args:
+        giros (GirosCompilados): Giros del grafo compilado.
+        peso (str): Nombre de la función de peso compilada (en las mismas unidades que los costes de giro).
+        origen (object): vértice del grafo de origen.
+        destino (object): vértice del grafo de destino.
+        costes (Dict[str, float], opcional): Coste de las clases de giro que cambian respecto a COSTES_GIRO.
+            Un coste inf prohíbe esa clase de giro. Por defecto, None.
+        cotas (Union[np.ndarray, List[float]], opcional): Cota inferior del peso hasta el destino de cada
+            vértice, para hacer A*. Por defecto, None (Dijkstra).
+    Returns:
+        List[object]: Lista con los vértices del camino más corto entre origen y destino.
+    Raises:
+        KeyError: Si origen o destino no son vértices del grafo o "peso" no está compilado.
+        ValueError: Si no existe camino entre origen y destino.
+    """
+    G = giros.grafo
+    offsets, destinos, pesos = G.csr(peso)
+    coste_clase = giros.costes(costes)
+    giros_offsets, clases = giros._offsets, giros._clases
+    if cotas is None:
+        cotas = [0] * len(G)
+    elif isinstance(cotas, np.ndarray):
+        cotas = cotas.tolist()
+    s, t = G.indice[origen], G.indice[destino]
+    if s == t:
+        return [origen]
+
+    #En las estadísticas los estados fijados son aristas y las relajadas, giros
+    medir = instrumentacion_activa()
+    inicio = time.perf_counter() if medir else 0
+    obsoletas = relajadas = 0
+
+    #Los estados son las aristas: distancia hasta el final de cada arista y arista anterior
+    distancias = [INFTY] * G.numero_aristas()
+    padre = [-1] * G.numero_aristas()
+    Q = []
+    for a in range(offsets[s], offsets[s + 1]):
+        if pesos[a] < distancias[a]:
+            distancias[a] = pesos[a]
+            padre[a] = -1
+            heapq.heappush(Q, (pesos[a] + cotas[destinos[a]], pesos[a], a))
+    inserciones = maximo_cola = len(Q)
+
+    final = -1
+    while Q:
+        _, d_a, a = heapq.heappop(Q)
+        if d_a > distancias[a]:
+            obsoletas += 1
+            continue
+        v = destinos[a]
+        if v == t:
+            final = a
+            break
+        base = giros_offsets[a] - offsets[v]
+        for b in range(offsets[v], offsets[v + 1]):
+            d_b = d_a + pesos[b] + coste_clase[clases[base + b]]
+            if d_b < distancias[b]:
+                distancias[b] = d_b
+                padre[b] = a
+                heapq.heappush(Q, (d_b + cotas[destinos[b]], d_b, b))
+                if medir:
+                    inserciones += 1
+        if medir:
+            relajadas += offsets[v + 1] - offsets[v]
+            maximo_cola = max(maximo_cola, len(Q))
+
+    if medir:
+        registra_busqueda("camino_minimo_giros", inicio, inserciones, len(Q), obsoletas, 0, relajadas, maximo_cola)
+    if final < 0:
+        raise ValueError("No existe camino entre origen y destino.")
+    camino = []
+    a = final
+    while a != -1:
+        camino.append(G.nodos[destinos[a]])
+        a = padre[a]
+    camino.append(origen)
+    return camino[::-1]
+
+
+def coste_ruta_giros(giros: GirosCompilados, peso: str, camino: List[object], costes: Dict[str, float] = None) -> float:
+    """
+    Calcula el peso de un camino incluyendo el coste de sus giros, p. ej. el tiempo estimado de llegada.
+
+    Args:
+        giros (GirosCompilados): Giros del grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        camino (List[object]): Lista de vértices del camino.
+        costes (Dict[str, float], opcional): Coste de las clases de giro que cambian respecto a COSTES_GIRO.
+    Returns:
+        float: Peso total del camino con los giros.
+    Raises:
+        KeyError: Si dos vértices consecutivos del camino no están unidos por una arista.
+    """
+    G = giros.grafo
+    offsets, destinos, pesos = G.csr(peso)
+    coste_clase = giros.costes(costes)
+    total = 0
+    anterior = -1
+    for u, v in zip(camino, camino[1:]):
+        i, j = G.indice[u], G.indice[v]
+        for a in range(offsets[i], offsets[i + 1]):
+            if destinos[a] == j:
+                break
+        else:
+            raise KeyError(f"La arista ({u}, {v}) no pertenece al grafo.")
+        total += pesos[a]
+        if anterior >= 0:
+            total += coste_clase[giros._clases[giros._offsets[anterior] + a - offsets[i]]]
+        anterior = a
+    return total
@@ -1,11 +1,17 @@
 import os
+import json
 import callejero
-from grafo_pesado import camino_minimo
-from typing import Callable, List, Tuple
+from autocompletado import Autocompletado
+from espacial import RADIO_TIERRA, IndiceEspacial
+from cache_rutas import CacheRutas
+from giros import ANGULO_GIRO, GirosCompilados, calcula_angulos, camino_minimo_giros
+from grafo_pesado import GrafoCompilado, camino_minimo_compilado, camino_minimo_astar_compilado, activa_instrumentacion, estadisticas_agregadas
+from typing import Callable, Dict, List, Tuple, Union
+from contextlib import contextmanager
 import networkx as nx
-import osmnx as ox
 import math
-from threading import Thread
+import time
+import numpy as np
 
 
 def calcular_peso_distancia(G: nx.DiGraph, u: object, v: object) -> float:
@@ -28,12 +34,197 @@ def calcular_peso_tiempo(G: nx.DiGraph, u: object, v: object) -> float:
     return int(longitud / (velocidad * 1000 / 3600)) 
 
 
+#Probabilidad de encontrar un semáforo en cada arista y tiempo de espera en segundos
+PROB_SEMAFORO = 0.8
+TIEMPO_SEMAFORO = 30
+
+
 def calcular_peso_semaforos(G: nx.DiGraph, u: object, v: object) -> float:
     """Calcula el peso considerando semáforos."""
     tiempo_base = calcular_peso_tiempo(G, u, v)
-    prob_semaforo = 0.8
-    tiempo_semaforo = 30 
-    return tiempo_base + prob_semaforo * tiempo_semaforo
+    return tiempo_base + PROB_SEMAFORO * TIEMPO_SEMAFORO
+
+
+#Atributo de las aristas en el que materializa_pesos guarda el peso de cada modo
+ATRIBUTOS_PESO = {"distancia": "peso_distancia", "tiempo": "peso_tiempo", "semaforos": "peso_semaforos"}
+
+
+def _pesos_modos(longitudes: np.ndarray, velocidades: np.ndarray) -> Dict[str, np.ndarray]:
+    """Calcula los pesos de los tres modos a partir de la longitud (m) y la velocidad (km/h) de cada arista."""
+    pesos = {}
+    pesos["distancia"] = np.asarray(longitudes, dtype=np.float64)
+    #np.trunc reproduce el int() de calcular_peso_tiempo
+    pesos["tiempo"] = np.trunc(pesos["distancia"] / (velocidades * 1000 / 3600))
+    pesos["semaforos"] = pesos["tiempo"] + PROB_SEMAFORO * TIEMPO_SEMAFORO
+    return pesos
+
+
+def materializa_pesos(G: nx.DiGraph, arrays: Dict[str, np.ndarray] = None, meta: Dict[str, object] = None) -> Dict[str, np.ndarray]:
+    """
+    Calcula de una vez, con operaciones vectorizadas, los pesos de distancia, tiempo y semáforos
+    de todas las aristas y los guarda como atributos de las aristas (ver ATRIBUTOS_PESO).
+    Los valores coinciden con los de calcular_peso_distancia, calcular_peso_tiempo y
+    calcular_peso_semaforos, que siguen disponibles como versión de referencia.
+
+    Si se pasan los arrays y metadatos de la caché de la que se construyó G (ver
+    callejero.digrafo_desde_arrays) los pesos se calculan sobre ellos con pesos_cache, sin
+    leer los atributos de las aristas.
+    
+    Args:
+        G (nx.DiGraph): Grafo dirigido de las calles.
+        arrays (Dict[str, np.ndarray], opcional): Arrays de la caché del grafo. Por defecto, None.
+        meta (Dict[str, object], opcional): Metadatos de la caché del grafo. Por defecto, None.
+    
+    Returns:
+        Dict[str, np.ndarray]: Array de pesos de cada modo, en el orden de G.edges.
+    """
+    if arrays is not None:
+        pesos = pesos_cache(arrays, meta)
+        asigna_pesos(G, pesos)
+        return pesos
+
+    #Único recorrido en Python: leer longitud y tipo de vía de cada arista
+    longitudes = np.fromiter((float(longitud) for _, _, longitud in G.edges(data="length", default=1)), dtype=np.float64, count=G.number_of_edges())
+    tipos = np.array([t if type(t) == str else t[0] for _, _, t in G.edges(data="highway", default="otro")], dtype=object)
+
+    #Velocidad de cada tipo de vía distinto, repartida a las aristas con el índice inverso
+    if len(tipos) > 0:
+        tipos_distintos, inverso = np.unique(tipos, return_inverse=True)
+        velocidades = np.array([float(callejero.MAX_SPEEDS.get(t, 50)) for t in tipos_distintos])[inverso]
+    else:
+        velocidades = np.zeros(0)
+
+    pesos = _pesos_modos(longitudes, velocidades)
+    asigna_pesos(G, pesos)
+    return pesos
+
+
+def pesos_cache(arrays: Dict[str, np.ndarray], meta: Dict[str, object]) -> Dict[str, np.ndarray]:
+    """
+    Calcula los mismos pesos que materializa_pesos directamente a partir de los arrays de la caché
+    del grafo (ver callejero.carga_arrays_grafo), sin recorrer aristas en Python: la velocidad se
+    calcula una vez por cada tipo de vía del vocabulario y se reparte con los códigos de las aristas.
+
+    Args:
+        arrays (Dict[str, np.ndarray]): Arrays de la caché del grafo.
+        meta (Dict[str, object]): Metadatos de la caché del grafo.
+    Returns:
+        Dict[str, np.ndarray]: Array de pesos de cada modo, en el orden de la adyacencia CSR de la caché.
+    """
+    tipos = [json.loads(t) for t in meta["highway"]]
+    #El último elemento corresponde a las aristas sin tipo de vía (código -1)
+    velocidades = np.array([float(callejero.MAX_SPEEDS.get(t if type(t) == str else t[0], 50)) for t in tipos] + [50.0])
+    return _pesos_modos(arrays["length"], velocidades[arrays["highway"]])
+
+
+def asigna_pesos(G: nx.DiGraph, pesos: Dict[str, np.ndarray]) -> None:
+    """
+    Guarda como atributos de las aristas (ver ATRIBUTOS_PESO) los pesos de cada modo.
+
+    Args:
+        G (nx.DiGraph): Grafo dirigido de las calles.
+        pesos (Dict[str, np.ndarray]): Array de pesos de cada modo, en el orden de G.edges.
+    Returns: None
+    """
+    aristas = list(G.edges(data=True))
+    for modo, array in pesos.items():
+        atributo = ATRIBUTOS_PESO[modo]
+        for (_, _, datos), valor in zip(aristas, array.tolist()):
+            datos[atributo] = valor
+
+
+#Velocidad máxima de cualquier vía en m/s, para acotar inferiormente el tiempo de un trayecto
+VELOCIDAD_MAXIMA = max(float(v) for v in callejero.MAX_SPEEDS.values()) * 1000 / 3600
+
+#Factor que convierte metros en línea recta en una cota inferior del peso de cada modo.
+#En el modo tiempo cada arista se trunca a segundos enteros, así que una arista rápida de menos de unos
+#28 m pesa 0 y ningún múltiplo positivo de la distancia es una cota inferior: la heurística es nula
+#(A* equivale a Dijkstra). En el modo semáforos la penalización fija de cada arista (24 s) compensa con
+#creces el segundo que se puede perder al truncar, por lo que el tiempo a velocidad máxima sí es cota.
+FACTOR_HEURISTICA = {"distancia": 1.0, "tiempo": 0.0, "semaforos": 1 / VELOCIDAD_MAXIMA}
+
+
+def distancia_gran_circulo(lat1, lon1, lat2, lon2):
+    """
+    Calcula la distancia ortodrómica en metros entre dos puntos con la fórmula del haversine.
+    Acepta tanto números como arrays de NumPy.
+    
+    Args:
+        lat1, lon1: Latitud y longitud en grados del primer punto.
+        lat2, lon2: Latitud y longitud en grados del segundo punto.
+    
+    Returns:
+        Distancia en metros (float o np.ndarray).
+    """
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def heuristica(modo: str) -> Callable[[nx.DiGraph, object, object], float]:
+    """
+    Devuelve la heurística admisible de A* para el modo de navegación dado.
+
+    Para "distancia" es la distancia en línea recta y para "semaforos" el tiempo de recorrer esa
+    distancia a la velocidad máxima de MAX_SPEEDS. Para "tiempo" es 0, porque calcular_peso_tiempo
+    trunca cada arista a segundos enteros y hay aristas cortas que no cuestan nada (ver FACTOR_HEURISTICA).
+    
+    Args:
+        modo (str): "distancia", "tiempo" o "semaforos".
+    
+    Returns:
+        Callable: Función que recibe el grafo, un vértice y el destino y devuelve la cota.
+    """
+    factor = FACTOR_HEURISTICA[modo]
+
+    def cota(G: nx.DiGraph, u: object, destino: object) -> float:
+        return factor * float(distancia_gran_circulo(G.nodes[u]['y'], G.nodes[u]['x'], G.nodes[destino]['y'], G.nodes[destino]['x']))
+    return cota
+
+
+def cotas_destino(latitudes: np.ndarray, longitudes: np.ndarray, indice_destino: int, modo: str) -> np.ndarray:
+    """
+    Calcula de una vez la heurística del modo dado para todos los vértices, con las
+    coordenadas en el orden de un GrafoCompilado.
+    
+    Args:
+        latitudes (np.ndarray): Latitud de cada vértice.
+        longitudes (np.ndarray): Longitud de cada vértice.
+        indice_destino (int): Índice del vértice destino.
+        modo (str): "distancia", "tiempo" o "semaforos".
+    
+    Returns:
+        np.ndarray: Cota inferior del peso hasta el destino de cada vértice.
+    """
+    if FACTOR_HEURISTICA[modo] == 0:
+        return np.zeros(len(latitudes))
+    distancias = distancia_gran_circulo(latitudes, longitudes, latitudes[indice_destino], longitudes[indice_destino])
+    return FACTOR_HEURISTICA[modo] * distancias
+
+
+def calcula_ruta(G_compilado: GrafoCompilado, latitudes: np.ndarray, longitudes: np.ndarray, origen: object, destino: object, modo: str) -> List[object]:
+    """
+    Calcula la ruta del modo dado sobre el grafo compilado: con A* y las cotas de cotas_destino o,
+    si la heurística del modo es nula (modo "tiempo", ver FACTOR_HEURISTICA), con Dijkstra, porque
+    A* con cota 0 recorre los mismos vértices y solo añade el coste de calcular las cotas.
+
+    Args:
+        G_compilado (GrafoCompilado): Grafo compilado con los pesos de los modos.
+        latitudes (np.ndarray): Latitud de cada vértice, en el orden del grafo compilado.
+        longitudes (np.ndarray): Longitud de cada vértice, en el orden del grafo compilado.
+        origen (object): Nodo de origen.
+        destino (object): Nodo de destino.
+        modo (str): "distancia", "tiempo" o "semaforos".
+    Returns:
+        List[object]: Lista de nodos de la ruta.
+    Raises:
+        ValueError: Si no existe camino entre origen y destino.
+    """
+    if FACTOR_HEURISTICA[modo] == 0:
+        return camino_minimo_compilado(G_compilado, modo, origen, destino)
+    cotas = cotas_destino(latitudes, longitudes, G_compilado.indice[destino], modo)
+    return camino_minimo_astar_compilado(G_compilado, modo, origen, destino, cotas)
+
 
 def calcular_angulo(v1: Tuple, v2: Tuple) -> float:
     """
@@ -56,54 +247,138 @@ def calcular_angulo(v1: Tuple, v2: Tuple) -> float:
 
 
 
-def generar_instrucciones(G: nx.DiGraph, ruta: List) -> List:
-    """Genera instrucciones de navegación para la ruta."""
-    instrucciones = []
-    calle_actual = None
-    #Para acumular la longitud de la calle y que no escriba intrucciones seguidas de pocos metros en la misma calle 
-    longitud_acumulada = 0 
-    contador = 1
-    for i in range(len(ruta) - 1):
-        u, v = ruta[i], ruta[i + 1]
-        nombre_calle = G[u][v].get("name", "Calle desconocida")
-        longitud = G[u][v].get("length")
-
-        #Si estamos en una nueva calle, generar la instrucción anterior y reiniciar las variables
-        if nombre_calle != calle_actual:
-            if calle_actual is not None:
-                #Calcular el giro entre los segmentos
-                nodo_anterior = ruta[i - 1]
-                coords_anterior = (G.nodes[nodo_anterior]['x'], G.nodes[nodo_anterior]['y'])
-                coords_actual = (G.nodes[u]['x'], G.nodes[u]['y'])
-                coords_siguiente = (G.nodes[v]['x'], G.nodes[v]['y'])
-
-                vector1 = (coords_actual[0] - coords_anterior[0], coords_actual[1] - coords_anterior[1])
-                vector2 = (coords_siguiente[0] - coords_actual[0], coords_siguiente[1] - coords_actual[1])
-
-                angulo = calcular_angulo(vector1, vector2)
-
-                #Según los grados del ángulo para conocer si el giro es hacia un lado o hacia el otro
-                #Suponemos que entre -45 y 45 es seguir recto, >45 a la izquierda y <45 a la derecha
-                if -45 <= angulo <= 45:
-                    giro = "Continúa recto"
-                elif angulo > 45:
-                    giro = "Gira a la izquierda"
-                else:
-                    giro = "Gira a la derecha"
-
-                instrucciones.append(f"{contador} -> {giro} hacia {calle_actual} y continúa por ella durante {int(longitud_acumulada)} metros.")
-                contador += 1
-            #Reiniciar longitud acumulada y actualizar la calle actual
-            longitud_acumulada = longitud
-            calle_actual = nombre_calle
-        else:
-            #Si seguimos en la misma calle, acumulamos la longitud
-            longitud_acumulada += longitud
+#Texto de cada tipo de giro en las instrucciones
+TEXTO_GIROS = {"recto": "Continúa recto", "izquierda": "Gira a la izquierda", "derecha": "Gira a la derecha"}
+
+
+def _datos_ruta(G: Union[nx.DiGraph, callejero.CallesCompiladas], ruta: List) -> Tuple[List, np.ndarray, np.ndarray, np.ndarray]:
+    """Nombre y longitud de cada arista y coordenadas de cada nodo de la ruta, leídos del digrafo o de los arrays de la caché."""
+    if isinstance(G, callejero.CallesCompiladas):
+        posiciones = G.aristas(ruta)
+        indices = [G.indice[v] for v in ruta]
+        return G.nombres(posiciones, "Calle desconocida"), np.asarray(G.longitudes[posiciones], dtype=np.float64), G.x[indices], G.y[indices]
+    aristas = [G[u][v] for u, v in zip(ruta, ruta[1:])]
+    nombres = [datos.get("name", "Calle desconocida") for datos in aristas]
+    metros = np.array([datos.get("length", 0) for datos in aristas], dtype=np.float64)
+    nodos = [G.nodes[v] for v in ruta]
+    x = np.array([datos['x'] for datos in nodos], dtype=np.float64)
+    y = np.array([datos['y'] for datos in nodos], dtype=np.float64)
+    return nombres, metros, x, y
+
+
+def instrucciones_ruta(G: Union[nx.DiGraph, callejero.CallesCompiladas], ruta: List) -> List[Dict[str, object]]:
+    """
+    Agrupa la ruta en tramos por calle y calcula el giro al entrar en cada uno.
 
+    Los datos de todas las aristas y nodos de la ruta se leen del grafo (o de los arrays de la
+    caché, ver callejero.CallesCompiladas) en una sola pasada a arrays de NumPy; los ángulos de
+    giro se calculan a la vez para todos los cambios de calle.
+
+    Args:
+        G (Union[nx.DiGraph, callejero.CallesCompiladas]): Grafo dirigido de las calles o calles de la caché del grafo.
+        ruta (List): Lista de nodos de la ruta.
+
+    Returns:
+        List[Dict[str, object]]: Una instrucción por tramo con las claves "tipo" ("salida", "recto",
+            "izquierda" o "derecha"), "calle", "metros" del tramo e "indice" en la ruta del nodo donde
+            empieza, seguidas de una instrucción "llegada" en el último nodo.
+    """
+    if len(ruta) < 2:
+        return [{"tipo": "llegada", "calle": None, "metros": 0.0, "indice": max(len(ruta) - 1, 0)}]
+
+    nombres, metros, x, y = _datos_ruta(G, ruta)
+
+    #Índice de la primera arista de cada tramo de calle
+    inicios = np.array([0] + [i for i in range(1, len(nombres)) if nombres[i] != nombres[i - 1]])
+    metros_tramo = np.add.reduceat(metros, inicios)
+
+    #Giro en el primer nodo de cada tramo (salvo el primero): entre la arista anterior y la del tramo
+    i = inicios[1:]
+    angulos = calcula_angulos(x[i] - x[i - 1], y[i] - y[i - 1], x[i + 1] - x[i], y[i + 1] - y[i])
+    tipos = np.where(angulos > ANGULO_GIRO, "izquierda", np.where(angulos < -ANGULO_GIRO, "derecha", "recto"))
+
+    instrucciones = [{"tipo": tipo, "calle": nombres[inicio], "metros": metros, "indice": inicio}
+                     for tipo, inicio, metros in zip(["salida"] + tipos.tolist(), inicios.tolist(), metros_tramo.tolist())]
+    instrucciones.append({"tipo": "llegada", "calle": nombres[-1], "metros": 0.0, "indice": len(ruta) - 1})
+    return instrucciones
+
+
+def generar_instrucciones(G: Union[nx.DiGraph, callejero.CallesCompiladas], ruta: List) -> List:
+    """
+    Genera instrucciones de navegación para la ruta.
+
+    Args:
+        G (Union[nx.DiGraph, callejero.CallesCompiladas]): Grafo dirigido de las calles o calles de la caché del grafo.
+        ruta (List): Lista de nodos de la ruta.
+
+    Returns:
+        List: Texto de cada instrucción, a partir de los tramos de instrucciones_ruta.
+    """
+    tramos = instrucciones_ruta(G, ruta)[:-1]
+    instrucciones = []
+    #Se mantiene el formato de siempre: cada línea nombra la calle que se deja con el giro con el que se sale de ella
+    for contador, (tramo, siguiente) in enumerate(zip(tramos, tramos[1:]), start=1):
+        instrucciones.append(f"{contador} -> {TEXTO_GIROS[siguiente['tipo']]} hacia {tramo['calle']} y continúa por ella durante {int(tramo['metros'])} metros.")
     instrucciones.append(f"Has llegado a tu destino.")
-    
     return instrucciones
 
+
+#Fases de cada consulta, en el orden en que se hacen
+FASES = ["geocodificacion", "ajuste", "busqueda", "instrucciones", "dibujo"]
+
+
+class TiemposFases:
+    """
+    Cronómetro de las fases de cada consulta: geocodificación de las direcciones, ajuste a los
+    nodos más cercanos, búsqueda de la ruta, instrucciones y dibujo. Si no está activo las fases
+    no miden nada.
+
+    Attributes:
+        activo (bool): Si se miden las fases.
+        ultima (Dict[str, float]): Segundos de cada fase en la consulta actual.
+        totales (Dict[str, float]): Segundos acumulados de cada fase en todas las consultas.
+        consultas (int): Número de consultas empezadas.
+    """
+
+    def __init__(self, activo: bool = True):
+        self.activo = activo
+        self.ultima = {}
+        self.totales = {}
+        self.consultas = 0
+
+    def nueva_consulta(self) -> None:
+        """Empieza una consulta nueva: los tiempos de la anterior dejan de ser los de "ultima"."""
+        self.ultima = {}
+        self.consultas += 1
+
+    @contextmanager
+    def fase(self, nombre: str):
+        """Mide el bloque "with" como parte de la fase "nombre" de la consulta actual."""
+        if not self.activo:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            self.ultima[nombre] = self.ultima.get(nombre, 0) + segundos
+            self.totales[nombre] = self.totales.get(nombre, 0) + segundos
+
+    def informe(self, tiempos: Dict[str, float]) -> List[str]:
+        """Texto con los milisegundos de cada fase de "tiempos" (ultima o totales) y su suma."""
+        lineas = [f"   {fase:<16}{1000 * tiempos[fase]:10.1f} ms" for fase in FASES if fase in tiempos]
+        lineas.append(f"   {'total':<16}{1000 * sum(tiempos.values()):10.1f} ms")
+        return lineas
+
+
+def informe_busqueda(estadisticas: Dict[str, object]) -> str:
+    """Resume en una línea las estadísticas de una búsqueda de grafo_pesado."""
+    return (f"   {estadisticas['busqueda']}: {estadisticas['asentados']} vértices fijados, "
+            f"{estadisticas['aristas_relajadas']} aristas relajadas, {estadisticas['inserciones']} inserciones, "
+            f"{estadisticas['extracciones']} extracciones ({estadisticas['extracciones_obsoletas']} obsoletas), "
+            f"cola máxima {estadisticas['maximo_cola']}, {1000 * estadisticas['segundos']:.1f} ms")
+
 def pedir_opcion() -> str:
     #Printeamos las opciones
     print(' ')
@@ -112,56 +387,121 @@ def pedir_opcion() -> str:
     print("*          1 -> Ruta más corta(distancia)                 *")
     print("*          2 -> Ruta más rápida(tiempo)                   *")
     print("*          3 -> Ruta más rápida optimizando semáforos     *")
+    print("*          4 -> Ruta más rápida teniendo en cuenta giros  *")
     print('*                                                         *')
     print("***********************************************************")
 
     #Hacemos que elija una, corrigiendo en caso de no introducir lo deseado
     opcion = input("Elige el numero de la opcion que desea: ")
-    while opcion not in ["1","2","3"]:
-        opcion = input("ERROR: Introduce una opción válida(1, 2 o 3): ")
+    while opcion not in ["1","2","3","4"]:
+        opcion = input("ERROR: Introduce una opción válida(1, 2, 3 o 4): ")
     return opcion 
 
-def pedir_direcciones(df):
+def pedir_direcciones(df, autocompletado=None, tiempos=None):
         #Solicitar direcciones. Un bucle que mientras se introduzcan direcciones inválidas, se vuelvan a pedir los nombres
+        #Si nos dan un cronómetro, solo se mide la búsqueda de las direcciones y no el tiempo de escribirlas
+        if tiempos is None:
+            tiempos = TiemposFases(activo=False)
         validas = False
         while not validas:
             print("INTRODUCE LAS DIRECCIONES DE ORIGEN Y DESTINO.")
+            coord_origen = None
             try:
                 origen = input("Dirección de origen Formato -> ('CLASE PARTÍCULA NOMBRE, NÚMERO'): ")
                 destino = input("Dirección de destino Formato -> ('CLASE PARTÍCULA NOMBRE, NÚMERO'): ")
-                coord_origen = callejero.busca_direccion(origen, df)
-                coord_destino = callejero.busca_direccion(destino, df)
+                with tiempos.fase("geocodificacion"):
+                    coord_origen = callejero.busca_direccion(origen, df)
+                    coord_destino = callejero.busca_direccion(destino, df)
                 validas = True
             except callejero.AdressNotFoundError as e:
                 print(f'-ERROR: {e}')
+                #Si tenemos autocompletado, mostramos las direcciones más parecidas a la que ha fallado
+                if autocompletado is not None:
+                    sugerencias = autocompletado.sugerir(origen if coord_origen is None else destino)
+                    if sugerencias:
+                        print('¿Quizás quisiste decir?')
+                        for sugerencia, _, _ in sugerencias:
+                            print(f'   - {sugerencia}')
                 print()
                 validas = False
         return coord_origen, coord_destino
 
+#Modos de navegación, en el orden de las opciones del menú
+MODOS = ["distancia", "tiempo", "semaforos"]
+
+#Con GPS_PERFIL=1 se miden las fases de cada consulta y las búsquedas y se muestran tras cada ruta
+PERFIL = os.environ.get("GPS_PERFIL") == "1"
+
+
+def prepara_grafo(digrafo: bool = False) -> Tuple[Union[nx.DiGraph, callejero.CallesCompiladas], GrafoCompilado, IndiceEspacial]:
+    """
+    Abre la caché del grafo procesado de Madrid, calcula los pesos de los tres modos y construye
+    el grafo compilado y el índice espacial directamente sobre sus arrays. El digrafo de NetworkX
+    (con los pesos materializados) solo se construye si se pide, porque es lo más costoso de la carga;
+    si no, se devuelven las calles de la caché (ver callejero.CallesCompiladas), que bastan para
+    generar las instrucciones y dibujar las rutas.
+
+    Args:
+        digrafo (bool, opcional): Si se construye también el digrafo de NetworkX. Por defecto, False.
+    Returns:
+        Tuple[Union[nx.DiGraph, callejero.CallesCompiladas], GrafoCompilado, IndiceEspacial]: Grafo (o calles de
+            la caché si no se pide el digrafo), grafo compilado e índice espacial, con los nodos en el mismo orden.
+    """
+    arrays, meta = callejero.carga_arrays_procesados()
+    pesos = pesos_cache(arrays, meta)
+    G_compilado = GrafoCompilado.desde_arrays(arrays["nodos"].tolist(), arrays["offsets"], arrays["destinos"], pesos, dirigido=True)
+    indice_espacial = IndiceEspacial(G_compilado.nodos, arrays["y"], arrays["x"])
+    if not digrafo:
+        return callejero.CallesCompiladas(arrays, meta), G_compilado, indice_espacial
+    G = callejero.digrafo_desde_arrays(arrays, meta)
+    asigna_pesos(G, pesos)
+    return G, G_compilado, indice_espacial
+
+
 if __name__ == "__main__":
     #Cargar datos y grafo
     df = callejero.carga_callejero()
-    G = callejero.procesa_grafo(callejero.carga_grafo())
+    autocompletado = Autocompletado(df)
+    #El grafo se compila una única vez con los pesos de los tres modos de navegación; las instrucciones
+    #y el mapa se sacan de los mismos arrays, sin construir el digrafo de NetworkX
+    calles, G_compilado, indice_espacial = prepara_grafo()
+    modos = MODOS
+    latitudes, longitudes = indice_espacial.latitudes, indice_espacial.longitudes
+    #Las rutas se calculan sobre el grafo compilado con A* y la heurística del modo elegido (Dijkstra en el modo tiempo),
+    #y se guardan en caché junto con los árboles de los orígenes que se repiten
+    cache = CacheRutas(G_compilado, calcula=lambda origen, destino, modo: calcula_ruta(G_compilado, latitudes, longitudes, origen, destino, modo))
+    #Clases de giro de todos los cruces, para la opción que penaliza los giros
+    giros = GirosCompilados(G_compilado, latitudes, longitudes)
+    #Medición opcional de las fases y de las búsquedas de cada consulta
+    tiempos = TiemposFases(PERFIL)
+    busquedas = []
+    activa_instrumentacion(PERFIL, busquedas.append)
     repetir = True
     while repetir == True:
+        tiempos.nueva_consulta()
+        busquedas.clear()
         #Pedimos las coordenadas de origen y de destino
-        coord_origen, coord_destino = pedir_direcciones(df)
+        coord_origen, coord_destino = pedir_direcciones(df, autocompletado, tiempos)
 
-        #Encontramos los nodos más cercanos
-        nodo_origen = ox.distance.nearest_nodes(G, coord_origen[1], coord_origen[0])
-        nodo_destino = ox.distance.nearest_nodes(G, coord_destino[1], coord_destino[0])
+        #Encontramos los nodos más cercanos a ambas direcciones con una sola consulta al índice espacial
+        with tiempos.fase("ajuste"):
+            nodo_origen, nodo_destino = indice_espacial.nodos_cercanos(np.array([coord_origen[0], coord_destino[0]]), np.array([coord_origen[1], coord_destino[1]]))
 
         #Pedimos la opción
         opcion = pedir_opcion()
 
-        #Metemos las distintas funciones para que coja una en funcion de la opcion elegida
-        pesos = [calcular_peso_distancia, calcular_peso_tiempo, calcular_peso_semaforos]
-
-        #Sacamos la ruta, llamando a la funcion camino_minimo
-        ruta = camino_minimo(G, pesos[int(opcion) - 1], nodo_origen, nodo_destino)
+        #Sacamos la ruta del modo elegido
+        with tiempos.fase("busqueda"):
+            if opcion == "4":
+                cotas = cotas_destino(latitudes, longitudes, G_compilado.indice[nodo_destino], "tiempo")
+                ruta = camino_minimo_giros(giros, "tiempo", nodo_origen, nodo_destino, cotas=cotas)
+            else:
+                modo = modos[int(opcion) - 1]
+                ruta = cache.camino_minimo(nodo_origen, nodo_destino, modo)
 
         #Generamos instrucciones
-        instrucciones = generar_instrucciones(G, ruta)
+        with tiempos.fase("instrucciones"):
+            instrucciones = generar_instrucciones(calles, ruta)
         print()
         print()
         print("INSTRUCCIONES PARA LLEGAR A TU DESTINO: ")
@@ -172,9 +512,18 @@ if __name__ == "__main__":
         print('*************************************************************************')
         print('*************************************************************************')
 
-        #Visualizamos la ruta
-        callejero.dibuja_grafo(G, ruta)
+        #Visualizamos la ruta (el dibujo incluye el tiempo que la ventana permanece abierta)
+        with tiempos.fase("dibujo"):
+            callejero.dibuja_grafo(calles, ruta)
 
+        if PERFIL:
+            print()
+            print("TIEMPOS DE LA CONSULTA:")
+            for linea in tiempos.informe(tiempos.ultima):
+                print(linea)
+            #Si la ruta sale de la caché no se hace ninguna búsqueda
+            for estadisticas in busquedas:
+                print(informe_busqueda(estadisticas))
 
         #Preguntamos si desea repetir el proceso
         print()
@@ -183,5 +532,11 @@ if __name__ == "__main__":
             opcion2 = input('ERROR: Parametro no valido (s/n)')
         if opcion2.lower() == "n":
             repetir = False
+    if PERFIL:
+        print(f"TIEMPOS ACUMULADOS EN {tiempos.consultas} CONSULTAS:")
+        for linea in tiempos.informe(tiempos.totales):
+            print(linea)
+        for busqueda, totales in estadisticas_agregadas().items():
+            print(informe_busqueda({**totales, "busqueda": f"{busqueda} ({totales['llamadas']} llamadas)"}))
     print("¡Gracias por usar el GPS!")
             
\ No newline at end of file
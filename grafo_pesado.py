@@ -16,8 +16,12 @@ Librería para el análisis de grafos pesados.
 from typing import List,Tuple,Dict,Callable,Union
 import networkx as nx
 import sys
-import random 
+import time
+import itertools
+import multiprocessing
 import heapq #Librería para la creación de colas de prioridad
+import hashlib
+import numpy as np
 
 INFTY=sys.float_info.max #Distincia "infinita" entre nodos de un grafo
 
@@ -35,6 +39,171 @@ camino=dijkstra(G,mi_peso,origen, destino)
 
 """
 
+
+############ Instrumentación de las búsquedas ############
+
+#Contadores que se registran de cada búsqueda
+CONTADORES_BUSQUEDA = ["asentados", "aristas_relajadas", "inserciones", "extracciones", "extracciones_obsoletas", "maximo_cola", "segundos"]
+
+#Estado de la instrumentación. Mientras está desactivada cada búsqueda solo lo consulta al empezar
+#y comprueba una variable local por vértice expandido, así que su coste es despreciable.
+#Las búsquedas que se hacen en otros procesos no se registran en este.
+_instrumentacion = {"activa": False, "funcion": None, "ultima": None, "agregadas": {}}
+
+
+def activa_instrumentacion(activa: bool = True, funcion: Callable[[Dict[str, object]], None] = None) -> None:
+    """
+    Activa o desactiva el registro de estadísticas de las búsquedas de caminos mínimos.
+
+    Args:
+        activa (bool, opcional): Si se registran las estadísticas. Por defecto, True.
+        funcion (Callable[[Dict[str, object]], None], opcional): Función a la que se pasan las
+            estadísticas de cada búsqueda en cuanto termina, p. ej. para escribirlas en un log. Por defecto, None.
+    """
+    _instrumentacion["activa"] = activa
+    _instrumentacion["funcion"] = funcion if activa else None
+
+
+def estadisticas_busqueda() -> Dict[str, object]:
+    """
+    Devuelve las estadísticas de la última búsqueda registrada.
+
+    Returns:
+        Dict[str, object]: Nombre de la búsqueda ("busqueda") y valor de cada contador de
+            CONTADORES_BUSQUEDA, o None si no se ha registrado ninguna.
+    """
+    ultima = _instrumentacion["ultima"]
+    return dict(ultima) if ultima is not None else None
+
+
+def estadisticas_agregadas() -> Dict[str, Dict[str, float]]:
+    """
+    Devuelve las estadísticas acumuladas de cada tipo de búsqueda desde la última vez que se reiniciaron.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Para cada búsqueda, el número de llamadas, la suma de cada
+            contador y el máximo de "maximo_cola".
+    """
+    return {busqueda: dict(totales) for busqueda, totales in _instrumentacion["agregadas"].items()}
+
+
+def reinicia_estadisticas() -> None:
+    """Borra las estadísticas de la última búsqueda y las acumuladas."""
+    _instrumentacion["ultima"] = None
+    _instrumentacion["agregadas"] = {}
+
+
+def instrumentacion_activa() -> bool:
+    """
+    Indica si la instrumentación está activa. Las búsquedas definidas en otros módulos lo consultan
+    una vez al empezar y, si lo está, llaman a registra_busqueda al terminar.
+
+    Returns:
+        bool: True si se están registrando las estadísticas de las búsquedas.
+    """
+    return _instrumentacion["activa"]
+
+
+def registra_busqueda(busqueda: str, inicio: float, inserciones: int, en_cola: int, obsoletas: int, descartadas: int, relajadas: int, maximo_cola: int) -> None:
+    """
+    Registra las estadísticas de una búsqueda que acaba de terminar. Las extracciones se deducen de las
+    inserciones y de lo que queda en la cola, y los vértices fijados de las extracciones que no fueron
+    obsoletas ni descartadas (las que se sacan de la cola pero no se fijan, p. ej. al superar un límite).
+
+    Args:
+        busqueda (str): Nombre de la búsqueda con el que se acumulan sus estadísticas.
+        inicio (float): Valor de time.perf_counter() al empezar la búsqueda.
+        inserciones (int): Inserciones en la cola de prioridad.
+        en_cola (int): Elementos que quedan en la cola al terminar.
+        obsoletas (int): Extracciones de entradas obsoletas.
+        descartadas (int): Extracciones que no se fijaron.
+        relajadas (int): Aristas relajadas.
+        maximo_cola (int): Tamaño máximo de la cola.
+    Returns: None
+    """
+    segundos = time.perf_counter() - inicio
+    extracciones = inserciones - en_cola
+    estadisticas = {"busqueda": busqueda, "asentados": extracciones - obsoletas - descartadas, "aristas_relajadas": relajadas,
+                    "inserciones": inserciones, "extracciones": extracciones, "extracciones_obsoletas": obsoletas,
+                    "maximo_cola": maximo_cola, "segundos": segundos}
+    _instrumentacion["ultima"] = estadisticas
+
+    totales = _instrumentacion["agregadas"].setdefault(busqueda, dict.fromkeys(["llamadas"] + CONTADORES_BUSQUEDA, 0))
+    totales["llamadas"] += 1
+    for contador in CONTADORES_BUSQUEDA:
+        if contador == "maximo_cola":
+            totales[contador] = max(totales[contador], maximo_cola)
+        else:
+            totales[contador] += estadisticas[contador]
+    if _instrumentacion["funcion"] is not None:
+        _instrumentacion["funcion"](dict(estadisticas))
+
+def _dijkstra(G: Union[nx.Graph, nx.DiGraph], peso: Union[Callable[[nx.Graph, object, object], float], Callable[[nx.DiGraph, object, object], float]], origen: object, destino: object = None, busqueda: str = "dijkstra") -> Tuple[Dict[object, object], Dict[object, float]]:
+    """
+    Núcleo del algoritmo de Dijkstra compartido por "dijkstra" y "camino_minimo".
+
+    Solo guarda padre y distancia de los vértices alcanzados. Si se indica "destino",
+    la búsqueda se detiene en cuanto ese vértice queda fijado.
+
+    Args:
+        G (Union[nx.Graph, nx.DiGraph]): Grafo (dirigido o no dirigido).
+        peso (Callable): Función de peso de las aristas.
+        origen (object): vértice del grafo de origen.
+        destino (object, opcional): vértice en el que detener la búsqueda. Por defecto, None.
+        busqueda (str, opcional): Nombre con el que se registran sus estadísticas. Por defecto, "dijkstra".
+
+    Returns:
+        Tuple[Dict[object, object], Dict[object, float]]: Padre y distancia de cada vértice alcanzado.
+    """
+    if origen not in G:
+        raise TypeError(f"El vértice {origen} no pertenece al grafo.")
+
+    medir = _instrumentacion["activa"]
+    inicio = time.perf_counter() if medir else 0
+    obsoletas = relajadas = 0
+    maximo_cola = 1
+
+    padre = {origen: None}
+    distancias = {origen: 0}
+    visitado = set()
+
+    #Un contador creciente desempata de forma determinista los vértices a igual distancia
+    contador = itertools.count()
+    Q = [(0, next(contador), origen)]
+
+    while Q:
+        #Extraemos el nodo con la menor distancia
+        d_v, _, v = heapq.heappop(Q)
+
+        #Si ya estaba fijado la entrada de la cola es obsoleta y la descartamos
+        if v in visitado:
+            obsoletas += 1
+            continue
+        visitado.add(v)
+
+        #Si hemos fijado el destino su distancia ya es definitiva
+        if v == destino:
+            break
+
+        #Recorremos los vecinos de v y si encontramos una mejor distancia la cambiamos
+        for x in G.neighbors(v):
+            if x in visitado:
+                continue
+            d_x = d_v + peso(G, v, x)
+            if d_x < distancias.get(x, INFTY):
+                distancias[x] = d_x
+                padre[x] = v
+                heapq.heappush(Q, (d_x, next(contador), x))
+        if medir:
+            relajadas += len(G[v])
+            maximo_cola = max(maximo_cola, len(Q))
+
+    #El contador de desempate da el número de inserciones en la cola
+    if medir:
+        registra_busqueda(busqueda, inicio, next(contador), len(Q), obsoletas, 0, relajadas, maximo_cola)
+    return padre, distancias
+
+
 def dijkstra(G: Union[nx.Graph, nx.DiGraph], peso: Union[Callable[[nx.Graph, object, object], float], Callable[[nx.DiGraph, object, object], float]], origen: object) -> Dict[object, object]:
     """
     Calcula un Árbol de Caminos Mínimos para el grafo pesado partiendo
@@ -52,50 +221,18 @@ def dijkstra(G: Union[nx.Graph, nx.DiGraph], peso: Union[Callable[[nx.Graph, obj
     Raises:
         TypeError: Si "origen" no es un vértice válido.
     """
-    #Inicializamos las variables necesarias
+    arbol, _ = _dijkstra(G, peso, origen)
+
+    #Los vértices no alcanzados no tienen padre
     padre = {}
-    distancias = {}
-    visitado = {}
-    
-    #Para cada nodo, no tiene padre, distancia infinita, no visitado inicialmente
     for v in G.nodes:
-        padre[v] = None   
-        distancias[v] = float('inf') 
-        visitado[v] = False  
-    
-    #Ponemos que la distancia al origen es 0 y que no tiene padre
-    distancias[origen] = 0      
-    padre[origen] = None   
-
-    #Incializamos la lista de prioridad de origen ordenada por d
-    Q = [(0, random.randint(1,100000), origen)]
-
-
-    #Mientras que exista Q
-    while Q:
-        #Extraemos el nodo con la menor distancia y la distancia mínima
-        d_v, _, v = heapq.heappop(Q)
-
-        #Recorremos los vecinos de v
-        for x in G.neighbors(v): 
-
-            #Obtenemos el peso de la arista
-            if G.has_edge(v, x):
-                peso_arista = peso(G, v, x)  
-            else: 
-                peso_arista = 0
-
-            #Si encontramos una mejor distancia la cambiamos
-            if distancias[x] > distancias[v] + peso_arista:
-                distancias[x] = distancias[v] + peso_arista
-                padre[x] = v 
-                heapq.heappush(Q, (distancias[x], random.randint(1, 100000), x))
-    #Devolvemos el padre
+        padre[v] = arbol.get(v)
     return padre
 
 def camino_minimo(G:Union[nx.Graph, nx.DiGraph], peso:Union[Callable[[nx.Graph,object,object],float], Callable[[nx.DiGraph,object,object],float]] ,origen:object,destino:object)->List[object]:
     """ Calcula el camino mínimo desde el vértice origen hasta el vértice
-    destino utilizando el algoritmo de Dijkstra.
+    destino utilizando el algoritmo de Dijkstra. La búsqueda se detiene en
+    cuanto se fija el destino, sin recorrer el resto de la componente.
     
     Args:
         G (nx.Graph o nx.Digraph): grafo a grado dirigido
@@ -108,14 +245,17 @@ def camino_minimo(G:Union[nx.Graph, nx.DiGraph], peso:Union[Callable[[nx.Graph,o
             la lista es origen y el último destino.
     Example:
         Si dijksra(G,peso,1,4)=[1,5,2,4] entonces el camino más corto en G entre 1 y 4 es 1->5->2->4.
+    Raises:
+        Si el destino no es alcanzable desde el origen se devuelve [destino].
     Raises:
         TypeError: Si origen o destino no son "hashable".
+        ValueError: Si el destino no pertenece al grafo.
     """
-    #Sacamos el padre usando la función dijkstra
-    padre = dijkstra(G, peso, origen)
+    #Sacamos el padre con una búsqueda que termina al llegar al destino
+    padre, _ = _dijkstra(G, peso, origen, destino, "camino_minimo")
 
-    #Comprobamos si el destino esta en el padre, sino lanzamos el error 
-    if destino not in padre:
+    #Comprobamos si el destino esta en el grafo, sino lanzamos el error 
+    if destino not in G:
         raise ValueError("No existe camino entre origen y destino.")
 
     #Metemos en una lista el camino pero al revés, es decir desde el destino hasta el origen
@@ -127,52 +267,372 @@ def camino_minimo(G:Union[nx.Graph, nx.DiGraph], peso:Union[Callable[[nx.Graph,o
     #Devolvemos el camino pero invertido, para que sea desde el origen hasta el destino 
     return camino[::-1] 
 
+def camino_minimo_astar(G: Union[nx.Graph, nx.DiGraph], peso: Union[Callable[[nx.Graph, object, object], float], Callable[[nx.DiGraph, object, object], float]], origen: object, destino: object, heuristica: Callable[[Union[nx.Graph, nx.DiGraph], object, object], float]) -> List[object]:
+    """ Calcula el camino mínimo desde el vértice origen hasta el vértice
+    destino utilizando el algoritmo A*.
+
+    La heurística recibe el grafo, un vértice y el destino y devuelve una cota inferior
+    del peso del camino mínimo entre ambos. Si la cota es admisible (nunca sobrestima)
+    el camino devuelto es mínimo; un vértice se vuelve a expandir si se mejora su
+    distancia, por lo que no hace falta que la heurística sea consistente.
+
+    Args:
+        G (nx.Graph o nx.Digraph): grafo a grado dirigido
+        peso (función): función que recibe un grafo o grafo dirigido y dos vértices del mismo y devuelve el peso de la arista que los conecta
+        origen (object): vértice del grafo de origen
+        destino (object): vértice del grafo de destino
+        heuristica (función): función que recibe el grafo, un vértice y el destino y devuelve una cota inferior de la distancia entre ellos
+    Returns:
+        List[object]: Lista con los vértices del camino más corto entre origen y destino.
+    Raises:
+        TypeError: Si "origen" no es un vértice válido.
+        ValueError: Si no existe camino entre origen y destino.
+    """
+    if origen not in G:
+        raise TypeError(f"El vértice {origen} no pertenece al grafo.")
+
+    medir = _instrumentacion["activa"]
+    inicio = time.perf_counter() if medir else 0
+    obsoletas = relajadas = 0
+    maximo_cola = 1
+
+    padre = {origen: None}
+    distancias = {origen: 0}
+    contador = itertools.count()
+    #La cola se ordena por f = g + h y guarda también g para detectar entradas obsoletas
+    Q = [(heuristica(G, origen, destino), next(contador), 0, origen)]
+
+    encontrado = False
+    while Q:
+        _, _, d_v, v = heapq.heappop(Q)
+        if d_v > distancias[v]:
+            obsoletas += 1
+            continue
+        if v == destino:
+            encontrado = True
+            break
+        for x in G.neighbors(v):
+            d_x = d_v + peso(G, v, x)
+            if d_x < distancias.get(x, INFTY):
+                distancias[x] = d_x
+                padre[x] = v
+                heapq.heappush(Q, (d_x + heuristica(G, x, destino), next(contador), d_x, x))
+        if medir:
+            relajadas += len(G[v])
+            maximo_cola = max(maximo_cola, len(Q))
+
+    if medir:
+        registra_busqueda("camino_minimo_astar", inicio, next(contador), len(Q), obsoletas, 0, relajadas, maximo_cola)
+    if not encontrado:
+        raise ValueError("No existe camino entre origen y destino.")
+
+    #Reconstruimos el camino desde el destino hasta el origen y lo invertimos
+    camino = []
+    actual = destino
+    while actual is not None:
+        camino.append(actual)
+        actual = padre[actual]
+    return camino[::-1]
+
+def _dijkstra_bidireccional(G: Union[nx.Graph, nx.DiGraph], peso: Union[Callable[[nx.Graph, object, object], float], Callable[[nx.DiGraph, object, object], float]], origen: object, destino: object, estiramiento: float = 0, busqueda: str = "camino_minimo_bidireccional") -> Tuple[float, object, Dict[object, object], Dict[object, float], Dict[object, object], Dict[object, float]]:
+    """
+    Núcleo de la búsqueda bidireccional. Devuelve la distancia mínima, el vértice de encuentro
+    y el padre y la distancia de cada vértice alcanzado por la búsqueda hacia delante (desde
+    "origen" por sucesores) y por la búsqueda hacia atrás (desde "destino" por predecesores).
+    En el árbol hacia atrás el "padre" de un vértice es su siguiente vértice hacia el destino.
+    Si no hay camino la distancia es INFTY y el vértice de encuentro None.
+
+    Con "estiramiento" > 0, una vez encontrada la distancia mínima d las búsquedas continúan hasta
+    fijar en ambas todos los vértices v con d(origen, v) + d(v, destino) <= (1 + estiramiento) * d,
+    que son los que necesitan los caminos alternativos. Sus estadísticas se registran con el nombre "busqueda".
+    """
+    for v in (origen, destino):
+        if v not in G:
+            raise TypeError(f"El vértice {v} no pertenece al grafo.")
+
+    #En un digrafo la búsqueda hacia atrás recorre las aristas al revés
+    vecinos = [G.neighbors, G.predecessors if G.is_directed() else G.neighbors]
+    padres = [{origen: None}, {destino: None}]
+    distancias = [{origen: 0}, {destino: 0}]
+    visitados = [set(), set()]
+    contador = itertools.count()
+    colas = [[(0, next(contador), origen)], [(0, next(contador), destino)]]
+
+    medir = _instrumentacion["activa"]
+    inicio = time.perf_counter() if medir else 0
+    obsoletas = relajadas = 0
+    maximo_cola = 2
+    adyacencias = [G.succ, G.pred] if G.is_directed() else [G.adj, G.adj]
+
+    mejor = INFTY if origen != destino else 0
+    encuentro = None if origen != destino else origen
+
+    #Paramos cuando la suma de los mínimos de ambas colas no puede mejorar el mejor camino encontrado
+    while colas[0] and colas[1] and colas[0][0][0] + colas[1][0][0] < mejor:
+        #Avanzamos la búsqueda con menor distancia en la cabeza de su cola
+        lado = 0 if colas[0][0][0] <= colas[1][0][0] else 1
+        d_v, _, v = heapq.heappop(colas[lado])
+        if v in visitados[lado]:
+            obsoletas += 1
+            continue
+        visitados[lado].add(v)
+
+        padre, distancia, otra = padres[lado], distancias[lado], distancias[1 - lado]
+        for x in vecinos[lado](v):
+            if x in visitados[lado]:
+                continue
+            #La arista es v->x hacia delante y x->v hacia atrás
+            d_x = d_v + (peso(G, v, x) if lado == 0 else peso(G, x, v))
+            if d_x < distancia.get(x, INFTY):
+                distancia[x] = d_x
+                padre[x] = v
+                heapq.heappush(colas[lado], (d_x, next(contador), x))
+            #Cada arista que conecta ambas búsquedas da un camino candidato
+            if x in otra and d_x + otra[x] < mejor:
+                mejor = d_x + otra[x]
+                encuentro = x
+        if medir:
+            relajadas += len(adyacencias[lado][v])
+            maximo_cola = max(maximo_cola, len(colas[0]) + len(colas[1]))
+
+    #Para las alternativas solo interesan los vértices v con d(origen, v) + d(v, destino) <= limite, y los
+    #caminos mínimos hacia ellos solo pasan por vértices que también lo cumplen. Hacia delante la distancia
+    #hasta el destino de un vértice no fijado hacia atrás es al menos la cabeza de la cola hacia atrás;
+    #después, hacia atrás, solo se sigue por vértices fijados hacia delante.
+    if estiramiento > 0 and encuentro is not None:
+        limite = (1 + estiramiento) * mejor
+        radios = [colas[1][0][0] if colas[1] else INFTY, INFTY]
+        for lado in (0, 1):
+            padre, distancia, otra, cola = padres[lado], distancias[lado], distancias[1 - lado], colas[lado]
+            visitado, visitado_otro, radio = visitados[lado], visitados[1 - lado], radios[lado]
+            while cola and cola[0][0] <= limite:
+                d_v, _, v = heapq.heappop(cola)
+                if v in visitado:
+                    obsoletas += 1
+                    continue
+                visitado.add(v)
+                for x in vecinos[lado](v):
+                    if x in visitado:
+                        continue
+                    d_x = d_v + (peso(G, v, x) if lado == 0 else peso(G, x, v))
+                    if d_x < distancia.get(x, INFTY) and d_x + (otra[x] if x in visitado_otro else radio) <= limite:
+                        distancia[x] = d_x
+                        padre[x] = v
+                        heapq.heappush(cola, (d_x, next(contador), x))
+                if medir:
+                    relajadas += len(adyacencias[lado][v])
+                    maximo_cola = max(maximo_cola, len(colas[0]) + len(colas[1]))
+
+    #Las estadísticas suman ambas búsquedas y la cola máxima es la de las dos colas juntas
+    if medir:
+        registra_busqueda(busqueda, inicio, next(contador), len(colas[0]) + len(colas[1]), obsoletas, 0, relajadas, maximo_cola)
+    return mejor, encuentro, padres[0], distancias[0], padres[1], distancias[1]
+
+
+def camino_minimo_bidireccional(G: Union[nx.Graph, nx.DiGraph], peso: Union[Callable[[nx.Graph, object, object], float], Callable[[nx.DiGraph, object, object], float]], origen: object, destino: object) -> List[object]:
+    """ Calcula el camino mínimo desde el vértice origen hasta el vértice
+    destino con el algoritmo de Dijkstra bidireccional: una búsqueda hacia delante
+    desde el origen por los sucesores y otra hacia atrás desde el destino por los
+    predecesores, que se detienen cuando ya no pueden mejorar el camino encontrado.
+    
+    Args:
+        G (nx.Graph o nx.Digraph): grafo a grado dirigido
+        peso (función): función que recibe un grafo o grafo dirigido y dos vértices del mismo y devuelve el peso de la arista que los conecta
+        origen (object): vértice del grafo de origen
+        destino (object): vértice del grafo de destino
+    Returns:
+        List[object]: Lista con los vértices del camino más corto entre origen y destino.
+    Raises:
+        TypeError: Si origen o destino no son vértices válidos.
+        ValueError: Si no existe camino entre origen y destino.
+    """
+    _, encuentro, padre, _, siguiente, _ = _dijkstra_bidireccional(G, peso, origen, destino)
+    if encuentro is None:
+        raise ValueError("No existe camino entre origen y destino.")
+
+    #Desde el vértice de encuentro vamos hacia el origen con un árbol y hacia el destino con el otro
+    camino = []
+    actual = encuentro
+    while actual is not None:
+        camino.append(actual)
+        actual = padre[actual]
+    camino.reverse()
+    actual = siguiente[encuentro]
+    while actual is not None:
+        camino.append(actual)
+        actual = siguiente[actual]
+    return camino
+
+def _rutas_via(mejor: float, padre: Union[Dict, List], distancia: Union[Dict, List[float]], siguiente: Union[Dict, List], distancia_b: Union[Dict, List[float]], candidatos: List[object], nulo: object, k: int, estiramiento: float, solapamiento: float, optimalidad_local: float) -> List[List[object]]:
+    """
+    Selección de caminos alternativos por vértices intermedios (via-node) a partir de los árboles de
+    una búsqueda bidireccional, común a las versiones sobre NetworkX y sobre GrafoCompilado.
+
+    Cada vértice v fijado por ambas búsquedas da el camino origen -> v por el árbol hacia delante y
+    v -> destino por el árbol hacia atrás. Las aristas que están en los dos árboles forman mesetas
+    (plateaus): todos los vértices de una meseta dan el mismo camino, así que cada meseta se examina
+    una sola vez, y su longitud garantiza que el camino es óptimo en cualquier tramo de esa longitud.
+    Los candidatos se examinan de menor a mayor peso, el primero es el camino mínimo y se aceptan
+    los que pasan los filtros hasta tener k caminos.
+
+    Args:
+        mejor (float): Distancia mínima entre origen y destino.
+        padre, distancia: Árbol hacia delante y distancias desde el origen.
+        siguiente, distancia_b: Árbol hacia atrás y distancias hasta el destino.
+        candidatos (List[object]): Vértices fijados por ambas búsquedas.
+        nulo (object): Valor de "padre" y "siguiente" en las raíces de los árboles.
+        k (int): Número máximo de caminos.
+        estiramiento (float): Exceso máximo de peso sobre el mínimo, en proporción.
+        solapamiento (float): Peso máximo compartido con cada camino ya elegido, en proporción del mínimo.
+        optimalidad_local (float): Longitud mínima de la meseta, en proporción del mínimo.
+    Returns:
+        List[List[object]]: Caminos elegidos, el mínimo el primero.
+    """
+    limite = (1 + estiramiento) * mejor
+    candidatos = [(distancia[v] + distancia_b[v], v) for v in candidatos if distancia[v] + distancia_b[v] <= limite]
+    candidatos.sort(key=lambda par: par[0])
+    en_limite = {v for _, v in candidatos}
+
+    examinados = set()
+    rutas = []
+    aristas_rutas = []
+    for _, v in candidatos:
+        if len(rutas) >= k:
+            break
+        if v in examinados:
+            continue
+
+        #Extremos de la meseta de v: las aristas de sus vértices están en ambos árboles
+        a = v
+        while padre[a] != nulo and padre[a] in en_limite and siguiente[padre[a]] == a:
+            a = padre[a]
+        b = v
+        while siguiente[b] != nulo and siguiente[b] in en_limite and padre[siguiente[b]] == b:
+            b = siguiente[b]
+        x = b
+        examinados.add(x)
+        while x != a:
+            x = padre[x]
+            examinados.add(x)
+        if rutas and distancia[b] - distancia[a] < optimalidad_local * mejor:
+            continue
+
+        #Camino y peso de cada arista, sacados de las distancias de los árboles
+        ida = [v]
+        while padre[ida[-1]] != nulo:
+            ida.append(padre[ida[-1]])
+        ida.reverse()
+        vuelta = [v]
+        while siguiente[vuelta[-1]] != nulo:
+            vuelta.append(siguiente[vuelta[-1]])
+        ruta = ida + vuelta[1:]
+        if len(set(ruta)) < len(ruta):
+            continue
+        aristas = {}
+        for x, y in zip(ida, ida[1:]):
+            aristas[(x, y)] = distancia[y] - distancia[x]
+        for x, y in zip(vuelta, vuelta[1:]):
+            aristas[(x, y)] = distancia_b[x] - distancia_b[y]
+
+        if any(sum(w for arista, w in aristas.items() if arista in elegidas) > solapamiento * mejor for elegidas in aristas_rutas):
+            continue
+        rutas.append(ruta)
+        aristas_rutas.append(aristas)
+    return rutas
+
+
+def caminos_alternativos(G: Union[nx.Graph, nx.DiGraph], peso: Union[Callable[[nx.Graph, object, object], float], Callable[[nx.DiGraph, object, object], float]], origen: object, destino: object, k: int = 3, estiramiento: float = 0.25, solapamiento: float = 0.8, optimalidad_local: float = 0.25) -> List[List[object]]:
+    """ Calcula el camino mínimo y hasta k-1 caminos alternativos entre origen y destino.
+
+    Se hace una única búsqueda bidireccional que, tras encontrar el camino mínimo, sigue por
+    ambos lados hasta (1 + estiramiento) veces su peso, y las alternativas se obtienen de sus dos
+    árboles por vértices intermedios (via-node), sin repetir búsquedas. El coste es el de unas
+    pocas búsquedas de camino mínimo, independientemente de k.
+
+    Args:
+        G (nx.Graph o nx.Digraph): grafo a grado dirigido
+        peso (función): función que recibe un grafo o grafo dirigido y dos vértices del mismo y devuelve el peso de la arista que los conecta
+        origen (object): vértice del grafo de origen
+        destino (object): vértice del grafo de destino
+        k (int, opcional): Número máximo de caminos devueltos, contando el mínimo. Por defecto, 3.
+        estiramiento (float, opcional): Cada alternativa pesa como mucho (1 + estiramiento) veces el
+            camino mínimo. Por defecto, 0.25.
+        solapamiento (float, opcional): Peso máximo que una alternativa comparte con cada camino ya
+            elegido, en proporción del camino mínimo. Por defecto, 0.8.
+        optimalidad_local (float, opcional): Cada alternativa es mínima en cualquier tramo de peso hasta
+            optimalidad_local veces el camino mínimo, lo que evita rodeos absurdos. Por defecto, 0.25.
+    Returns:
+        List[List[object]]: Caminos ordenados por peso; el primero es el mínimo. Puede haber menos de k.
+    Raises:
+        TypeError: Si origen o destino no son vértices válidos.
+        ValueError: Si no existe camino entre origen y destino.
+    """
+    if origen == destino:
+        if origen not in G:
+            raise TypeError(f"El vértice {origen} no pertenece al grafo.")
+        return [[origen]]
+    mejor, encuentro, padre, distancia, siguiente, distancia_b = _dijkstra_bidireccional(G, peso, origen, destino, estiramiento, "caminos_alternativos")
+    if encuentro is None:
+        raise ValueError("No existe camino entre origen y destino.")
+    candidatos = [v for v in distancia if v in distancia_b]
+    return _rutas_via(mejor, padre, distancia, siguiente, distancia_b, candidatos, None, k, estiramiento, solapamiento, optimalidad_local)
+
 def prim(G: nx.Graph, peso: Callable[[nx.Graph, object, object], float]) -> Dict[object, object]:
     """
     Calcula un Árbol Abarcador Mínimo para el grafo pesado usando el algoritmo de Prim.
+    Si el grafo no es conexo se calcula un bosque abarcador mínimo: un árbol por componente.
 
     Args:
         G (nx.Graph): Grafo de NetworkX.
         peso (Callable[[nx.Graph, object, object], float]): Función que recibe un grafo y dos vértices del grafo y devuelve el peso de la arista que los conecta.
 
     Returns:
-        Dict[object, object]: Diccionario que indica, para cada vértice, qué vértice es su padre en el árbol abarcador mínimo.
+        Dict[object, object]: Diccionario que indica, para cada vértice, qué vértice es su padre en el árbol abarcador mínimo
+            (None para la raíz de cada componente).
     """
     #Inicializamos las variables
     padre = {}  
     coste_minimo = {} 
-    visitado = {} 
+    visitado = set()
     
-    #Para cada nodo, no tiene padre, coste mínimo infinito, no visitado inicialmente
+    #Para cada nodo, no tiene padre y coste mínimo infinito
     for v in G.nodes:
         padre[v] = None 
-        coste_minimo[v] = float('inf')  
-        visitado[v] = False 
-    
-    #Empezamos desde un vértice cualquiera en este caso el primero por ejemplo
-    origen = list(G.nodes)[0]
-    #Coste desde el origen es 0
-    coste_minimo[origen] = 0 
-    
-    #Inicializamos la cola de prioridad ordenada por coste mínimo
-    Q = [(0, random.randint(1,100000), origen)]
+        coste_minimo[v] = INFTY
 
-    #Mientras que exista Q
-    while Q:
+    #El contador desempata los costes iguales sin comparar vértices (que pueden no ser comparables)
+    contador = itertools.count()
 
-        #Extraemos el vértice con el menor coste 
-        coste_v, _, v = heapq.heappop(Q)
+    #Empezamos desde el primer vértice y, si quedan vértices sin visitar, desde el siguiente de otra componente
+    for origen in G.nodes:
+        if origen in visitado:
+            continue
+        #Coste desde el origen es 0
+        coste_minimo[origen] = 0 
+        Q = [(0, next(contador), origen)]
 
-        #Recorremos los vecinos 
-        for x in G.neighbors(v):
-            #Obtenemos el peso 
-            peso_arista = peso(G, v, x)
-            
-            #Si encontramos una mejor arista la cambiamos
-            if peso_arista < coste_minimo[x]:
-                coste_minimo[x] = peso_arista
-                padre[x] = v 
-                heapq.heappush(Q, (coste_minimo[x], random.randint(1, 100000), x))
+        #Mientras que exista Q
+        while Q:
+            #Extraemos el vértice con el menor coste
+            _, _, v = heapq.heappop(Q)
+
+            #Las entradas obsoletas de vértices que ya están en el árbol se descartan
+            if v in visitado:
+                continue
+            visitado.add(v)
+
+            #Recorremos los vecinos que aún no están en el árbol
+            for x in G.neighbors(v):
+                if x in visitado:
+                    continue
+                #Obtenemos el peso 
+                peso_arista = peso(G, v, x)
+                
+                #Si encontramos una mejor arista la cambiamos
+                if peso_arista < coste_minimo[x]:
+                    coste_minimo[x] = peso_arista
+                    padre[x] = v 
+                    heapq.heappush(Q, (peso_arista, next(contador), x))
     #Devolvemos el padre
     return padre       
 
@@ -180,6 +640,7 @@ def prim(G: nx.Graph, peso: Callable[[nx.Graph, object, object], float]) -> Dict
 def kruskal(G: nx.Graph, peso: Callable[[nx.Graph, object, object], float]) -> List[Tuple[object, object]]:
     """
     Calcula un Árbol Abarcador Mínimo para el grafo usando el algoritmo de Kruskal.
+    Si el grafo no es conexo se calcula un bosque abarcador mínimo.
 
     Args:
         G (nx.Graph): Grafo de NetworkX.
@@ -189,9 +650,10 @@ def kruskal(G: nx.Graph, peso: Callable[[nx.Graph, object, object], float]) -> L
     Returns:
         List[Tuple[object, object]]: Lista de los pares de vértices que forman las aristas del árbol abarcador mínimo.
     """
-    #Creamos la lista de aristas y las ordenamos por peso
-    aristas = [(u, v, peso(G, u, v)) for u, v in G.edges()]
-    aristas.sort(key=lambda x: x[2])
+    #Creamos la lista de aristas y las ordenamos por peso con un array (orden estable ante empates)
+    aristas = list(G.edges())
+    pesos = np.array([peso(G, u, v) for u, v in aristas], dtype=np.float64)
+    orden = np.argsort(pesos, kind="stable").tolist()
 
     #Inicializamos padres y rangos
     padres = {node: node for node in G.nodes()}  
@@ -201,25 +663,1022 @@ def kruskal(G: nx.Graph, peso: Callable[[nx.Graph, object, object], float]) -> L
     aristas_minimas = []
 
     #Iteramos las aristas
-    for u, v, w in aristas:
-        while padres[u] != u:
-            u = padres[u]
-
-        while padres[v] != v:
-            v = padres[v]
+    for i in orden:
+        u, v = aristas[i]
+        #Buscamos las raíces comprimiendo el camino: cada vértice recorrido pasa a apuntar a su abuelo
+        ru = u
+        while padres[ru] != ru:
+            padres[ru] = padres[padres[ru]]
+            ru = padres[ru]
+        rv = v
+        while padres[rv] != rv:
+            padres[rv] = padres[padres[rv]]
+            rv = padres[rv]
 
         #Si los nodos no están en la misma componente
-        if u != v:
-            #Los añadimos a la lista de aristas mínimas
+        if ru != rv:
+            #Añadimos la arista original a la lista de aristas mínimas
             aristas_minimas.append((u, v))
             
-            #Los unimos
-            if rangos[u] > rangos[v]:
-                padres[v] = u
-            elif rangos[u] < rangos[v]:
-                padres[u] = v
+            #Unimos las componentes por rango
+            if rangos[ru] > rangos[rv]:
+                padres[rv] = ru
+            elif rangos[ru] < rangos[rv]:
+                padres[ru] = rv
             else:
-                padres[v] = u
-                rangos[u] += 1
+                padres[rv] = ru
+                rangos[ru] += 1
     #Devolvemos la lista de aristas mínimas
-    return aristas_minimas
\ No newline at end of file
+    return aristas_minimas
+
+
+def peso_atributo(atributo: str) -> Callable[[Union[nx.Graph, nx.DiGraph], object, object], float]:
+    """
+    Devuelve una función de peso que lee directamente un atributo de las aristas.
+
+    Args:
+        atributo (str): Nombre del atributo de las aristas con el peso.
+    Returns:
+        Callable: Función de peso G, u, v -> G[u][v][atributo].
+    """
+    def peso(G: Union[nx.Graph, nx.DiGraph], u: object, v: object) -> float:
+        return G[u][v][atributo]
+    return peso
+
+
+############ Grafo compilado (CSR) ############
+
+class GrafoCompilado:
+    """
+    Representación compacta de un grafo de NetworkX en formato CSR (Compressed Sparse Row).
+
+    Los vértices se numeran de 0 a n-1 y los sucesores del vértice i son
+    destinos[offsets[i]:offsets[i+1]]. Para cada función de peso se guarda un
+    array de reales alineado con "destinos", de forma que las búsquedas no vuelven
+    a llamar a la función de peso ni a consultar los diccionarios de NetworkX.
+    Si el grafo no es dirigido cada arista aparece en ambos sentidos.
+
+    Attributes:
+        nodos (List[object]): Vértice original asociado a cada índice.
+        indice (Dict[object, int]): Índice asociado a cada vértice original.
+        dirigido (bool): Indica si el grafo original es dirigido.
+        offsets (np.ndarray): Array int64 de tamaño n+1 con el inicio de los sucesores de cada vértice.
+        destinos (np.ndarray): Array int32 con el índice del vértice destino de cada arista.
+        pesos (Dict[str, np.ndarray]): Array float64 de pesos para cada función de peso compilada.
+        version (int): Número de veces que se han modificado los pesos con actualiza_pesos. Las estructuras
+            construidas sobre el grafo (cachés de rutas, tablas de landmarks...) lo usan para saber si siguen al día.
+    """
+
+    def __init__(self, G: Union[nx.Graph, nx.DiGraph], pesos: Dict[str, Union[str, Callable[[nx.Graph, object, object], float], Callable[[nx.DiGraph, object, object], float]]]):
+        """
+        Compila el grafo G calculando una única vez el peso de cada arista para cada función de peso.
+
+        Args:
+            G (Union[nx.Graph, nx.DiGraph]): Grafo (dirigido o no dirigido).
+            pesos (Dict[str, Union[str, Callable]]): Diccionario nombre -> función de peso. Cada nombre
+                identifica después el array de pesos en las búsquedas. En lugar de una función se puede
+                dar el nombre de un atributo de las aristas que ya contiene el peso.
+        """
+        pesos = {nombre: peso_atributo(peso) if isinstance(peso, str) else peso for nombre, peso in pesos.items()}
+        self.nodos = list(G.nodes)
+        self.indice = {v: i for i, v in enumerate(self.nodos)}
+        self.dirigido = G.is_directed()
+
+        #Recorremos las listas de adyacencia guardando destino y pesos de cada arista
+        offsets = [0]
+        destinos = []
+        valores = {nombre: [] for nombre in pesos}
+        for u in self.nodos:
+            for v in G.neighbors(u):
+                destinos.append(self.indice[v])
+                for nombre, peso in pesos.items():
+                    valores[nombre].append(peso(G, u, v))
+            offsets.append(len(destinos))
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.destinos = np.array(destinos, dtype=np.int32)
+        self.pesos = {nombre: np.array(lista, dtype=np.float64) for nombre, lista in valores.items()}
+
+        #Copias en listas de Python para los bucles de búsqueda (indexar listas es más rápido que indexar arrays)
+        self._listas = {}
+        self.vistas = False
+        self.version = 0
+
+    @classmethod
+    def desde_arrays(cls, nodos: List[object], offsets: np.ndarray, destinos: np.ndarray, pesos: Dict[str, np.ndarray], dirigido: bool = True, vistas: bool = False) -> "GrafoCompilado":
+        """
+        Construye un GrafoCompilado directamente a partir de sus arrays CSR.
+
+        Args:
+            nodos (List[object]): Vértice original asociado a cada índice.
+            offsets (np.ndarray): Inicio de los sucesores de cada vértice (tamaño n+1).
+            destinos (np.ndarray): Índice del vértice destino de cada arista.
+            pesos (Dict[str, np.ndarray]): Array de pesos de cada función de peso.
+            dirigido (bool, opcional): Si el grafo es dirigido. Por defecto, True.
+            vistas (bool, opcional): Si las búsquedas leen los arrays a través de memoryview en lugar de
+                copiarlos en listas de Python: algo más lento, pero no duplica los arrays (útil si están
+                en memoria compartida o proyectados desde disco). Por defecto, False.
+        Returns:
+            GrafoCompilado: Grafo compilado con esos arrays.
+        """
+        grafo = cls.__new__(cls)
+        grafo.nodos = list(nodos)
+        grafo.indice = {v: i for i, v in enumerate(grafo.nodos)}
+        grafo.dirigido = dirigido
+        grafo.offsets = np.asarray(offsets, dtype=np.int64)
+        grafo.destinos = np.asarray(destinos, dtype=np.int32)
+        grafo.pesos = {nombre: np.asarray(array, dtype=np.float64) for nombre, array in pesos.items()}
+        grafo._listas = {}
+        grafo.vistas = vistas
+        grafo.version = 0
+        return grafo
+
+    def invertido(self) -> "GrafoCompilado":
+        """
+        Devuelve el grafo compilado con todas las aristas invertidas (los sucesores pasan a ser
+        los predecesores), con los mismos índices de vértices y los mismos pesos.
+
+        Los pesos se copian: si después cambian los del grafo (ver actualiza_pesos) hay que volver
+        a invertirlo. Para recorrer los predecesores con los pesos actuales, ver "predecesores".
+
+        Returns:
+            GrafoCompilado: Grafo invertido. Si el grafo no es dirigido se devuelve él mismo.
+        """
+        if not self.dirigido:
+            return self
+        offsets, origenes, posiciones = self.predecesores()
+        pesos = {nombre: array[posiciones] for nombre, array in self.pesos.items()}
+        return GrafoCompilado.desde_arrays(self.nodos, offsets, origenes, pesos, dirigido=True, vistas=self.vistas)
+
+    def predecesores(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Devuelve la adyacencia CSR de los predecesores de cada vértice junto con la posición de cada
+        arista en la adyacencia original. No copia pesos, así que sigue siendo válida aunque cambien:
+        el peso de la arista i del vértice v es pesos[posiciones[i]].
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: offsets (tamaño n+1), vértice de origen y
+                posición en el CSR original de cada arista, agrupadas por vértice de destino.
+        """
+        origenes = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.offsets))
+        posiciones = np.argsort(self.destinos, kind="stable")
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(self.destinos, minlength=len(self)))
+        return offsets, origenes[posiciones], posiciones
+
+    def __len__(self) -> int:
+        return len(self.nodos)
+
+    def actualiza_pesos(self, peso: str, posiciones: np.ndarray, valores: np.ndarray) -> np.ndarray:
+        """
+        Cambia los pesos de algunas aristas, también en las listas que usan las búsquedas, e
+        incrementa "version" para que las estructuras construidas sobre el grafo lo detecten.
+
+        Args:
+            peso (str): Nombre de la función de peso compilada.
+            posiciones (np.ndarray): Posición de cada arista en la adyacencia CSR.
+            valores (np.ndarray): Nuevo peso de cada arista.
+        Returns:
+            np.ndarray: Peso anterior de cada arista.
+        Raises:
+            KeyError: Si "peso" no es una función de peso compilada.
+        """
+        if peso not in self.pesos:
+            raise KeyError(f"El peso '{peso}' no está compilado en el grafo.")
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        array = self.pesos[peso]
+        anteriores = array[posiciones].copy()
+        array[posiciones] = valores
+        if peso in self._listas:
+            if self.vistas:
+                #La vista puede ser de una copia contigua: se vuelve a crear en la próxima búsqueda
+                del self._listas[peso]
+            else:
+                lista = self._listas[peso]
+                for posicion, valor in zip(posiciones.tolist(), array[posiciones].tolist()):
+                    lista[posicion] = valor
+        self.version += 1
+        return anteriores
+
+    def firma(self, peso: str) -> str:
+        """
+        Calcula una firma SHA-1 de los vértices (en su orden), la adyacencia y los pesos "peso" del grafo.
+
+        Cualquier cambio en un vértice, una arista o un peso cambia la firma, así que sirve para
+        saber si unas tablas guardadas siguen correspondiendo al grafo (ver contraccion.firma_grafo).
+
+        Args:
+            peso (str): Nombre de la función de peso compilada.
+        Returns:
+            str: Firma en hexadecimal.
+        Raises:
+            KeyError: Si "peso" no es una función de peso compilada.
+        """
+        if peso not in self.pesos:
+            raise KeyError(f"El peso '{peso}' no está compilado en el grafo.")
+        sha1 = hashlib.sha1()
+        sha1.update(repr((self.dirigido, len(self), self.numero_aristas())).encode())
+        sha1.update(repr(self.nodos).encode())
+        sha1.update(np.ascontiguousarray(self.offsets, dtype=np.int64).tobytes())
+        sha1.update(np.ascontiguousarray(self.destinos, dtype=np.int32).tobytes())
+        sha1.update(np.ascontiguousarray(self.pesos[peso], dtype=np.float64).tobytes())
+        return sha1.hexdigest()
+
+    def numero_aristas(self) -> int:
+        """Devuelve el número de aristas almacenadas (en un grafo no dirigido, el doble de aristas del grafo)."""
+        return len(self.destinos)
+
+    def csr(self, peso: str) -> Tuple[List[int], List[int], List[float]]:
+        """
+        Devuelve offsets, destinos y pesos como listas de Python, calculándolas solo la primera vez.
+        Si el grafo se construyó con "vistas", devuelve memoryview de los arrays en lugar de copias.
+
+        Args:
+            peso (str): Nombre de la función de peso compilada.
+        Returns:
+            Tuple[List[int], List[int], List[float]]: Listas offsets, destinos y pesos.
+        Raises:
+            KeyError: Si "peso" no es una función de peso compilada.
+        """
+        if peso not in self.pesos:
+            raise KeyError(f"El peso '{peso}' no está compilado en el grafo.")
+        convierte = (lambda array: memoryview(np.ascontiguousarray(array))) if self.vistas else (lambda array: array.tolist())
+        if "offsets" not in self._listas:
+            self._listas["offsets"] = convierte(self.offsets)
+            self._listas["destinos"] = convierte(self.destinos)
+        if peso not in self._listas:
+            self._listas[peso] = convierte(self.pesos[peso])
+        return self._listas["offsets"], self._listas["destinos"], self._listas[peso]
+
+
+def _dijkstra_csr(offsets: List[int], destinos: List[int], pesos: List[float], origen: int, destino: int = -1, objetivos: set = None, limite: float = INFTY, busqueda: str = "dijkstra_compilado") -> Tuple[List[float], List[int]]:
+    """
+    Dijkstra sobre listas CSR. Devuelve las distancias y el padre (índice, -1 si no tiene) de cada vértice.
+    Si se indica "destino" la búsqueda termina en cuanto se fija ese vértice, si se indica un
+    conjunto de "objetivos", en cuanto se han fijado todos ellos y, si se indica un "limite", en
+    cuanto la menor distancia pendiente lo supera (los vértices a distancia mayor quedan sin fijar).
+    Sus estadísticas se registran con el nombre "busqueda".
+    """
+    medir = _instrumentacion["activa"]
+    inicio = time.perf_counter() if medir else 0
+    inserciones = 1
+    obsoletas = descartadas = relajadas = 0
+    maximo_cola = 1
+
+    n = len(offsets) - 1
+    distancias = [INFTY] * n
+    padre = [-1] * n
+    visitado = [False] * n
+    distancias[origen] = 0
+    pendientes = len(objetivos) if objetivos is not None else -1
+    Q = [(0, origen)]
+    while Q:
+        d_v, v = heapq.heappop(Q)
+        #Las entradas obsoletas de la cola se descartan
+        if visitado[v]:
+            obsoletas += 1
+            continue
+        if d_v > limite:
+            descartadas = 1
+            break
+        visitado[v] = True
+        if v == destino:
+            break
+        if pendientes > 0 and v in objetivos:
+            pendientes -= 1
+            if pendientes == 0:
+                break
+        for i in range(offsets[v], offsets[v + 1]):
+            x = destinos[i]
+            d_x = d_v + pesos[i]
+            if d_x < distancias[x]:
+                distancias[x] = d_x
+                padre[x] = v
+                heapq.heappush(Q, (d_x, x))
+                if medir:
+                    inserciones += 1
+        if medir:
+            relajadas += offsets[v + 1] - offsets[v]
+            maximo_cola = max(maximo_cola, len(Q))
+
+    if medir:
+        registra_busqueda(busqueda, inicio, inserciones, len(Q), obsoletas, descartadas, relajadas, maximo_cola)
+    return distancias, padre
+
+
+def dijkstra_compilado(G: GrafoCompilado, peso: str, origen: object) -> Dict[object, object]:
+    """
+    Versión de "dijkstra" sobre un GrafoCompilado.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        origen (object): vértice del grafo de origen.
+
+    Returns:
+        Dict[object, object]: Diccionario que indica, para cada vértice, qué vértice es su padre
+            en el árbol de caminos mínimos (None para el origen y los vértices no alcanzables).
+
+    Raises:
+        KeyError: Si "origen" no es un vértice del grafo o "peso" no está compilado.
+    """
+    offsets, destinos, pesos = G.csr(peso)
+    _, padre = _dijkstra_csr(offsets, destinos, pesos, G.indice[origen])
+
+    #Traducimos los índices a los vértices originales
+    nodos = G.nodos
+    return {nodos[i]: (nodos[p] if p >= 0 else None) for i, p in enumerate(padre)}
+
+
+def distancias_compilado(G: GrafoCompilado, peso: str, origen: object) -> np.ndarray:
+    """
+    Calcula con Dijkstra la distancia desde "origen" a todos los vértices de un GrafoCompilado.
+    Para obtener las distancias hasta "origen" basta usar G.invertido().
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        origen (object): vértice del grafo de origen.
+    Returns:
+        np.ndarray: Distancia a cada vértice en el orden de G.nodos (np.inf si no es alcanzable).
+    Raises:
+        KeyError: Si "origen" no es un vértice del grafo o "peso" no está compilado.
+    """
+    offsets, destinos, pesos = G.csr(peso)
+    distancias, _ = _dijkstra_csr(offsets, destinos, pesos, G.indice[origen])
+    distancias = np.array(distancias, dtype=np.float64)
+    distancias[distancias == INFTY] = np.inf
+    return distancias
+
+
+def arbol_compilado(G: GrafoCompilado, peso: str, origen: object, destinos: List[object] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula con Dijkstra el árbol de caminos mínimos desde "origen" en forma de arrays. Si se dan
+    "destinos", la búsqueda se detiene en cuanto todos ellos tienen su distancia definitiva.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        origen (object): vértice del grafo de origen.
+        destinos (List[object], opcional): vértices cuyo camino interesa. Por defecto, None (todos).
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Distancia (np.inf si no se ha alcanzado) e índice del padre
+            (-1 si no tiene) de cada vértice, en el orden de G.nodos.
+    Raises:
+        KeyError: Si algún vértice no pertenece al grafo o "peso" no está compilado.
+    """
+    offsets, destinos_csr, pesos = G.csr(peso)
+    objetivos = None if destinos is None else {G.indice[v] for v in destinos}
+    distancias, padre = _dijkstra_csr(offsets, destinos_csr, pesos, G.indice[origen], objetivos=objetivos)
+    distancias = np.array(distancias, dtype=np.float64)
+    distancias[distancias == INFTY] = np.inf
+    return distancias, np.array(padre, dtype=np.int64)
+
+
+def camino_desde_arbol(G: GrafoCompilado, padre: Union[np.ndarray, List[int]], destino: object) -> List[object]:
+    """
+    Reconstruye el camino hasta "destino" a partir del array de padres de arbol_compilado.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        padre (Union[np.ndarray, List[int]]): Índice del padre de cada vértice.
+        destino (object): vértice del grafo de destino.
+    Returns:
+        List[object]: Lista con los vértices del camino desde la raíz del árbol hasta el destino.
+    """
+    camino = []
+    actual = G.indice[destino]
+    while actual != -1:
+        camino.append(G.nodos[actual])
+        actual = int(padre[actual])
+    return camino[::-1]
+
+
+def isocronas_compilado(G: GrafoCompilado, peso: str, origen: object, limites: Union[float, List[float]]) -> Union[Dict[object, float], List[Dict[object, float]]]:
+    """
+    Calcula los vértices alcanzables desde "origen" con un peso acumulado menor o igual que cada
+    límite (p. ej. 5, 10 y 15 minutos). Se hace una única búsqueda de Dijkstra que se detiene
+    al superar el mayor de los límites, en lugar de recorrer toda la componente.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        origen (object): vértice del grafo de origen.
+        limites (Union[float, List[float]]): Límite o lista de límites del peso acumulado.
+    Returns:
+        Union[Dict[object, float], List[Dict[object, float]]]: Para cada límite, diccionario con los
+            vértices alcanzables y su peso desde el origen. Si "limites" es un número, un solo diccionario.
+    Raises:
+        KeyError: Si origen no es un vértice del grafo o "peso" no está compilado.
+    """
+    varios = isinstance(limites, (list, tuple, np.ndarray))
+    lista = list(limites) if varios else [limites]
+    offsets, destinos, pesos = G.csr(peso)
+    distancias, _ = _dijkstra_csr(offsets, destinos, pesos, G.indice[origen], limite=max(lista))
+
+    distancias = np.array(distancias, dtype=np.float64)
+    alcanzables = np.nonzero(distancias <= max(lista))[0]
+    alcanzables = alcanzables[np.argsort(distancias[alcanzables], kind="stable")]
+    costes = distancias[alcanzables]
+    nodos = [G.nodos[v] for v in alcanzables.tolist()]
+    costes_lista = costes.tolist()
+    resultado = []
+    for limite in lista:
+        #Los vértices están ordenados por peso: los de cada límite son un prefijo
+        fin = int(np.searchsorted(costes, limite, side="right"))
+        resultado.append(dict(zip(nodos[:fin], costes_lista[:fin])))
+    return resultado if varios else resultado[0]
+
+
+def aristas_alcanzables_compilado(G: GrafoCompilado, peso: str, costes: Dict[object, float], limite: float) -> List[Tuple[object, object, float]]:
+    """
+    Calcula las aristas que se recorren, total o parcialmente, sin superar el límite, a partir
+    de los pesos de los vértices alcanzables devueltos por isocronas_compilado.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        costes (Dict[object, float]): Peso desde el origen de cada vértice alcanzable.
+        limite (float): Límite del peso acumulado.
+    Returns:
+        List[Tuple[object, object, float]]: Aristas (u, v, fraccion), donde "fraccion" es la parte
+            de la arista (de 0 a 1, empezando en u) que se alcanza dentro del límite. En un grafo no
+            dirigido cada arista puede aparecer en los dos sentidos.
+    Raises:
+        KeyError: Si "peso" no está compilado.
+    """
+    offsets, destinos, pesos = G.csr(peso)
+    aristas = []
+    for u, c_u in costes.items():
+        if c_u > limite:
+            continue
+        i = G.indice[u]
+        for k in range(offsets[i], offsets[i + 1]):
+            v = G.nodos[destinos[k]]
+            if pesos[k] <= 0 or c_u + pesos[k] <= limite:
+                aristas.append((u, v, 1.0))
+            else:
+                aristas.append((u, v, (limite - c_u) / pesos[k]))
+    return aristas
+
+
+def camino_minimo_compilado(G: GrafoCompilado, peso: str, origen: object, destino: object) -> List[object]:
+    """
+    Versión de "camino_minimo" sobre un GrafoCompilado.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        origen (object): vértice del grafo de origen.
+        destino (object): vértice del grafo de destino.
+    Returns:
+        List[object]: Lista con los vértices del camino más corto entre origen y destino.
+    Raises:
+        KeyError: Si origen o destino no son vértices del grafo o "peso" no está compilado.
+        ValueError: Si no existe camino entre origen y destino.
+    """
+    offsets, destinos, pesos = G.csr(peso)
+    s, t = G.indice[origen], G.indice[destino]
+    distancias, padre = _dijkstra_csr(offsets, destinos, pesos, s, t, busqueda="camino_minimo_compilado")
+
+    if distancias[t] == INFTY:
+        raise ValueError("No existe camino entre origen y destino.")
+
+    #Reconstruimos el camino desde el destino hasta el origen y lo invertimos
+    camino = []
+    actual = t
+    while actual != -1:
+        camino.append(G.nodos[actual])
+        actual = padre[actual]
+    return camino[::-1]
+
+
+def camino_minimo_astar_compilado(G: GrafoCompilado, peso: str, origen: object, destino: object, cotas: Union[np.ndarray, List[float]]) -> List[object]:
+    """
+    Versión de "camino_minimo_astar" sobre un GrafoCompilado.
+
+    En lugar de una función heurística recibe las cotas inferiores ya calculadas
+    hasta el destino para todos los vértices, lo que permite obtenerlas de una vez
+    con operaciones vectorizadas.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        origen (object): vértice del grafo de origen.
+        destino (object): vértice del grafo de destino.
+        cotas (Union[np.ndarray, List[float]]): Cota inferior de la distancia al destino de cada vértice, en el orden de G.nodos.
+    Returns:
+        List[object]: Lista con los vértices del camino más corto entre origen y destino.
+    Raises:
+        KeyError: Si origen o destino no son vértices del grafo o "peso" no está compilado.
+        ValueError: Si no existe camino entre origen y destino.
+    """
+    offsets, destinos, pesos = G.csr(peso)
+    if isinstance(cotas, np.ndarray):
+        cotas = cotas.tolist()
+    s, t = G.indice[origen], G.indice[destino]
+    medir = _instrumentacion["activa"]
+    inicio = time.perf_counter() if medir else 0
+    inserciones = 1
+    obsoletas = relajadas = 0
+    maximo_cola = 1
+
+    distancias = [INFTY] * len(G)
+    padre = [-1] * len(G)
+    distancias[s] = 0
+    Q = [(cotas[s], 0, s)]
+
+    encontrado = False
+    while Q:
+        _, d_v, v = heapq.heappop(Q)
+        if d_v > distancias[v]:
+            obsoletas += 1
+            continue
+        if v == t:
+            encontrado = True
+            break
+        for i in range(offsets[v], offsets[v + 1]):
+            x = destinos[i]
+            d_x = d_v + pesos[i]
+            if d_x < distancias[x]:
+                distancias[x] = d_x
+                padre[x] = v
+                heapq.heappush(Q, (d_x + cotas[x], d_x, x))
+                if medir:
+                    inserciones += 1
+        if medir:
+            relajadas += offsets[v + 1] - offsets[v]
+            maximo_cola = max(maximo_cola, len(Q))
+
+    if medir:
+        registra_busqueda("camino_minimo_astar_compilado", inicio, inserciones, len(Q), obsoletas, 0, relajadas, maximo_cola)
+    if not encontrado:
+        raise ValueError("No existe camino entre origen y destino.")
+
+    camino = []
+    actual = t
+    while actual != -1:
+        camino.append(G.nodos[actual])
+        actual = padre[actual]
+    return camino[::-1]
+
+
+def coste_camino_compilado(G: GrafoCompilado, peso: str, camino: List[object]) -> float:
+    """
+    Suma los pesos de las aristas de un camino sobre un GrafoCompilado.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        camino (List[object]): Lista de vértices del camino.
+    Returns:
+        float: Peso total del camino.
+    Raises:
+        KeyError: Si dos vértices consecutivos del camino no están unidos por una arista.
+    """
+    offsets, destinos, pesos = G.csr(peso)
+    coste = 0
+    for u, v in zip(camino, camino[1:]):
+        i, j = G.indice[u], G.indice[v]
+        for k in range(offsets[i], offsets[i + 1]):
+            if destinos[k] == j:
+                coste += pesos[k]
+                break
+        else:
+            raise KeyError(f"La arista ({u}, {v}) no pertenece al grafo.")
+    return coste
+
+
+def caminos_alternativos_compilado(G: GrafoCompilado, peso: str, origen: object, destino: object, k: int = 3, estiramiento: float = 0.25, solapamiento: float = 0.8, optimalidad_local: float = 0.25, invertido: GrafoCompilado = None) -> List[List[object]]:
+    """
+    Versión de "caminos_alternativos" sobre un GrafoCompilado.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        origen (object): vértice del grafo de origen.
+        destino (object): vértice del grafo de destino.
+        k (int, opcional): Número máximo de caminos devueltos, contando el mínimo. Por defecto, 3.
+        estiramiento (float, opcional): Exceso máximo de peso sobre el camino mínimo. Por defecto, 0.25.
+        solapamiento (float, opcional): Peso máximo compartido con cada camino ya elegido, en proporción
+            del camino mínimo. Por defecto, 0.8.
+        optimalidad_local (float, opcional): Longitud mínima de los tramos óptimos, en proporción del
+            camino mínimo. Por defecto, 0.25.
+        invertido (GrafoCompilado, opcional): G.invertido(), para no construirlo en cada consulta.
+    Returns:
+        List[List[object]]: Caminos ordenados por peso; el primero es el mínimo. Puede haber menos de k.
+    Raises:
+        KeyError: Si origen o destino no son vértices del grafo o "peso" no está compilado.
+        ValueError: Si no existe camino entre origen y destino.
+    """
+    s, t = G.indice[origen], G.indice[destino]
+    if s == t:
+        return [[origen]]
+    invertido = invertido if invertido is not None else G.invertido()
+    medir = _instrumentacion["activa"]
+    inicio = time.perf_counter() if medir else 0
+    inserciones = 2
+    obsoletas = relajadas = 0
+    maximo_cola = 2
+
+    #Misma búsqueda que _dijkstra_bidireccional con estiramiento, con listas CSR y guardando los vértices fijados
+    csr = [G.csr(peso), invertido.csr(peso)]
+    n = len(G)
+    padres = [[-1] * n, [-1] * n]
+    distancias = [[INFTY] * n, [INFTY] * n]
+    distancias[0][s] = distancias[1][t] = 0
+    visitados = [[False] * n, [False] * n]
+    asentados = [[], []]
+    colas = [[(0, s)], [(0, t)]]
+    mejor = INFTY
+    encuentro = -1
+
+    while colas[0] and colas[1] and colas[0][0][0] + colas[1][0][0] < mejor:
+        lado = 0 if colas[0][0][0] <= colas[1][0][0] else 1
+        d_v, v = heapq.heappop(colas[lado])
+        visitado = visitados[lado]
+        if visitado[v]:
+            obsoletas += 1
+            continue
+        visitado[v] = True
+        asentados[lado].append(v)
+
+        offsets, destinos, pesos = csr[lado]
+        padre, distancia, otra, cola = padres[lado], distancias[lado], distancias[1 - lado], colas[lado]
+        for i in range(offsets[v], offsets[v + 1]):
+            x = destinos[i]
+            d_x = d_v + pesos[i]
+            if d_x < distancia[x]:
+                distancia[x] = d_x
+                padre[x] = v
+                heapq.heappush(cola, (d_x, x))
+                if medir:
+                    inserciones += 1
+            if d_x + otra[x] < mejor:
+                mejor = d_x + otra[x]
+                encuentro = x
+        if medir:
+            relajadas += offsets[v + 1] - offsets[v]
+            maximo_cola = max(maximo_cola, len(colas[0]) + len(colas[1]))
+
+    #Continuación podada de ambas búsquedas hasta el límite de peso, como en _dijkstra_bidireccional
+    if encuentro >= 0 and estiramiento > 0:
+        limite = (1 + estiramiento) * mejor
+        radios = [colas[1][0][0] if colas[1] else INFTY, INFTY]
+        for lado in (0, 1):
+            offsets, destinos, pesos = csr[lado]
+            padre, distancia, otra, cola = padres[lado], distancias[lado], distancias[1 - lado], colas[lado]
+            visitado, visitado_otro, radio = visitados[lado], visitados[1 - lado], radios[lado]
+            while cola and cola[0][0] <= limite:
+                d_v, v = heapq.heappop(cola)
+                if visitado[v]:
+                    obsoletas += 1
+                    continue
+                visitado[v] = True
+                asentados[lado].append(v)
+                for i in range(offsets[v], offsets[v + 1]):
+                    x = destinos[i]
+                    d_x = d_v + pesos[i]
+                    if d_x < distancia[x] and d_x + (otra[x] if visitado_otro[x] else radio) <= limite:
+                        distancia[x] = d_x
+                        padre[x] = v
+                        heapq.heappush(cola, (d_x, x))
+                        if medir:
+                            inserciones += 1
+                if medir:
+                    relajadas += offsets[v + 1] - offsets[v]
+                    maximo_cola = max(maximo_cola, len(colas[0]) + len(colas[1]))
+
+    if medir:
+        registra_busqueda("caminos_alternativos_compilado", inicio, inserciones, len(colas[0]) + len(colas[1]), obsoletas, 0, relajadas, maximo_cola)
+    if encuentro < 0:
+        raise ValueError("No existe camino entre origen y destino.")
+
+    visitado_a, visitado_b = visitados
+    candidatos = [v for v in asentados[0] if visitado_b[v]]
+    #Está en la lista exactamente si lo han fijado las dos búsquedas: se comprueba sin recorrerla
+    if not (visitado_a[encuentro] and visitado_b[encuentro]):
+        candidatos.append(encuentro)
+    rutas = _rutas_via(mejor, padres[0], distancias[0], padres[1], distancias[1], candidatos, -1, k, estiramiento, solapamiento, optimalidad_local)
+    return [[G.nodos[v] for v in ruta] for ruta in rutas]
+
+
+def _acumula_en_arbol(offsets: List[int], destinos: List[int], pesos: List[float], padre: List[int], origen: int, objetivos: List[int]) -> List[float]:
+    """
+    Suma otro peso a lo largo de las ramas del árbol "padre" hasta cada objetivo. Cada vértice
+    del árbol se calcula una sola vez, aunque lo compartan los caminos de varios objetivos.
+    """
+    acumulado = {origen: 0}
+    resultado = []
+    for t in objetivos:
+        rama = []
+        v = t
+        while v not in acumulado:
+            if padre[v] == -1:
+                break
+            rama.append(v)
+            v = padre[v]
+        if v not in acumulado:
+            #El objetivo no se ha alcanzado
+            resultado.append(INFTY)
+            continue
+        for x in reversed(rama):
+            u = padre[x]
+            for i in range(offsets[u], offsets[u + 1]):
+                if destinos[i] == x:
+                    acumulado[x] = acumulado[u] + pesos[i]
+                    break
+        resultado.append(acumulado[t])
+    return resultado
+
+
+def _fila_matriz(offsets: List[int], destinos: List[int], pesos: List[float], secundarios: List[float], origen: int, objetivos: List[int]) -> Tuple[List[float], List[float]]:
+    """Fila de la matriz de distancias: una búsqueda desde "origen" que se detiene al fijar todos los objetivos."""
+    distancias, padre = _dijkstra_csr(offsets, destinos, pesos, origen, objetivos=set(objetivos))
+    fila = [distancias[t] for t in objetivos]
+    if secundarios is None:
+        return fila, None
+    return fila, _acumula_en_arbol(offsets, destinos, secundarios, padre, origen, objetivos)
+
+
+#Datos de la matriz en cada proceso de cálculo en paralelo
+_datos_matriz = {}
+
+
+def _inicia_matriz(offsets: List[int], destinos: List[int], pesos: List[float], secundarios: List[float], objetivos: List[int]) -> None:
+    _datos_matriz.update(offsets=offsets, destinos=destinos, pesos=pesos, secundarios=secundarios, objetivos=objetivos)
+
+
+def _fila_matriz_trabajador(origen: int) -> Tuple[List[float], List[float]]:
+    d = _datos_matriz
+    return _fila_matriz(d["offsets"], d["destinos"], d["pesos"], d["secundarios"], origen, d["objetivos"])
+
+
+def matriz_distancias_compilado(G: GrafoCompilado, peso: str, origenes: List[object], destinos: List[object], secundario: str = None, jerarquia: object = None, procesos: int = 1) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Calcula la matriz de pesos de los caminos mínimos entre cada origen y cada destino.
+
+    Sin jerarquía se hace una búsqueda de Dijkstra por origen que se detiene en cuanto todos
+    los destinos tienen su distancia definitiva. Si se da una jerarquía (un objeto con un método
+    "matriz(origenes, destinos)", como JerarquiaContraccion de contraccion.py) se delega en ella.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada que se minimiza.
+        origenes (List[object]): vértices de origen (filas).
+        destinos (List[object]): vértices de destino (columnas).
+        secundario (str, opcional): Nombre de otra función de peso compilada que se suma a lo largo
+            de los caminos mínimos, p. ej. la distancia de las rutas más rápidas. Por defecto, None.
+        jerarquia (object, opcional): Jerarquía del peso "peso" con método "matriz". Por defecto, None.
+        procesos (int, opcional): Número de procesos entre los que se reparten los orígenes. Por defecto, 1.
+    Returns:
+        np.ndarray: Matriz len(origenes) x len(destinos) de pesos (np.inf si no hay camino) y, si se
+            indica "secundario", una segunda matriz con la suma de ese peso sobre los mismos caminos.
+    Raises:
+        KeyError: Si algún vértice no pertenece al grafo o algún peso no está compilado.
+        ValueError: Si se pide un peso secundario junto con una jerarquía, o una jerarquía después
+            de cambiar los pesos del grafo con actualiza_pesos.
+    """
+    if jerarquia is not None:
+        if secundario is not None:
+            raise ValueError("La jerarquía solo calcula el peso para el que se construyó.")
+        if G.version > 0:
+            raise ValueError("La jerarquía no recoge los cambios de pesos del grafo compilado.")
+        return jerarquia.matriz(origenes, destinos)
+
+    offsets, destinos_csr, pesos = G.csr(peso)
+    secundarios = None if secundario is None else G.csr(secundario)[2]
+    filas = [G.indice[v] for v in origenes]
+    objetivos = [G.indice[v] for v in destinos]
+
+    matriz = np.full((len(filas), len(objetivos)), np.inf)
+    matriz_secundaria = np.full(matriz.shape, np.inf) if secundario is not None else None
+    if not objetivos:
+        return matriz if secundario is None else (matriz, matriz_secundaria)
+
+    if procesos > 1 and len(filas) > 1:
+        with multiprocessing.Pool(procesos, initializer=_inicia_matriz, initargs=(offsets, destinos_csr, pesos, secundarios, objetivos)) as pool:
+            resultados = pool.map(_fila_matriz_trabajador, filas, chunksize=max(1, len(filas) // (4 * procesos)))
+    else:
+        resultados = (_fila_matriz(offsets, destinos_csr, pesos, secundarios, s, objetivos) for s in filas)
+
+    for i, (fila, fila_secundaria) in enumerate(resultados):
+        matriz[i] = fila
+        if secundario is not None:
+            matriz_secundaria[i] = fila_secundaria
+    matriz[matriz == INFTY] = np.inf
+    if secundario is None:
+        return matriz
+    matriz_secundaria[matriz_secundaria == INFTY] = np.inf
+    return matriz, matriz_secundaria
+
+
+def _comprueba_no_dirigido(G: GrafoCompilado) -> None:
+    """
+    Los árboles abarcadores solo están definidos para grafos no dirigidos: en su CSR cada arista aparece
+    en los dos sentidos y los algoritmos se quedan con una copia (origen < destino).
+    """
+    if G.dirigido:
+        raise ValueError("El árbol abarcador mínimo requiere un grafo compilado no dirigido.")
+
+
+def prim_compilado(G: GrafoCompilado, peso: str) -> Dict[object, object]:
+    """
+    Versión de "prim" sobre un GrafoCompilado de un grafo no dirigido. Si el grafo no es conexo
+    se calcula un bosque abarcador mínimo.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado a partir de un nx.Graph.
+        peso (str): Nombre de la función de peso compilada.
+
+    Returns:
+        Dict[object, object]: Diccionario que indica, para cada vértice, qué vértice es su padre en el árbol abarcador mínimo.
+    Raises:
+        ValueError: Si el grafo compilado es dirigido.
+    """
+    _comprueba_no_dirigido(G)
+    offsets, destinos, pesos = G.csr(peso)
+    n = len(G)
+    padre = [-1] * n
+    coste_minimo = [INFTY] * n
+    visitado = [False] * n
+
+    #Igual que "prim", una búsqueda desde cada vértice aún no visitado (un árbol por componente)
+    for origen in range(n):
+        if visitado[origen]:
+            continue
+        coste_minimo[origen] = 0
+        Q = [(0, origen)]
+        while Q:
+            _, v = heapq.heappop(Q)
+            #Un vértice que ya está en el árbol no se vuelve a procesar
+            if visitado[v]:
+                continue
+            visitado[v] = True
+            for i in range(offsets[v], offsets[v + 1]):
+                x = destinos[i]
+                if not visitado[x] and pesos[i] < coste_minimo[x]:
+                    coste_minimo[x] = pesos[i]
+                    padre[x] = v
+                    heapq.heappush(Q, (pesos[i], x))
+
+    nodos = G.nodos
+    return {nodos[i]: (nodos[p] if p >= 0 else None) for i, p in enumerate(padre)}
+
+
+def kruskal_compilado(G: GrafoCompilado, peso: str) -> List[Tuple[object, object]]:
+    """
+    Versión de "kruskal" sobre un GrafoCompilado de un grafo no dirigido. Si el grafo no es conexo
+    se calcula un bosque abarcador mínimo.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado a partir de un nx.Graph.
+        peso (str): Nombre de la función de peso compilada.
+
+    Returns:
+        List[Tuple[object, object]]: Lista de los pares de vértices que forman las aristas del árbol abarcador mínimo.
+    Raises:
+        ValueError: Si el grafo compilado es dirigido.
+    """
+    _comprueba_no_dirigido(G)
+    if peso not in G.pesos:
+        raise KeyError(f"El peso '{peso}' no está compilado en el grafo.")
+    #Origen de cada arista del CSR y nos quedamos con una copia de cada arista no dirigida
+    origenes = np.repeat(np.arange(len(G), dtype=np.int32), np.diff(G.offsets))
+    mascara = origenes < G.destinos
+    us = origenes[mascara]
+    vs = G.destinos[mascara]
+    orden = np.argsort(G.pesos[peso][mascara], kind="stable")
+    us = us[orden].tolist()
+    vs = vs[orden].tolist()
+
+    #Unión-búsqueda con compresión de caminos y unión por rango
+    padres = list(range(len(G)))
+    rangos = [0] * len(G)
+
+    def raiz(u: int) -> int:
+        while padres[u] != u:
+            padres[u] = padres[padres[u]]
+            u = padres[u]
+        return u
+
+    aristas_minimas = []
+    for u, v in zip(us, vs):
+        ru, rv = raiz(u), raiz(v)
+        if ru != rv:
+            aristas_minimas.append((G.nodos[u], G.nodos[v]))
+            if rangos[ru] < rangos[rv]:
+                ru, rv = rv, ru
+            padres[rv] = ru
+            if rangos[ru] == rangos[rv]:
+                rangos[ru] += 1
+    return aristas_minimas
+
+
+def _mejores_aristas(componentes: np.ndarray, us: np.ndarray, vs: np.ndarray, pesos: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Arista más ligera que sale de cada componente entre las aristas dadas, desempatando por su
+    identificador para que el orden sea total. Devuelve las componentes, el identificador de su
+    arista y el peso de esa arista.
+    """
+    cu, cv = componentes[us], componentes[vs]
+    cruzan = cu != cv
+    extremos = np.concatenate([cu[cruzan], cv[cruzan]])
+    candidatas = np.concatenate([ids[cruzan], ids[cruzan]])
+    pesos_candidatas = np.concatenate([pesos[cruzan], pesos[cruzan]])
+    orden = np.lexsort((candidatas, pesos_candidatas, extremos))
+    extremos = extremos[orden]
+    primeras = np.ones(len(extremos), dtype=bool)
+    primeras[1:] = extremos[1:] != extremos[:-1]
+    return extremos[primeras], candidatas[orden][primeras], pesos_candidatas[orden][primeras]
+
+
+#Aristas del grafo en cada proceso del cálculo de Borůvka en paralelo
+_datos_boruvka = {}
+
+
+def _inicia_boruvka(us: np.ndarray, vs: np.ndarray, pesos: np.ndarray, ids: np.ndarray) -> None:
+    _datos_boruvka.update(us=us, vs=vs, pesos=pesos, ids=ids)
+
+
+def _mejores_aristas_trabajador(tarea: Tuple[np.ndarray, int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    componentes, inicio, fin = tarea
+    d = _datos_boruvka
+    return _mejores_aristas(componentes, d["us"][inicio:fin], d["vs"][inicio:fin], d["pesos"][inicio:fin], d["ids"][inicio:fin])
+
+
+def boruvka_compilado(G: GrafoCompilado, peso: str, procesos: int = 1) -> List[Tuple[object, object]]:
+    """
+    Calcula un bosque abarcador mínimo de un GrafoCompilado de un grafo no dirigido con el algoritmo de Borůvka.
+
+    En cada ronda cada componente elige su arista más ligera hacia otra componente y se unen todas
+    a la vez, por lo que bastan O(log n) rondas. La búsqueda de las aristas de cada ronda se hace con
+    operaciones vectorizadas y, si se indican varios procesos, se reparte por bloques de aristas.
+
+    Args:
+        G (GrafoCompilado): Grafo compilado a partir de un nx.Graph.
+        peso (str): Nombre de la función de peso compilada.
+        procesos (int, opcional): Número de procesos entre los que se reparten las aristas. Por defecto, 1.
+
+    Returns:
+        List[Tuple[object, object]]: Lista de los pares de vértices que forman las aristas del árbol abarcador mínimo.
+    Raises:
+        ValueError: Si el grafo compilado es dirigido.
+    """
+    _comprueba_no_dirigido(G)
+    if peso not in G.pesos:
+        raise KeyError(f"El peso '{peso}' no está compilado en el grafo.")
+    origenes = np.repeat(np.arange(len(G), dtype=np.int64), np.diff(G.offsets))
+    mascara = origenes < G.destinos
+    us = origenes[mascara]
+    vs = G.destinos[mascara].astype(np.int64)
+    pesos = G.pesos[peso][mascara]
+    ids = np.arange(len(us))
+
+    componentes = np.arange(len(G))
+    elegidas = []
+    pool = None
+    if procesos > 1 and len(us) > procesos:
+        #Los procesos reciben las aristas una sola vez y en cada ronda solo las componentes y su bloque
+        limites = np.linspace(0, len(us), procesos + 1).astype(np.int64).tolist()
+        bloques = list(zip(limites[:-1], limites[1:]))
+        pool = multiprocessing.Pool(procesos, initializer=_inicia_boruvka, initargs=(us, vs, pesos, ids))
+    try:
+        while True:
+            if pool is None:
+                extremos, mejores, _ = _mejores_aristas(componentes, us, vs, pesos, ids)
+            else:
+                #Cada proceso propone la mejor arista de cada componente en su bloque y nos quedamos con la mejor
+                parciales = pool.map(_mejores_aristas_trabajador, [(componentes, inicio, fin) for inicio, fin in bloques])
+                extremos = np.concatenate([e for e, _, _ in parciales])
+                mejores = np.concatenate([m for _, m, _ in parciales])
+                pesos_mejores = np.concatenate([w for _, _, w in parciales])
+                orden = np.lexsort((mejores, pesos_mejores, extremos))
+                extremos, mejores = extremos[orden], mejores[orden]
+                primeras = np.ones(len(extremos), dtype=bool)
+                primeras[1:] = extremos[1:] != extremos[:-1]
+                extremos, mejores = extremos[primeras], mejores[primeras]
+            if not len(mejores):
+                break
+
+            #Cada componente apunta a la componente al otro lado de su arista. Con el orden total de las
+            #aristas los únicos ciclos son parejas que se eligen mutuamente: la menor queda como raíz
+            cu, cv = componentes[us[mejores]], componentes[vs[mejores]]
+            sucesor = np.arange(len(G))
+            sucesor[extremos] = np.where(cu == extremos, cv, cu)
+            mutuas = (sucesor[sucesor] == np.arange(len(G))) & (np.arange(len(G)) < sucesor)
+            sucesor[mutuas] = np.nonzero(mutuas)[0]
+            #Saltos de puntero hasta que cada componente apunta a su raíz
+            while True:
+                siguiente = sucesor[sucesor]
+                if np.array_equal(siguiente, sucesor):
+                    break
+                sucesor = siguiente
+            componentes = sucesor[componentes]
+            elegidas.append(np.unique(mejores))
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    elegidas = np.concatenate(elegidas) if elegidas else np.zeros(0, dtype=np.int64)
+    return [(G.nodos[u], G.nodos[v]) for u, v in zip(us[elegidas].tolist(), vs[elegidas].tolist())]
@@ -0,0 +1,136 @@
+"""
+rutas_lote.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Cálculo de rutas por lotes a partir de un fichero csv de pares de direcciones origen/destino.
+
+Las direcciones se geocodifican con callejero.busca_direccion, se asocian a nodos del grafo
+con una sola consulta al índice espacial y las consultas se agrupan por nodo de origen, de
+modo que un único árbol de Dijkstra responde a todos los destinos de cada origen. Los
+resultados (distancia, tiempo y ruta) se escriben en el fichero de salida según se calculan.
+
+Uso:
+    python rutas_lote.py entrada.csv salida.csv [--modo distancia|tiempo|semaforos] [--separador ;]
+
+El fichero de entrada debe tener las columnas "origen" y "destino".
+"""
+
+from typing import Dict, Iterator, List, Tuple
+from collections import defaultdict
+import argparse
+import csv
+import sys
+import time
+import numpy as np
+
+import callejero
+from grafo_pesado import GrafoCompilado, arbol_compilado, camino_desde_arbol, coste_camino_compilado
+from espacial import IndiceEspacial
+from gps import MODOS, prepara_grafo
+
+COLUMNAS_SALIDA = ["fila", "origen", "destino", "distancia_m", "tiempo_s", "ruta", "error"]
+
+
+def calcula_rutas_lote(pares: List[Tuple[str, str]], G_compilado: GrafoCompilado, indice_espacial: IndiceEspacial, direcciones, modo: str) -> Iterator[Dict[str, object]]:
+    """
+    Calcula las rutas de una lista de pares de direcciones, con un árbol de Dijkstra por cada nodo de origen.
+
+    Args:
+        pares (List[Tuple[str, str]]): Pares (dirección de origen, dirección de destino).
+        G_compilado (GrafoCompilado): Grafo compilado con los pesos de los modos.
+        indice_espacial (IndiceEspacial): Índice espacial de los nodos del grafo.
+        direcciones (DataFrame o IndiceDirecciones): Callejero para geocodificar las direcciones.
+        modo (str): Modo de navegación ("distancia", "tiempo" o "semaforos").
+    Returns:
+        Iterator[Dict[str, object]]: Un resultado por par con las claves de COLUMNAS_SALIDA, agrupados por origen.
+    """
+    #Geocodificamos todas las direcciones distintas una sola vez
+    coordenadas = {}
+    for direccion in {d for par in pares for d in par}:
+        try:
+            coordenadas[direccion] = callejero.busca_direccion(direccion, direcciones)
+        except callejero.AdressNotFoundError:
+            coordenadas[direccion] = None
+
+    encontradas = [d for d, c in coordenadas.items() if c is not None]
+    nodos = {}
+    if encontradas:
+        latitudes = np.array([coordenadas[d][0] for d in encontradas])
+        longitudes = np.array([coordenadas[d][1] for d in encontradas])
+        nodos = dict(zip(encontradas, indice_espacial.nodos_cercanos(latitudes, longitudes).tolist()))
+
+    #Agrupamos las consultas por nodo de origen
+    grupos = defaultdict(list)
+    for fila, (origen, destino) in enumerate(pares):
+        resultado = {"fila": fila, "origen": origen, "destino": destino, "distancia_m": "", "tiempo_s": "", "ruta": "", "error": ""}
+        faltan = [d for d in (origen, destino) if coordenadas[d] is None]
+        if faltan:
+            resultado["error"] = f"Dirección no encontrada: {faltan[0]}"
+            yield resultado
+            continue
+        grupos[nodos[origen]].append((resultado, nodos[destino]))
+
+    for nodo_origen, consultas in grupos.items():
+        _, padre = arbol_compilado(G_compilado, modo, nodo_origen, [nodo for _, nodo in consultas])
+        for resultado, nodo_destino in consultas:
+            if nodo_destino != nodo_origen and padre[G_compilado.indice[nodo_destino]] < 0:
+                resultado["error"] = "No existe camino entre origen y destino."
+                yield resultado
+                continue
+            ruta = camino_desde_arbol(G_compilado, padre, nodo_destino)
+            resultado["distancia_m"] = round(coste_camino_compilado(G_compilado, "distancia", ruta), 1)
+            resultado["tiempo_s"] = round(coste_camino_compilado(G_compilado, "tiempo", ruta), 1)
+            resultado["ruta"] = " ".join(str(nodo) for nodo in ruta)
+            yield resultado
+
+
+def lee_pares(fichero: str, separador: str = ";") -> List[Tuple[str, str]]:
+    """
+    Lee los pares de direcciones de un fichero csv con columnas "origen" y "destino".
+
+    Args:
+        fichero (str): Ruta del fichero csv.
+        separador (str, opcional): Separador de columnas. Por defecto, ";".
+    Returns:
+        List[Tuple[str, str]]: Pares (origen, destino).
+    Raises:
+        FileNotFoundError: Si el fichero no existe.
+        ValueError: Si faltan las columnas "origen" o "destino".
+    """
+    with open(fichero, newline="", encoding="utf-8") as f:
+        lector = csv.DictReader(f, delimiter=separador)
+        if lector.fieldnames is None or not {"origen", "destino"} <= set(lector.fieldnames):
+            raise ValueError("El fichero de entrada debe tener las columnas 'origen' y 'destino'.")
+        return [(fila["origen"], fila["destino"]) for fila in lector]
+
+
+def main(argumentos: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Cálculo de rutas por lotes entre pares de direcciones de Madrid.")
+    parser.add_argument("entrada", help="csv con las columnas 'origen' y 'destino'")
+    parser.add_argument("salida", help="csv en el que se escriben los resultados")
+    parser.add_argument("--modo", choices=MODOS, default="tiempo", help="criterio de la ruta (por defecto, tiempo)")
+    parser.add_argument("--separador", default=";", help="separador de columnas de los csv (por defecto, ';')")
+    args = parser.parse_args(argumentos)
+
+    pares = lee_pares(args.entrada, args.separador)
+    direcciones = callejero.indice_direcciones(callejero.carga_callejero())
+    _, G_compilado, indice_espacial = prepara_grafo(digrafo=False)
+
+    inicio = time.perf_counter()
+    calculadas = 0
+    with open(args.salida, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.DictWriter(f, fieldnames=COLUMNAS_SALIDA, delimiter=args.separador)
+        escritor.writeheader()
+        for resultado in calcula_rutas_lote(pares, G_compilado, indice_espacial, direcciones, args.modo):
+            escritor.writerow(resultado)
+            calculadas += not resultado["error"]
+    segundos = time.perf_counter() - inicio
+
+    print(f"{calculadas} rutas de {len(pares)} calculadas en {segundos:.2f} s ({calculadas / max(segundos, 1e-9):.1f} rutas/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
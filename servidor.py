@@ -0,0 +1,316 @@
+"""
+servidor.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Servidor de rutas con varios procesos que comparten un único grafo de solo lectura.
+
+Los arrays del GrafoCompilado (offsets, destinos, pesos de cada modo) y las coordenadas
+de los nodos se copian una sola vez a bloques de memoria compartida
+(multiprocessing.shared_memory). Cada proceso trabajador se engancha a esos bloques al
+arrancar y reconstruye el grafo con GrafoCompilado.desde_arrays sin copiar los arrays (las
+búsquedas los leen a través de memoryview), de modo que las tareas solo transportan
+(origen, destino, modo) y nunca el grafo.
+
+Se ofrece una API sencilla enviar/recoger sobre el conjunto de procesos y un servidor HTTP
+local que responde a consultas por coordenadas:
+    GET /ruta?origen=lat,lon&destino=lat,lon&modo=tiempo
+
+Uso:
+    python servidor.py [--procesos N] [--host 127.0.0.1] [--puerto 8000]
+"""
+
+from typing import Dict, List, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import shared_memory
+from urllib.parse import urlparse, parse_qs
+import argparse
+import itertools
+import json
+import multiprocessing
+import numpy as np
+
+from grafo_pesado import GrafoCompilado, coste_camino_compilado
+from espacial import IndiceEspacial
+from gps import MODOS, calcula_ruta, prepara_grafo
+
+#Puerto por defecto del servidor HTTP
+PUERTO = 8000
+
+#Segundos máximos de espera de una ruta en el servidor HTTP
+TIEMPO_MAXIMO = 60
+
+
+class GrafoCompartido:
+    """
+    Copia de los arrays de un GrafoCompilado en bloques de memoria compartida.
+
+    Attributes:
+        descripcion (Dict[str, Tuple[str, str, Tuple[int, ...]]]): Nombre del bloque, tipo y forma
+            de cada array, suficiente para engancharse a él desde otro proceso.
+        dirigido (bool): Indica si el grafo es dirigido.
+    """
+
+    def __init__(self, G: GrafoCompilado, latitudes: np.ndarray, longitudes: np.ndarray):
+        """
+        Args:
+            G (GrafoCompilado): Grafo compilado. Sus vértices deben ser enteros (como los de OpenStreetMap).
+            latitudes (np.ndarray): Latitud de cada vértice en el orden de G.nodos.
+            longitudes (np.ndarray): Longitud de cada vértice en el orden de G.nodos.
+        Raises:
+            ValueError: Si los vértices del grafo no son enteros.
+        """
+        nodos = np.asarray(G.nodos)
+        if nodos.dtype.kind not in "iu":
+            raise ValueError("Los vértices del grafo deben ser enteros para compartirse entre procesos.")
+        arrays = {"nodos": nodos.astype(np.int64), "offsets": G.offsets, "destinos": G.destinos,
+                  "latitudes": np.asarray(latitudes, dtype=np.float64), "longitudes": np.asarray(longitudes, dtype=np.float64)}
+        arrays.update({"peso_" + nombre: array for nombre, array in G.pesos.items()})
+
+        self.dirigido = G.dirigido
+        self.descripcion = {}
+        self._bloques = []
+        for nombre, array in arrays.items():
+            #Un bloque de tamaño 0 no se puede crear
+            bloque = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=bloque.buf)[...] = array
+            self._bloques.append(bloque)
+            self.descripcion[nombre] = (bloque.name, array.dtype.str, array.shape)
+
+    def cierra(self) -> None:
+        """Libera los bloques de memoria compartida. Los procesos enganchados deben haber terminado."""
+        for bloque in self._bloques:
+            bloque.close()
+            bloque.unlink()
+        self._bloques = []
+
+
+def engancha(descripcion: Dict[str, Tuple[str, str, Tuple[int, ...]]], dirigido: bool = True) -> Tuple[GrafoCompilado, np.ndarray, np.ndarray, List[shared_memory.SharedMemory]]:
+    """
+    Reconstruye en el proceso actual el grafo compartido, sin copiar sus arrays: las búsquedas los
+    leen a través de memoryview (ver GrafoCompilado.desde_arrays). Lo único propio de cada proceso es
+    la lista de vértices y el diccionario que asocia cada vértice a su índice.
+
+    Args:
+        descripcion (Dict[str, Tuple[str, str, Tuple[int, ...]]]): Atributo "descripcion" de un GrafoCompartido.
+        dirigido (bool, opcional): Si el grafo es dirigido. Por defecto, True.
+    Returns:
+        Tuple[GrafoCompilado, np.ndarray, np.ndarray, List[SharedMemory]]: Grafo compilado, latitudes,
+            longitudes y bloques enganchados, que hay que mantener vivos mientras se use el grafo.
+    """
+    bloques, arrays = [], {}
+    for nombre, (bloque, tipo, forma) in descripcion.items():
+        bloque = shared_memory.SharedMemory(name=bloque)
+        bloques.append(bloque)
+        arrays[nombre] = np.ndarray(forma, dtype=np.dtype(tipo), buffer=bloque.buf)
+    pesos = {nombre[len("peso_"):]: array for nombre, array in arrays.items() if nombre.startswith("peso_")}
+    G = GrafoCompilado.desde_arrays(arrays["nodos"].tolist(), arrays["offsets"], arrays["destinos"], pesos, dirigido, vistas=True)
+    return G, arrays["latitudes"], arrays["longitudes"], bloques
+
+
+#Estado de cada proceso trabajador
+_trabajador = {}
+
+
+def _inicia_trabajador(descripcion: Dict[str, Tuple[str, str, Tuple[int, ...]]], dirigido: bool) -> None:
+    """Inicializador de los procesos trabajadores: se engancha al grafo compartido."""
+    G, latitudes, longitudes, bloques = engancha(descripcion, dirigido)
+    _trabajador.update(grafo=G, latitudes=latitudes, longitudes=longitudes, bloques=bloques)
+
+
+def _calcula_ruta(origen: int, destino: int, modo: str) -> Tuple[List[int], float]:
+    """Tarea de los trabajadores: ruta del modo dado (ver gps.calcula_ruta) y su coste."""
+    G = _trabajador["grafo"]
+    ruta = calcula_ruta(G, _trabajador["latitudes"], _trabajador["longitudes"], origen, destino, modo)
+    return ruta, coste_camino_compilado(G, modo, ruta)
+
+
+class PoolRutas:
+    """
+    Conjunto de procesos que calculan rutas sobre un grafo en memoria compartida.
+
+    Las búsquedas de cada trabajador leen directamente los arrays compartidos a través de memoryview,
+    sin copiarlos en listas de Python en cada proceso (algo más lento que las listas, pero la memoria
+    de cada trabajador no crece con el número de modos consultados).
+    """
+
+    def __init__(self, G: GrafoCompilado, latitudes: np.ndarray, longitudes: np.ndarray, procesos: int = None):
+        """
+        Args:
+            G (GrafoCompilado): Grafo compilado con los pesos de los modos.
+            latitudes (np.ndarray): Latitud de cada vértice en el orden de G.nodos.
+            longitudes (np.ndarray): Longitud de cada vértice en el orden de G.nodos.
+            procesos (int, opcional): Número de procesos. Por defecto, el número de CPUs.
+        """
+        self._compartido = GrafoCompartido(G, latitudes, longitudes)
+        self._pool = multiprocessing.Pool(procesos, initializer=_inicia_trabajador, initargs=(self._compartido.descripcion, G.dirigido))
+        self._pendientes = {}
+        self._contador = itertools.count()
+
+    def enviar(self, origen: int, destino: int, modo: str) -> int:
+        """
+        Encola el cálculo de una ruta y devuelve sin esperar.
+
+        Args:
+            origen (int): vértice de origen.
+            destino (int): vértice de destino.
+            modo (str): Modo de navegación ("distancia", "tiempo" o "semaforos").
+        Returns:
+            int: Identificador de la consulta para "recoger".
+        """
+        identificador = next(self._contador)
+        self._pendientes[identificador] = self._pool.apply_async(_calcula_ruta, (origen, destino, modo))
+        return identificador
+
+    def recoger(self, identificador: int, tiempo_maximo: float = None) -> Tuple[List[int], float]:
+        """
+        Espera el resultado de una consulta enviada con "enviar".
+
+        Args:
+            identificador (int): Identificador devuelto por "enviar".
+            tiempo_maximo (float, opcional): Segundos máximos de espera. Por defecto, sin límite.
+        Returns:
+            Tuple[List[int], float]: Ruta y su coste en el modo de la consulta.
+        Raises:
+            KeyError: Si el identificador no corresponde a una consulta pendiente o si origen
+                o destino no son vértices del grafo.
+            ValueError: Si no existe camino entre origen y destino.
+            multiprocessing.TimeoutError: Si se agota el tiempo de espera (la consulta sigue pendiente
+                hasta que se recoja o se descarte con "descarta").
+        """
+        resultado = self._pendientes[identificador]
+        try:
+            return resultado.get(tiempo_maximo)
+        finally:
+            #Si se agota el tiempo la consulta sigue pendiente y se puede volver a recoger
+            if resultado.ready():
+                del self._pendientes[identificador]
+
+    def descarta(self, identificador: int) -> None:
+        """
+        Olvida una consulta enviada con "enviar" que ya no se va a recoger, por ejemplo tras agotar
+        el tiempo de espera. El proceso que la calcula termina igualmente y su resultado se pierde.
+
+        Args:
+            identificador (int): Identificador devuelto por "enviar".
+        Returns: None
+        """
+        self._pendientes.pop(identificador, None)
+
+    def pendientes(self) -> int:
+        """Devuelve el número de consultas enviadas que aún no se han recogido ni descartado."""
+        return len(self._pendientes)
+
+    def calcula(self, consultas: List[Tuple[int, int, str]]) -> List[Tuple[List[int], float]]:
+        """
+        Calcula en paralelo una lista de consultas (origen, destino, modo).
+
+        Args:
+            consultas (List[Tuple[int, int, str]]): Consultas a calcular.
+        Returns:
+            List[Tuple[List[int], float]]: Ruta y coste de cada consulta, en el mismo orden.
+        """
+        return self._pool.starmap(_calcula_ruta, consultas)
+
+    def cierra(self) -> None:
+        """Termina los procesos y libera la memoria compartida."""
+        self._pool.terminate()
+        self._pool.join()
+        self._compartido.cierra()
+
+    def __enter__(self) -> "PoolRutas":
+        return self
+
+    def __exit__(self, *excepcion) -> None:
+        self.cierra()
+
+
+def crea_servidor(pool: PoolRutas, indice_espacial: IndiceEspacial, host: str = "127.0.0.1", puerto: int = PUERTO) -> ThreadingHTTPServer:
+    """
+    Crea un servidor HTTP que responde a GET /ruta?origen=lat,lon&destino=lat,lon&modo=...
+    con un JSON con la ruta (lista de nodos), su coste y el modo. Cada petición se atiende en
+    un hilo que envía la consulta al pool y espera su resultado.
+
+    Args:
+        pool (PoolRutas): Conjunto de procesos que calculan las rutas.
+        indice_espacial (IndiceEspacial): Índice espacial de los nodos del grafo.
+        host (str, opcional): Dirección en la que escucha. Por defecto, solo local.
+        puerto (int, opcional): Puerto en el que escucha. Por defecto, PUERTO.
+    Returns:
+        ThreadingHTTPServer: Servidor listo para "serve_forever".
+    """
+
+    class Manejador(BaseHTTPRequestHandler):
+
+        def _responde(self, codigo: int, contenido: dict) -> None:
+            cuerpo = json.dumps(contenido).encode("utf-8")
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            if url.path != "/ruta":
+                self._responde(404, {"error": "Recurso no encontrado."})
+                return
+            parametros = parse_qs(url.query)
+            modo = parametros.get("modo", ["tiempo"])[0]
+            try:
+                origen, destino = ([float(c) for c in parametros[p][0].split(",")] for p in ("origen", "destino"))
+                if len(origen) != 2 or len(destino) != 2:
+                    raise ValueError
+            except (KeyError, ValueError):
+                self._responde(400, {"error": "Los parámetros origen y destino deben tener la forma lat,lon."})
+                return
+            if modo not in MODOS:
+                self._responde(400, {"error": f"Modo no válido. Modos disponibles: {', '.join(MODOS)}."})
+                return
+
+            nodo_origen, nodo_destino = indice_espacial.nodos_cercanos(np.array([origen[0], destino[0]]), np.array([origen[1], destino[1]])).tolist()
+            identificador = pool.enviar(nodo_origen, nodo_destino, modo)
+            try:
+                ruta, coste = pool.recoger(identificador, TIEMPO_MAXIMO)
+            except ValueError as error:
+                self._responde(404, {"error": str(error)})
+                return
+            except multiprocessing.TimeoutError:
+                #Nadie va a volver a recoger esta consulta
+                pool.descarta(identificador)
+                self._responde(503, {"error": "Tiempo de cálculo agotado."})
+                return
+            self._responde(200, {"modo": modo, "coste": coste, "ruta": ruta})
+
+        def log_message(self, formato: str, *argumentos) -> None:
+            #No escribimos una línea por petición
+            pass
+
+    return ThreadingHTTPServer((host, puerto), Manejador)
+
+
+def main(argumentos: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor local de rutas de Madrid con varios procesos.")
+    parser.add_argument("--procesos", type=int, default=None, help="número de procesos (por defecto, número de CPUs)")
+    parser.add_argument("--host", default="127.0.0.1", help="dirección en la que escucha (por defecto, 127.0.0.1)")
+    parser.add_argument("--puerto", type=int, default=PUERTO, help=f"puerto en el que escucha (por defecto, {PUERTO})")
+    args = parser.parse_args(argumentos)
+
+    #El servidor no necesita el digrafo de NetworkX: el grafo compilado se construye sobre la caché
+    _, G_compilado, indice_espacial = prepara_grafo(digrafo=False)
+
+    with PoolRutas(G_compilado, indice_espacial.latitudes, indice_espacial.longitudes, args.procesos) as pool:
+        servidor = crea_servidor(pool, indice_espacial, args.host, args.puerto)
+        print(f"Servidor de rutas en http://{args.host}:{args.puerto}/ruta")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,8 @@ Después realiza vairas operaciones básicas sobre el grafo y ejecuta sobre él:
 import networkx as nx
 import grafo_pesado
 import random
+import tempfile
+import numpy as np
 
 from typing import Union
 MIN_PESO_ARISTA=1
@@ -38,6 +40,12 @@ def peso_constante(G:Union[nx.Graph, nx.DiGraph], origen:object, destino:object)
 def peso_aleatorio(G:Union[nx.Graph, nx.DiGraph], origen:object, destino:object):
     return G[origen][destino]["peso"]
 
+#Coste de un camino (lista de vértices) con una función de peso
+def coste_camino(G:Union[nx.Graph, nx.DiGraph], peso, camino:list):
+    if not camino:
+        return None
+    return sum(peso(G,u,v) for u,v in zip(camino,camino[1:]))
+
 
 #Listas de vértices y aristas del grafo
 dirigido=False
@@ -88,4 +96,362 @@ for a in aristas:
         print(aam_rng)
 
         aam2_rng=grafo_pesado.prim(G,peso_aleatorio)
-        print(aam2_rng)
\ No newline at end of file
+        print(aam2_rng)
+
+
+#Mismos algoritmos sobre el grafo compilado
+G_compilado=grafo_pesado.GrafoCompilado(G,{"constante":peso_constante,"aleatorio":peso_aleatorio})
+
+print(grafo_pesado.dijkstra_compilado(G_compilado,"aleatorio",1))
+print(grafo_pesado.camino_minimo_compilado(G_compilado,"aleatorio",1,5))
+print(grafo_pesado.distancias_compilado(G_compilado,"aleatorio",1))
+print(grafo_pesado.matriz_distancias_compilado(G_compilado,"aleatorio",[1,2,3],["a",5],secundario="constante"))
+print(grafo_pesado.isocronas_compilado(G_compilado,"aleatorio",1,[2,5]))
+print(grafo_pesado.caminos_alternativos_compilado(G_compilado,"aleatorio",1,6,estiramiento=1))
+
+#Isocronas: los vértices de cada límite y sus pesos son los de un Dijkstra limitado a ese radio
+isocronas_grafo=nx.gnm_random_graph(60,150,seed=3,directed=True)
+for u,v in isocronas_grafo.edges():
+    isocronas_grafo[u][v]["peso"]=random.randint(0,4)
+limites_isocronas=[0,3,7.5,20]
+isocronas=grafo_pesado.isocronas_compilado(grafo_pesado.GrafoCompilado(isocronas_grafo,{"aleatorio":peso_aleatorio}),"aleatorio",0,limites_isocronas)
+print("Isocronas:",[isocrona==nx.single_source_dijkstra_path_length(isocronas_grafo,0,cutoff=limite,weight="peso") for isocrona,limite in zip(isocronas,limites_isocronas)])
+
+#Estadísticas de las búsquedas con la instrumentación activada
+grafo_pesado.activa_instrumentacion()
+grafo_pesado.camino_minimo_compilado(G_compilado,"aleatorio",1,5)
+print(grafo_pesado.estadisticas_busqueda())
+print(grafo_pesado.estadisticas_agregadas())
+grafo_pesado.activa_instrumentacion(False)
+
+if(not dirigido):
+    print(grafo_pesado.kruskal_compilado(G_compilado,"aleatorio"))
+    print(grafo_pesado.prim_compilado(G_compilado,"aleatorio"))
+    print(grafo_pesado.boruvka_compilado(G_compilado,"aleatorio"))
+    print("Borůvka en paralelo:",set(grafo_pesado.boruvka_compilado(G_compilado,"aleatorio",procesos=2))==set(grafo_pesado.boruvka_compilado(G_compilado,"aleatorio")))
+
+#Los árboles abarcadores compilados no admiten grafos dirigidos
+for arbol_abarcador in [grafo_pesado.kruskal_compilado,grafo_pesado.prim_compilado,grafo_pesado.boruvka_compilado]:
+    try:
+        arbol_abarcador(grafo_pesado.GrafoCompilado(nx.DiGraph(G),{"aleatorio":peso_aleatorio}),"aleatorio")
+    except ValueError as error:
+        print(arbol_abarcador.__name__+":",error)
+
+
+#Jerarquía de contracción: mismos costes que camino_minimo para todos los pares
+import contraccion
+directorio=tempfile.mkdtemp()
+jerarquias=contraccion.prepara_jerarquias(G,{"aleatorio":peso_aleatorio},directorio)
+print("CH:",all(coste_camino(G,peso_aleatorio,jerarquias["aleatorio"].camino_minimo(u,v))==coste_camino(G,peso_aleatorio,grafo_pesado.camino_minimo(G,peso_aleatorio,u,v)) for u in G for v in G))
+#Al cambiar un peso la jerarquía guardada se descarta y se reconstruye
+peso_original=G[1][2]["peso"]
+G[1][2]["peso"]=0
+jerarquias=contraccion.prepara_jerarquias(G,{"aleatorio":peso_aleatorio},directorio)
+print("CH tras cambiar un peso:",all(jerarquias["aleatorio"].distancia(u,v)==coste_camino(G,peso_aleatorio,grafo_pesado.camino_minimo(G,peso_aleatorio,u,v)) for u in G for v in G if u!=v))
+G[1][2]["peso"]=peso_original
+
+
+#Caché binaria del grafo de calles: el digrafo, sus atributos y el grafo compilado directamente
+#desde los arrays coinciden con los del grafo original
+import callejero
+import gps
+calles=nx.DiGraph(crs="epsg:4326")
+#Calles cortas y rápidas: en el modo tiempo varias aristas pesan 0 segundos
+for v in range(4):
+    calles.add_node(v,x=-3.70+0.0002*v,y=40.41+0.0001*(v%2))
+for u,v,longitud,tipo in [(0,1,25.0,"primary"),(1,0,25.0,"primary"),(1,2,22.0,"motorway"),(2,3,21.0,["motorway","primary"]),(0,3,60.0,None)]:
+    calles.add_edge(u,v,length=longitud,**({"highway":tipo} if tipo else {}))
+for u,v,nombre in [(0,1,"CALLE A"),(1,2,"CALLE B"),(2,3,"CALLE B")]:
+    calles[u][v]["name"]=nombre
+directorio_cache=tempfile.mkdtemp()
+callejero.guarda_cache_grafo(calles,directorio_cache)
+arrays,meta=callejero.carga_arrays_grafo(directorio_cache)
+calles_cache=callejero.digrafo_desde_arrays(arrays,meta)
+print("Caché del grafo:",calles_cache.graph==calles.graph,list(calles_cache.edges(data=True))==list(calles.edges(data=True)))
+pesos=gps.materializa_pesos(calles)
+calles_compilado=grafo_pesado.GrafoCompilado.desde_arrays(arrays["nodos"].tolist(),arrays["offsets"],arrays["destinos"],gps.pesos_cache(arrays,meta))
+print("Pesos desde la caché:",all((calles_compilado.pesos[modo]==pesos[modo]).all() for modo in gps.MODOS))
+print("Pesos materializados:",all(calles[u][v][gps.ATRIBUTOS_PESO["distancia"]]==gps.calcular_peso_distancia(calles,u,v) and calles[u][v][gps.ATRIBUTOS_PESO["tiempo"]]==gps.calcular_peso_tiempo(calles,u,v)
+      and calles[u][v][gps.ATRIBUTOS_PESO["semaforos"]]==gps.calcular_peso_semaforos(calles,u,v) for u,v in calles.edges),
+      all((gps.materializa_pesos(calles_cache,arrays,meta)[modo]==pesos[modo]).all() for modo in gps.MODOS))
+print("Camino mínimo desde la caché:",[grafo_pesado.camino_minimo_compilado(calles_compilado,modo,0,3)==grafo_pesado.camino_minimo(calles,lambda G,u,v,modo=modo:G[u][v][gps.ATRIBUTOS_PESO[modo]],0,3) for modo in gps.MODOS])
+print("Rutas de los modos:",[gps.calcula_ruta(calles_compilado,arrays["y"],arrays["x"],u,v,modo)==grafo_pesado.camino_minimo_compilado(calles_compilado,modo,u,v) for modo in gps.MODOS for u,v in [(0,3),(1,3),(3,3)]])
+calles_arrays=callejero.CallesCompiladas(arrays,meta)
+ruta_calles=[0,1,2,3]
+print("Instrucciones desde la caché:",gps.generar_instrucciones(calles_arrays,ruta_calles)==gps.generar_instrucciones(calles,ruta_calles),
+      gps.instrucciones_ruta(calles_arrays,[0,3])==gps.instrucciones_ruta(calles,[0,3]))
+print("Mapa desde la caché:",(callejero.MapaBase(calles_arrays).segmentos==callejero.MapaBase(calles).segmentos).all())
+
+#Dibujo de rutas: sin pantalla (mostrar=False) se exporta un PNG con el mapa, con y sin ruta
+import os
+from matplotlib.figure import Figure
+for ruta_dibujo in [None,ruta_calles]:
+    fichero_mapa=os.path.join(tempfile.mkdtemp(),"mapa.png")
+    callejero.dibuja_grafo(calles,ruta=ruta_dibujo,fichero=fichero_mapa,mostrar=False)
+    with open(fichero_mapa,"rb") as f:
+        figura_mapa=callejero.mapa_base(calles).figura(ruta_dibujo)
+        print("Mapa"+(" con ruta" if ruta_dibujo else "")+":",f.read(8)==b"\x89PNG\r\n\x1a\n",isinstance(figura_mapa,Figure),figura_mapa.axes[0].get_title())
+
+#Coordenadas del callejero: la conversión vectorizada coincide con convertir_coordenada y una fila
+#mal escrita da error en lugar de desalinear las demás
+import os
+import pandas as pd
+coordenadas=pd.Series(["40°25'12.34'' N","3°42'24.69'' W","40°2'1''S","3°42'24.69'' O","0°0'0'' E"])
+print("Coordenadas vectorizadas:",callejero.convertir_coordenadas(coordenadas).tolist()==coordenadas.apply(callejero.convertir_coordenada).tolist())
+try:
+    callejero.convertir_coordenadas(pd.Series(["40°25'1 2\"N","3°42'\"W","40°25'12\"N"]))
+    print("Coordenadas mal escritas: convertidas")
+except ValueError:
+    print("Coordenadas mal escritas: rechazadas")
+
+#Caché del callejero: la segunda carga lee las columnas guardadas y da la misma tabla
+directorio_callejero=tempfile.mkdtemp()
+ficheros_callejero=(callejero.STREET_FILE_NAME,callejero.STREET_CACHE_DIR)
+callejero.STREET_FILE_NAME=os.path.join(directorio_callejero,"direcciones.csv")
+callejero.STREET_CACHE_DIR=os.path.join(directorio_callejero,"cache")
+with open(callejero.STREET_FILE_NAME,"w",encoding="latin1") as f:
+    f.write("VIA_CLASE;VIA_PAR;VIA_NOMBRE;NUMERO;OTRA;LATITUD;LONGITUD\n")
+    f.write("CALLE;DE;ALBERTO AGUILERA;23;x;40°25'48.01'' N;3°42'44.22'' W\n")
+    f.write("CALLE;DEL;ÁLAMO;1;y;40°25'12.5'' N;3°42'24.69'' W\n")
+callejero_csv=callejero.carga_callejero()
+callejero_cache=callejero.carga_callejero()
+print("Caché del callejero:",os.path.exists(os.path.join(callejero.STREET_CACHE_DIR,"meta.json")),callejero_cache.equals(callejero_csv),(callejero_cache.dtypes==callejero_csv.dtypes).all())
+callejero.STREET_FILE_NAME,callejero.STREET_CACHE_DIR=ficheros_callejero
+
+
+#Servidor de rutas: el pool de procesos y la API HTTP devuelven las mismas rutas que camino_minimo
+import servidor
+import threading
+import urllib.request
+import json
+from espacial import IndiceEspacial
+latitudes_calles=np.asarray(arrays["y"])
+longitudes_calles=np.asarray(arrays["x"])
+with servidor.PoolRutas(calles_compilado,latitudes_calles,longitudes_calles,1) as pool:
+    print("Pool de rutas:",[pool.calcula([(0,3,modo)])[0][0]==grafo_pesado.camino_minimo_compilado(calles_compilado,modo,0,3) for modo in gps.MODOS])
+    #Una consulta descartada (por ejemplo tras agotar el tiempo) no se queda pendiente
+    pool.descarta(pool.enviar(0,3,"tiempo"))
+    print("Consultas pendientes:",pool.pendientes())
+    http=servidor.crea_servidor(pool,IndiceEspacial(calles_compilado.nodos,latitudes_calles,longitudes_calles),puerto=0)
+    threading.Thread(target=http.serve_forever,daemon=True).start()
+    with urllib.request.urlopen(f"http://127.0.0.1:{http.server_port}/ruta?origen={calles.nodes[0]['y']},{calles.nodes[0]['x']}&destino={calles.nodes[3]['y']},{calles.nodes[3]['x']}&modo=tiempo") as respuesta:
+        print("Servidor HTTP:",json.loads(respuesta.read())["ruta"]==grafo_pesado.camino_minimo_compilado(calles_compilado,"tiempo",0,3))
+    http.shutdown()
+    http.server_close()
+
+
+#Caché de rutas con A* (como en gps.py): las rutas calculadas, las de la caché y las que salen de los
+#árboles de los orígenes frecuentes cuestan lo mismo que las de camino_minimo, también en el modo tiempo
+from cache_rutas import CacheRutas
+cache=CacheRutas(calles_compilado,calcula=lambda origen,destino,modo:grafo_pesado.camino_minimo_astar_compilado(
+    calles_compilado,modo,origen,destino,gps.cotas_destino(latitudes_calles,longitudes_calles,calles_compilado.indice[destino],modo)))
+iguales=True
+for repeticion in range(4):
+    for modo in gps.MODOS:
+        for u in calles.nodes:
+            for v in calles.nodes:
+                if nx.has_path(calles,u,v):
+                    peso_modo=lambda G,x,y,modo=modo:G[x][y][gps.ATRIBUTOS_PESO[modo]]
+                    iguales&=coste_camino(calles,peso_modo,cache.camino_minimo(u,v,modo))==coste_camino(calles,peso_modo,grafo_pesado.camino_minimo(calles,peso_modo,u,v))
+print("Caché de rutas:",iguales,cache.estadisticas())
+
+
+#Instrucciones: el texto de generar_instrucciones es el mismo que el de la versión original, que
+#recorría la ruta arista a arista, en rutas aleatorias por una cuadrícula de calles con nombre
+def generar_instrucciones_original(G,ruta):
+    instrucciones=[]
+    calle_actual=None
+    longitud_acumulada=0
+    contador=1
+    for i in range(len(ruta)-1):
+        u,v=ruta[i],ruta[i+1]
+        nombre_calle=G[u][v].get("name","Calle desconocida")
+        longitud=G[u][v].get("length")
+        if nombre_calle!=calle_actual:
+            if calle_actual is not None:
+                anterior=ruta[i-1]
+                vector1=(G.nodes[u]['x']-G.nodes[anterior]['x'],G.nodes[u]['y']-G.nodes[anterior]['y'])
+                vector2=(G.nodes[v]['x']-G.nodes[u]['x'],G.nodes[v]['y']-G.nodes[u]['y'])
+                angulo=gps.calcular_angulo(vector1,vector2)
+                if -45<=angulo<=45:
+                    giro="Continúa recto"
+                elif angulo>45:
+                    giro="Gira a la izquierda"
+                else:
+                    giro="Gira a la derecha"
+                instrucciones.append(f"{contador} -> {giro} hacia {calle_actual} y continúa por ella durante {int(longitud_acumulada)} metros.")
+                contador+=1
+            longitud_acumulada=longitud
+            calle_actual=nombre_calle
+        else:
+            longitud_acumulada+=longitud
+    instrucciones.append("Has llegado a tu destino.")
+    return instrucciones
+cuadricula=nx.DiGraph()
+for i in range(6):
+    for j in range(6):
+        cuadricula.add_node(6*i+j,x=-3.70+0.001*j+random.uniform(-2e-4,2e-4),y=40.40+0.001*i+random.uniform(-2e-4,2e-4))
+for i in range(6):
+    for j in range(6):
+        for vecino,nombre in [(6*i+j+1,f"CALLE {i}") if j<5 else (None,None),(6*(i+1)+j,f"AVENIDA {j}") if i<5 else (None,None)]:
+            if vecino is not None:
+                longitud=random.uniform(80,120)
+                cuadricula.add_edge(6*i+j,vecino,length=longitud,name=nombre,peso=random.randint(1,5))
+                cuadricula.add_edge(vecino,6*i+j,length=longitud,name=nombre,peso=random.randint(1,5))
+rutas_cuadricula=[grafo_pesado.camino_minimo(cuadricula,peso_aleatorio,*random.sample(range(36),2)) for _ in range(20)]
+print("Instrucciones:",all(gps.generar_instrucciones(cuadricula,ruta)==generar_instrucciones_original(cuadricula,ruta) for ruta in rutas_cuadricula))
+
+
+#Rutas con coste de giro: sin costes de giro coinciden con camino_minimo y con los costes por defecto
+#no son peores (contando los giros) que la ruta mínima sin giros. La búsqueda queda instrumentada.
+import giros
+giros_calles=giros.GirosCompilados(calles_compilado,latitudes_calles,longitudes_calles)
+sin_giros=dict.fromkeys(giros.CLASES_GIRO,0)
+grafo_pesado.reinicia_estadisticas()
+grafo_pesado.activa_instrumentacion()
+for modo in gps.MODOS:
+    ruta_giros=giros.camino_minimo_giros(giros_calles,modo,0,3,costes=sin_giros)
+    ruta_directa=grafo_pesado.camino_minimo_compilado(calles_compilado,modo,0,3)
+    print("Giros",modo+":",grafo_pesado.coste_camino_compilado(calles_compilado,modo,ruta_giros)==grafo_pesado.coste_camino_compilado(calles_compilado,modo,ruta_directa),
+          giros.coste_ruta_giros(giros_calles,modo,giros.camino_minimo_giros(giros_calles,modo,0,3))<=giros.coste_ruta_giros(giros_calles,modo,ruta_directa))
+print("Búsquedas con giros instrumentadas:",grafo_pesado.estadisticas_agregadas()["camino_minimo_giros"]["llamadas"])
+grafo_pesado.activa_instrumentacion(False)
+
+
+#ALT: las cotas de los landmarks no superan la distancia real y las rutas cuestan lo mismo que las de
+#camino_minimo, también tras guardar y cargar las tablas
+import os
+from alt import TablasALT
+tablas=TablasALT.construye(G_compilado,"aleatorio",k=3)
+tablas.guarda(os.path.join(directorio,"alt_aleatorio.npz"))
+tablas_cargadas=TablasALT.carga(os.path.join(directorio,"alt_aleatorio.npz"),G_compilado,"aleatorio")
+distancias_reales={v:grafo_pesado.distancias_compilado(G_compilado,"aleatorio",v) for v in G}
+print("Cotas ALT admisibles:",all(tablas.cotas(v)[G_compilado.indice[u]]<=distancias_reales[u][G_compilado.indice[v]]+1e-9 for u in G for v in G))
+print("ALT:",all(coste_camino(G,peso_aleatorio,t.camino_minimo(u,v))==coste_camino(G,peso_aleatorio,grafo_pesado.camino_minimo(G,peso_aleatorio,u,v)) for t in (tablas,tablas_cargadas) for u in G for v in G))
+try:
+    TablasALT.carga(os.path.join(directorio,"alt_aleatorio.npz"),G_compilado,"constante")
+    print("Tablas ALT con otros pesos: cargadas")
+except ValueError:
+    print("Tablas ALT con otros pesos: rechazadas")
+
+
+#Autocompletado: cada sugerencia es una dirección que busca_direccion encuentra en las mismas
+#coordenadas, tanto por prefijo (sin tildes) como con errores al escribir
+import pandas as pd
+from autocompletado import Autocompletado
+direcciones=pd.DataFrame({"VIA_CLASE":["CALLE","CALLE","CALLE","AVENIDA"],"VIA_PAR":["DE","DE","DEL",None],
+                          "VIA_NOMBRE":["ALBERTO AGUILERA","ALBERTO AGUILERA","ÁLAMO","PRUEBA"],"NUMERO":[23,25,1,4],
+                          "LATITUD":[calles.nodes[v]["y"] for v in range(4)],"LONGITUD":[calles.nodes[v]["x"] for v in range(4)]})
+autocompletado=Autocompletado(direcciones)
+for texto in ["calle de alberto aguilera, 24","alamo","alberto agilera, 25"]:
+    sugerencias=autocompletado.sugerir(texto)
+    print("Autocompletado",repr(texto)+":",sugerencias[0][0] if sugerencias else None,
+          bool(sugerencias) and all(callejero.busca_direccion(s,direcciones)==(latitud,longitud) for s,latitud,longitud in sugerencias))
+
+
+#Búsqueda de direcciones: el índice encuentra las mismas coordenadas que recorrer el DataFrame fila
+#a fila como hacía busca_direccion, y rechaza las mismas direcciones
+def busca_direccion_lineal(direccion,df):
+    direccion=direccion.upper()
+    numero=direccion.rpartition(",")[2].strip()
+    if not numero.isdecimal():
+        return None
+    for _,linea in df[df["NUMERO"]==int(numero)].iterrows():
+        if (linea["VIA_CLASE"]+" ") in direccion and (" "+linea["VIA_NOMBRE"]+",") in direccion:
+            return (np.float64(linea["LATITUD"]),np.float64(linea["LONGITUD"]))
+    return None
+def busca_direccion_indice(direccion,df):
+    try:
+        return callejero.busca_direccion(direccion,df)
+    except callejero.AdressNotFoundError:
+        return None
+consultas_direcciones=["Calle de Alberto Aguilera, 23","CALLE DE ALBERTO AGUILERA, 25","Calle del Álamo, 1","Avenida Prueba, 4",
+                       "Calle de Alberto Aguilera, 24","Calle Alberto Aguilera, 23","Avenida Prueba","Plaza de Alberto Aguilera, 23"]
+print("Búsqueda de direcciones:",[busca_direccion_indice(d,direcciones)==busca_direccion_lineal(d,direcciones) for d in consultas_direcciones])
+
+#Índice espacial: el nodo y la arista más cercanos a puntos aleatorios coinciden con los de una
+#búsqueda exhaustiva sobre las coordenadas proyectadas
+indice_calles=IndiceEspacial.desde_grafo(calles,con_aristas=True)
+rng=np.random.default_rng(0)
+puntos_lat=rng.uniform(40.4099,40.4102,50)
+puntos_lon=rng.uniform(-3.7001,-3.6993,50)
+px,py=indice_calles._proyecta(puntos_lat,puntos_lon)
+cercanos=np.array(indice_calles.nodos)[np.argmin(np.hypot(indice_calles.x[None,:]-px[:,None],indice_calles.y[None,:]-py[:,None]),axis=1)]
+print("Nodos cercanos:",(indice_calles.nodos_cercanos(puntos_lat,puntos_lon)==cercanos).all())
+def distancia_segmento(u,v,x,y):
+    i,j=indice_calles.nodos.index(u),indice_calles.nodos.index(v)
+    ax,ay,dx,dy=indice_calles.x[i],indice_calles.y[i],indice_calles.x[j]-indice_calles.x[i],indice_calles.y[j]-indice_calles.y[i]
+    t=min(max(((x-ax)*dx+(y-ay)*dy)/(dx*dx+dy*dy),0),1)
+    return np.hypot(ax+t*dx-x,ay+t*dy-y)
+print("Aristas cercanas:",all(abs(d-min(distancia_segmento(u,v,x,y) for u,v in calles.edges()))<1e-6
+                             for (_,_,_,d),x,y in zip(indice_calles.aristas_cercanas(puntos_lat,puntos_lon),px,py)))
+
+
+#Rutas por lotes: distancia y tiempo de cada par iguales a los de camino_minimo entre los nodos de las
+#direcciones, y error para las direcciones que no existen
+import rutas_lote
+pares=[("CALLE DE ALBERTO AGUILERA, 23","AVENIDA PRUEBA, 4"),("CALLE DE ALBERTO AGUILERA, 25","CALLE DEL ÁLAMO, 1"),
+       ("CALLE DE ALBERTO AGUILERA, 23","CALLE DEL ÁLAMO, 1"),("CALLE INEXISTENTE, 1","AVENIDA PRUEBA, 4")]
+for resultado in sorted(rutas_lote.calcula_rutas_lote(pares,calles_compilado,indice_calles,direcciones,"tiempo"),key=lambda r:r["fila"]):
+    if resultado["error"]:
+        print("Rutas por lotes:",resultado["fila"],resultado["error"])
+        continue
+    ruta=[int(v) for v in resultado["ruta"].split()]
+    referencia=grafo_pesado.camino_minimo(calles,lambda G,u,v:G[u][v][gps.ATRIBUTOS_PESO["tiempo"]],ruta[0],ruta[-1])
+    print("Rutas por lotes:",resultado["fila"],resultado["tiempo_s"]==coste_camino(calles,lambda G,u,v:G[u][v][gps.ATRIBUTOS_PESO["tiempo"]],referencia),
+          resultado["distancia_m"]==round(coste_camino(calles,lambda G,u,v:G[u][v][gps.ATRIBUTOS_PESO["distancia"]],ruta),1))
+
+
+#Benchmark: sobre grafos sintéticos pequeños todos los algoritmos medidos dan lo mismo que NetworkX
+import benchmark
+for nombre,generador in [("rejilla",benchmark.grafo_rejilla),("geometrico",benchmark.grafo_geometrico)]:
+    medidas=benchmark.mide_grafo(nombre,generador(100))
+    print("Benchmark "+nombre+":",all(medida["correcto"] for medida in medidas),[medida["algoritmo"] for medida in medidas if not medida["correcto"]])
+
+#Tráfico dinámico: tras cada lote de actualizaciones (atascos, cortes y vueltas a la normalidad) las
+#distancias del árbol reparado coinciden con un Dijkstra completo sobre los pesos con tráfico
+from trafico import TraficoDinamico
+rejilla=nx.convert_node_labels_to_integers(nx.DiGraph(nx.grid_2d_graph(5,5)))
+for u,v in rejilla.edges():
+    #Tiempos enteros pequeños, con aristas de 0 segundos como en el modo tiempo
+    rejilla[u][v]["tiempo"]=random.randrange(0,4)
+    rejilla[u][v]["semaforos"]=rejilla[u][v]["tiempo"]+gps.PROB_SEMAFORO*gps.TIEMPO_SEMAFORO
+trafico=TraficoDinamico(grafo_pesado.GrafoCompilado(rejilla,{"tiempo":"tiempo","semaforos":"semaforos"}))
+arbol_trafico=trafico.arbol(0)
+#Estructuras construidas sobre el grafo antes del tráfico
+cache_trafico=CacheRutas(trafico.grafo)
+cache_trafico.camino_minimo(0,24,"tiempo")
+tablas_trafico=TablasALT.construye(trafico.grafo,"tiempo",k=2)
+factores={}
+aristas_rejilla=list(rejilla.edges())
+iguales=True
+for lote in range(5):
+    lineas=[]
+    for u,v in random.sample(aristas_rejilla,6):
+        factor=random.choice(["1","2","3.5","cerrada"])
+        lineas.append(f"{u};{v};{factor}")
+        factores[(u,v)]=np.inf if factor=="cerrada" else float(factor)
+    list(trafico.aplica_flujo(lineas))
+    referencia=nx.DiGraph()
+    referencia.add_nodes_from(rejilla)
+    for u,v in aristas_rejilla:
+        factor=factores.get((u,v),1.0)
+        if factor<np.inf:
+            referencia.add_edge(u,v,tiempo=rejilla[u][v]["tiempo"]*factor)
+    distancias_referencia=grafo_pesado.distancias_compilado(grafo_pesado.GrafoCompilado(referencia,{"tiempo":"tiempo"}),"tiempo",0)
+    #El árbol marca los vértices inalcanzables con INFTY y distancias_compilado con inf
+    distancias_arbol=[np.inf if arbol_trafico.distancia(v)>=grafo_pesado.INFTY else arbol_trafico.distancia(v) for v in referencia.nodes]
+    iguales&=distancias_arbol==distancias_referencia.tolist()
+print("Tráfico dinámico:",iguales)
+def ruta_o_none(calcula):
+    try:
+        return calcula()
+    except ValueError:
+        return None
+print("Caché tras el tráfico:",trafico.grafo.version>0,
+      ruta_o_none(lambda:cache_trafico.camino_minimo(0,24,"tiempo"))==ruta_o_none(lambda:grafo_pesado.camino_minimo_compilado(trafico.grafo,"tiempo",0,24)))
+try:
+    tablas_trafico.camino_minimo(0,24)
+    print("ALT tras el tráfico: calculada")
+except ValueError:
+    print("ALT tras el tráfico: rechazada")
@@ -0,0 +1,313 @@
+"""
+trafico.py
+
+Matemática Discreta - IMAT
+ICAI, Universidad Pontificia Comillas
+
+Descripción:
+Pesos de tiempo dinámicos a partir de un flujo de actualizaciones de tráfico.
+
+Cada actualización indica una arista y un factor que multiplica su tiempo de recorrido
+(1 es tráfico normal, 2 el doble de tiempo, "cerrada" o inf un corte). El flujo se simula
+con un fichero o un socket con una actualización por línea:
+    origen;destino;factor
+Las líneas vacías o que empiezan por "#" se ignoran.
+
+Los pesos se modifican en el propio GrafoCompilado (ver GrafoCompilado.actualiza_pesos) y los
+árboles de caminos mínimos registrados se reparan de forma incremental: solo se recalculan los
+vértices cuyo camino mínimo cambia, en lugar de repetir Dijkstra completo tras cada actualización.
+Cada actualización incrementa la versión del grafo, con lo que las cachés de rutas se vacían y las
+tablas de landmarks y las jerarquías de contracción construidas antes dejan de usarse.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Tuple
+import heapq
+import numpy as np
+
+from grafo_pesado import INFTY, GrafoCompilado, arbol_compilado
+
+#Modos cuyo peso depende del tiempo de recorrido de las aristas
+MODOS_TIEMPO = ("tiempo", "semaforos")
+
+
+def _vertice(texto: str) -> object:
+    """Los vértices de OpenStreetMap son enteros; cualquier otro identificador se deja como texto."""
+    texto = texto.strip()
+    try:
+        return int(texto)
+    except ValueError:
+        return texto
+
+
+def lee_actualizaciones(lineas: Iterable[str], separador: str = ";") -> Iterator[Tuple[object, object, float]]:
+    """
+    Interpreta un flujo de actualizaciones de tráfico.
+
+    Args:
+        lineas (Iterable[str]): Líneas "origen;destino;factor", p. ej. un fichero abierto o socket.makefile().
+        separador (str, opcional): Separador de los campos. Por defecto, ";".
+    Returns:
+        Iterator[Tuple[object, object, float]]: Arista (origen, destino) y factor de su tiempo de recorrido.
+    Raises:
+        ValueError: Si una línea no tiene tres campos o el factor no es un número no negativo ni "cerrada".
+    """
+    for numero, linea in enumerate(lineas, start=1):
+        linea = linea.strip()
+        if not linea or linea.startswith("#"):
+            continue
+        campos = linea.split(separador)
+        if len(campos) != 3:
+            raise ValueError(f"Línea {numero} del flujo de tráfico no válida: {linea}")
+        factor = campos[2].strip().lower()
+        factor = np.inf if factor == "cerrada" else float(factor)
+        if not factor >= 0:
+            raise ValueError(f"Factor de tráfico no válido en la línea {numero}: {campos[2]}")
+        yield _vertice(campos[0]), _vertice(campos[1]), factor
+
+
+class ArbolDinamico:
+    """
+    Árbol de caminos mínimos desde un origen que se repara cuando cambian pesos de aristas.
+
+    Tras un lote de cambios, las aristas del árbol que se encarecen invalidan el subárbol que
+    cuelga de ellas: sus vértices toman la mejor distancia que les ofrecen sus predecesores
+    fuera del subárbol y, junto con los extremos de las aristas que se abaratan, inician una
+    única propagación tipo Dijkstra que solo recorre los vértices cuya distancia cambia.
+
+    Attributes:
+        grafo (GrafoCompilado): Grafo compilado.
+        peso (str): Nombre de la función de peso compilada.
+        origen (int): Índice del vértice de origen.
+        distancias (List[float]): Distancia de cada vértice (INFTY si no es alcanzable).
+        padre (List[int]): Índice del padre de cada vértice en el árbol (-1 si no tiene).
+    """
+
+    def __init__(self, grafo: GrafoCompilado, peso: str, origen: object, predecesores: Tuple[List[int], List[int], List[int]] = None):
+        """
+        Args:
+            grafo (GrafoCompilado): Grafo compilado.
+            peso (str): Nombre de la función de peso compilada.
+            origen (object): vértice de origen.
+            predecesores (Tuple[List[int], List[int], List[int]], opcional): grafo.predecesores() como listas,
+                para compartirlos entre árboles. Por defecto, se calculan.
+        """
+        self.grafo = grafo
+        self.peso = peso
+        self.origen = grafo.indice[origen]
+        #Para cada predecesor, posición de su arista en el grafo original: no depende de los pesos
+        self._predecesores = predecesores if predecesores is not None else tuple(array.tolist() for array in grafo.predecesores())
+        distancias, padre = arbol_compilado(grafo, peso, origen)
+        self.distancias = np.where(np.isinf(distancias), INFTY, distancias).tolist()
+        self.padre = padre.tolist()
+        self._hijos = [[] for _ in range(len(grafo))]
+        for v, p in enumerate(self.padre):
+            if p >= 0:
+                self._hijos[p].append(v)
+
+    def _cambia_padre(self, v: int, p: int) -> None:
+        """Cambia el padre de v manteniendo las listas de hijos."""
+        if self.padre[v] >= 0:
+            self._hijos[self.padre[v]].remove(v)
+        self.padre[v] = p
+        if p >= 0:
+            self._hijos[p].append(v)
+
+    def repara(self, cambios: List[Tuple[int, int, int, float]]) -> int:
+        """
+        Repara el árbol tras cambiar los pesos de algunas aristas (ya modificados en el grafo).
+
+        Args:
+            cambios (List[Tuple[int, int, int, float]]): Para cada arista modificada, índices de sus
+                extremos (u, v), su posición en el CSR y su peso anterior.
+        Returns:
+            int: Número de vértices cuya distancia se ha recalculado.
+        """
+        offsets, destinos, pesos = self.grafo.csr(self.peso)
+        distancias = self.distancias
+        Q = []
+
+        #Vértices que cuelgan de aristas del árbol encarecidas
+        afectados = set()
+        for u, v, k, anterior in cambios:
+            if pesos[k] > anterior and self.padre[v] == u and v not in afectados:
+                pila = [v]
+                while pila:
+                    x = pila.pop()
+                    if x not in afectados:
+                        afectados.add(x)
+                        pila.extend(self._hijos[x])
+
+        for x in afectados:
+            distancias[x] = INFTY
+            self._cambia_padre(x, -1)
+        p_offsets, p_origenes, p_posicion = self._predecesores
+        for x in afectados:
+            for i in range(p_offsets[x], p_offsets[x + 1]):
+                u = p_origenes[i]
+                d = distancias[u] + pesos[p_posicion[i]]
+                if u not in afectados and d < distancias[x]:
+                    distancias[x] = d
+                    self._cambia_padre(x, u)
+            if distancias[x] < INFTY:
+                heapq.heappush(Q, (distancias[x], x))
+
+        #Aristas abaratadas que mejoran la distancia de su extremo
+        for u, v, k, anterior in cambios:
+            d = distancias[u] + pesos[k]
+            if pesos[k] < anterior and d < distancias[v]:
+                distancias[v] = d
+                self._cambia_padre(v, u)
+                heapq.heappush(Q, (d, v))
+
+        recalculados = set(afectados)
+        while Q:
+            d_v, v = heapq.heappop(Q)
+            if d_v > distancias[v]:
+                continue
+            recalculados.add(v)
+            for i in range(offsets[v], offsets[v + 1]):
+                x = destinos[i]
+                d_x = d_v + pesos[i]
+                if d_x < distancias[x]:
+                    distancias[x] = d_x
+                    self._cambia_padre(x, v)
+                    heapq.heappush(Q, (d_x, x))
+        return len(recalculados)
+
+    def distancia(self, destino: object) -> float:
+        """Devuelve la distancia del origen a "destino" (INFTY si no es alcanzable)."""
+        return self.distancias[self.grafo.indice[destino]]
+
+    def camino(self, destino: object) -> List[object]:
+        """
+        Devuelve el camino mínimo del origen a "destino".
+
+        Raises:
+            ValueError: Si no existe camino entre origen y destino.
+        """
+        actual = self.grafo.indice[destino]
+        if self.distancias[actual] >= INFTY:
+            raise ValueError("No existe camino entre origen y destino.")
+        camino = []
+        while actual != -1:
+            camino.append(self.grafo.nodos[actual])
+            actual = self.padre[actual]
+        return camino[::-1]
+
+
+class TraficoDinamico:
+    """
+    Aplica actualizaciones de tráfico a los pesos de tiempo de un GrafoCompilado.
+
+    El factor de cada arista se aplica sobre su tiempo de recorrido original: en el modo
+    "tiempo" el peso pasa a ser tiempo * factor y en el modo "semaforos" se mantiene además
+    la penalización fija por semáforo.
+
+    Attributes:
+        grafo (GrafoCompilado): Grafo compilado cuyos pesos se modifican.
+        factores (np.ndarray): Factor actual de cada arista, en el orden del CSR.
+        arboles (List[ArbolDinamico]): Árboles que se reparan en cada actualización.
+    """
+
+    def __init__(self, grafo: GrafoCompilado):
+        """
+        Args:
+            grafo (GrafoCompilado): Grafo compilado con el peso "tiempo" y, opcionalmente, "semaforos".
+        Raises:
+            KeyError: Si el grafo no tiene el peso "tiempo".
+        """
+        if "tiempo" not in grafo.pesos:
+            raise KeyError("El peso 'tiempo' no está compilado en el grafo.")
+        self.grafo = grafo
+        self.modos = [modo for modo in MODOS_TIEMPO if modo in grafo.pesos]
+        self._originales = {modo: grafo.pesos[modo].copy() for modo in self.modos}
+        self.factores = np.ones(grafo.numero_aristas())
+        self._origenes = np.repeat(np.arange(len(grafo)), np.diff(grafo.offsets))
+        self._predecesores = None
+        self.arboles = []
+
+    def arbol(self, origen: object, modo: str = "tiempo") -> ArbolDinamico:
+        """
+        Crea un árbol de caminos mínimos desde "origen" que se mantiene al día con el tráfico.
+
+        Args:
+            origen (object): vértice de origen.
+            modo (str, opcional): Nombre de la función de peso compilada. Por defecto, "tiempo".
+        Returns:
+            ArbolDinamico: Árbol registrado.
+        Raises:
+            KeyError: Si "modo" no es un peso de tiempo compilado en el grafo.
+        """
+        if modo not in self.modos:
+            raise KeyError(f"El peso '{modo}' no depende del tráfico o no está compilado en el grafo.")
+        if self._predecesores is None:
+            self._predecesores = tuple(array.tolist() for array in self.grafo.predecesores())
+        arbol = ArbolDinamico(self.grafo, modo, origen, self._predecesores)
+        self.arboles.append(arbol)
+        return arbol
+
+    def _posicion(self, u: int, v: int) -> int:
+        """Posición de la arista u->v en el CSR."""
+        offsets, destinos = self.grafo.offsets, self.grafo.destinos
+        posiciones = np.nonzero(destinos[offsets[u]:offsets[u + 1]] == v)[0]
+        if not len(posiciones):
+            raise KeyError(f"La arista ({self.grafo.nodos[u]}, {self.grafo.nodos[v]}) no pertenece al grafo.")
+        return int(offsets[u] + posiciones[0])
+
+    def aplica(self, actualizaciones: Iterable[Tuple[object, object, float]]) -> Dict[str, int]:
+        """
+        Aplica un lote de actualizaciones y repara los árboles registrados.
+
+        Args:
+            actualizaciones (Iterable[Tuple[object, object, float]]): Aristas (origen, destino) y factor.
+                Un factor 1 devuelve la arista a su tiempo original.
+        Returns:
+            Dict[str, int]: Número de aristas modificadas y de vértices recalculados en los árboles.
+        Raises:
+            KeyError: Si alguna arista no pertenece al grafo.
+        """
+        indice = self.grafo.indice
+        posiciones = {}
+        for u, v, factor in actualizaciones:
+            posiciones[self._posicion(indice[u], indice[v])] = factor
+        if not posiciones:
+            return {"aristas": 0, "recalculados": 0}
+
+        k = np.fromiter(posiciones.keys(), dtype=np.int64, count=len(posiciones))
+        factores = np.fromiter(posiciones.values(), dtype=np.float64, count=len(posiciones))
+        self.factores[k] = factores
+        tiempo = self._originales["tiempo"][k]
+        anteriores = {}
+        for modo in self.modos:
+            #Con factor infinito la arista queda cortada aunque su tiempo original sea 0
+            with np.errstate(invalid="ignore"):
+                nuevos = self._originales[modo][k] + tiempo * (factores - 1)
+            anteriores[modo] = self.grafo.actualiza_pesos(modo, k, np.where(np.isinf(factores), np.inf, nuevos))
+
+        u = self._origenes[k].tolist()
+        v = self.grafo.destinos[k].tolist()
+        recalculados = 0
+        for arbol in self.arboles:
+            cambios = list(zip(u, v, k.tolist(), anteriores[arbol.peso].tolist()))
+            recalculados += arbol.repara(cambios)
+        return {"aristas": len(k), "recalculados": recalculados}
+
+    def aplica_flujo(self, lineas: Iterable[str], lote: int = 100, separador: str = ";") -> Iterator[Dict[str, int]]:
+        """
+        Consume un flujo de líneas de tráfico aplicando las actualizaciones por lotes.
+
+        Args:
+            lineas (Iterable[str]): Flujo de líneas, p. ej. un fichero abierto o socket.makefile().
+            lote (int, opcional): Número de actualizaciones por lote. Por defecto, 100.
+            separador (str, opcional): Separador de los campos. Por defecto, ";".
+        Returns:
+            Iterator[Dict[str, int]]: Resultado de "aplica" para cada lote.
+        """
+        pendientes = []
+        for actualizacion in lee_actualizaciones(lineas, separador):
+            pendientes.append(actualizacion)
+            if len(pendientes) >= lote:
+                yield self.aplica(pendientes)
+                pendientes = []
+        if pendientes:
+            yield self.aplica(pendientes)